@@ -0,0 +1,239 @@
+"""baseline: the tables as they were before the first migration
+
+Revision ID: 0000
+Revises:
+Create Date: 2026-10-17 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0000"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# unique TEXT columns, mysql only indexes a prefix of them
+UNIQUE_TEXT = [
+    ("ix_users_username", "users", "username"),
+    ("uq_clients_ndi", "clients", "ndi"),
+    ("uq_companies_name", "companies", "name"),
+    ("uq_companies_abn", "companies", "abn"),
+]
+
+
+def upgrade() -> None:
+    # databases set up before the migrations had these from create_all on startup,
+    # 0001 and later bring them up to date
+    if sa.inspect(op.get_bind()).has_table("users"):
+        return
+
+    op.create_table(
+        "companies",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.Text(), nullable=False),
+        sa.Column("web", sa.Text(), nullable=True),
+        sa.Column("phone", sa.Text(), nullable=False),
+        sa.Column("email", sa.Text(), nullable=False),
+        sa.Column("address", sa.Text(), nullable=True),
+        sa.Column("abn", sa.Text(), nullable=False),
+        sa.Column("logo", sa.Text(), nullable=True),
+    )
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.Text(), nullable=False),
+        sa.Column("password", sa.Text(), nullable=False),
+        sa.Column("password_hash", sa.Text(), nullable=False),
+        sa.Column("role", sa.Text(), nullable=False),
+    )
+    op.create_table(
+        "clients",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id"), nullable=True),
+        sa.Column("reference", sa.Text(), nullable=True),
+        sa.Column("date_of_reg", sa.Date(), nullable=True),
+        sa.Column("plan_start_date", sa.Date(), nullable=True),
+        sa.Column("plan_end_date", sa.Date(), nullable=True),
+        sa.Column("image_path", sa.Text(), nullable=True),
+        sa.Column("surname", sa.Text(), nullable=True),
+        sa.Column("given_name", sa.Text(), nullable=True),
+        sa.Column("preferred_name", sa.Text(), nullable=True),
+        sa.Column("sex", sa.Text(), nullable=True),
+        sa.Column("aboriginal", sa.Boolean(), nullable=True),
+        sa.Column("date_of_birth", sa.Date(), nullable=True),
+        sa.Column("residence_street", sa.Text(), nullable=True),
+        sa.Column("residence_state", sa.Text(), nullable=True),
+        sa.Column("residence_postcode", sa.Text(), nullable=True),
+        sa.Column("postal_street", sa.Text(), nullable=True),
+        sa.Column("postal_state", sa.Text(), nullable=True),
+        sa.Column("postal_postcode", sa.Text(), nullable=True),
+        sa.Column("home_mobile", sa.Text(), nullable=True),
+        sa.Column("home_phone", sa.Text(), nullable=True),
+        sa.Column("home_email", sa.Text(), nullable=True),
+        sa.Column("ndi", sa.Text(), nullable=False),
+        sa.Column("ndis_start_date", sa.Date(), nullable=True),
+        sa.Column("ndis_end_date", sa.Date(), nullable=True),
+        sa.Column("ndis_plan_review_date", sa.Date(), nullable=True),
+        sa.Column("funding_type", sa.Text(), nullable=True),
+        sa.Column("plan_provider_name", sa.Text(), nullable=True),
+        sa.Column("plan_provider_email", sa.Text(), nullable=True),
+        sa.Column("plan_provider_phone", sa.Text(), nullable=True),
+        sa.Column("registered_other_ndis", sa.Boolean(), nullable=True),
+        sa.Column("service_received_other_ndis", sa.Text(), nullable=True),
+        sa.Column("adv_surname", sa.Text(), nullable=True),
+        sa.Column("adv_given_name", sa.Text(), nullable=True),
+        sa.Column("adv_relationship", sa.Text(), nullable=True),
+        sa.Column("adv_phone", sa.Text(), nullable=True),
+        sa.Column("adv_mobile", sa.Text(), nullable=True),
+        sa.Column("adv_email", sa.Text(), nullable=True),
+        sa.Column("adv_address", sa.Text(), nullable=True),
+        sa.Column("adv_postal_address", sa.Text(), nullable=True),
+        sa.Column("birth_country", sa.Text(), nullable=True),
+        sa.Column("main_language", sa.Text(), nullable=True),
+        sa.Column("lang_interpreter_required", sa.Boolean(), nullable=True),
+        sa.Column("cultural_bariers", sa.Boolean(), nullable=True),
+        sa.Column("verbal_communication", sa.Text(), nullable=True),
+        sa.Column("interpreter_needed", sa.Boolean(), nullable=True),
+        sa.Column("interpreter_language", sa.Text(), nullable=True),
+        sa.Column("cultural_values", sa.Text(), nullable=True),
+        sa.Column("cultural_behaviours", sa.Text(), nullable=True),
+        sa.Column("communication_literacy", sa.Text(), nullable=True),
+        sa.Column("weight", sa.Float(), nullable=True),
+        sa.Column("height", sa.Float(), nullable=True),
+        sa.Column("eye_color", sa.Text(), nullable=True),
+        sa.Column("complexion", sa.Text(), nullable=True),
+        sa.Column("build", sa.Text(), nullable=True),
+        sa.Column("hair_color", sa.Text(), nullable=True),
+        sa.Column("facial_hair", sa.Text(), nullable=True),
+        sa.Column("birth_marks", sa.Boolean(), nullable=True),
+        sa.Column("tattos", sa.Boolean(), nullable=True),
+        sa.Column("emergency1_name", sa.Text(), nullable=True),
+        sa.Column("emergency1_relationship", sa.Text(), nullable=True),
+        sa.Column("emergency1_mobile", sa.Text(), nullable=True),
+        sa.Column("emergency1_phone", sa.Text(), nullable=True),
+        sa.Column("emergency2_name", sa.Text(), nullable=True),
+        sa.Column("emergency2_relationship", sa.Text(), nullable=True),
+        sa.Column("emergency2_mobile", sa.Text(), nullable=True),
+        sa.Column("emergency2_phone", sa.Text(), nullable=True),
+        sa.Column("gp_clinic_name", sa.Text(), nullable=True),
+        sa.Column("gp_firstname", sa.Text(), nullable=True),
+        sa.Column("gp_surname", sa.Text(), nullable=True),
+        sa.Column("gp_email", sa.Text(), nullable=True),
+        sa.Column("gp_address", sa.Text(), nullable=True),
+        sa.Column("gp_phone", sa.Text(), nullable=True),
+        sa.Column("gp_mobile", sa.Text(), nullable=True),
+        sa.Column("support_contact_name", sa.Text(), nullable=True),
+        sa.Column("support_relationship", sa.Text(), nullable=True),
+        sa.Column("support_mobile", sa.Text(), nullable=True),
+        sa.Column("support_phone", sa.Text(), nullable=True),
+        sa.Column("have_specialist", sa.Boolean(), nullable=True),
+        sa.Column("specialist_clinic_name", sa.Text(), nullable=True),
+        sa.Column("specialist_email", sa.Text(), nullable=True),
+        sa.Column("specialist_firstname", sa.Text(), nullable=True),
+        sa.Column("specialist_surname", sa.Text(), nullable=True),
+        sa.Column("specialist_address", sa.Text(), nullable=True),
+        sa.Column("specialist_mobile", sa.Text(), nullable=True),
+        sa.Column("specialist_phone", sa.Text(), nullable=True),
+        sa.Column("living_arrangement", sa.Text(), nullable=True),
+        sa.Column("travel", sa.Text(), nullable=True),
+        sa.Column("disability", sa.Text(), nullable=True),
+        sa.Column("important_people", sa.Text(), nullable=True),
+    )
+    op.create_table(
+        "staffs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id"), nullable=False),
+        sa.Column("date_of_reg", sa.Date(), nullable=True),
+        sa.Column("image_path", sa.Text(), nullable=True),
+        sa.Column("title", sa.Text(), nullable=True),
+        sa.Column("given_name", sa.Text(), nullable=True),
+        sa.Column("surname", sa.Text(), nullable=True),
+        sa.Column("preferred_name", sa.Text(), nullable=True),
+        sa.Column("dob", sa.Date(), nullable=True),
+        sa.Column("residence_street", sa.Text(), nullable=True),
+        sa.Column("residence_state", sa.Text(), nullable=True),
+        sa.Column("residence_postcode", sa.Text(), nullable=True),
+        sa.Column("postal_street", sa.Text(), nullable=True),
+        sa.Column("postal_state", sa.Text(), nullable=True),
+        sa.Column("postal_postcode", sa.Text(), nullable=True),
+        sa.Column("home_email", sa.Text(), nullable=True),
+        sa.Column("home_phone", sa.Text(), nullable=True),
+        sa.Column("home_mobile", sa.Text(), nullable=True),
+        sa.Column("emergency1_name", sa.Text(), nullable=True),
+        sa.Column("emergency1_relationship", sa.Text(), nullable=True),
+        sa.Column("emergency1_mobile", sa.Text(), nullable=True),
+        sa.Column("emergency1_phone", sa.Text(), nullable=True),
+        sa.Column("emergency2_name", sa.Text(), nullable=True),
+        sa.Column("emergency2_relationship", sa.Text(), nullable=True),
+        sa.Column("emergency2_mobile", sa.Text(), nullable=True),
+        sa.Column("emergency2_phone", sa.Text(), nullable=True),
+        sa.Column("bank1_name", sa.Text(), nullable=True),
+        sa.Column("bank1_acc_name", sa.Text(), nullable=True),
+        sa.Column("bank1_acc_no", sa.Text(), nullable=True),
+        sa.Column("bank1_branch", sa.Text(), nullable=True),
+        sa.Column("bank1_bsb", sa.Text(), nullable=True),
+        sa.Column("bank2_name", sa.Text(), nullable=True),
+        sa.Column("bank2_acc_name", sa.Text(), nullable=True),
+        sa.Column("bank2_acc_no", sa.Text(), nullable=True),
+        sa.Column("bank2_branch", sa.Text(), nullable=True),
+        sa.Column("bank2_bsb", sa.Text(), nullable=True),
+        sa.Column("bank_unit", sa.Text(), nullable=True),
+        sa.Column("bank_amount", sa.Float(), nullable=True),
+        sa.Column("bank_percent_net_pay", sa.Float(), nullable=True),
+        sa.Column("employee_tax", sa.Text(), nullable=True),
+        sa.Column("abn", sa.Text(), nullable=True),
+        sa.Column("secondary_employment", sa.Boolean(), nullable=True),
+        sa.Column("secondary_employment_details", sa.Text(), nullable=True),
+        sa.Column("epilepsy", sa.Boolean(), nullable=True),
+        sa.Column("diabetes", sa.Boolean(), nullable=True),
+        sa.Column("diabetes_type", sa.Text(), nullable=True),
+        sa.Column("heart_condition", sa.Boolean(), nullable=True),
+        sa.Column("heart_condition_details", sa.Text(), nullable=True),
+        sa.Column("allergies", sa.Boolean(), nullable=True),
+        sa.Column("allergies_details", sa.Text(), nullable=True),
+        sa.Column("health_others", sa.Boolean(), nullable=True),
+        sa.Column("health_others_details", sa.Text(), nullable=True),
+        sa.Column("australian", sa.Boolean(), nullable=True),
+        sa.Column("aus_permanent", sa.Boolean(), nullable=True),
+        sa.Column("have_working_visa", sa.Boolean(), nullable=True),
+        sa.Column("visa_expiary_date", sa.Date(), nullable=True),
+        sa.Column("visa_restrictions", sa.Text(), nullable=True),
+    )
+    op.create_table(
+        "tasks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("staff_id", sa.Integer(), sa.ForeignKey("staffs.id"), nullable=False),
+        sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), nullable=False),
+        sa.Column("start_date", sa.Date(), nullable=False),
+        sa.Column("start_time", sa.Time(), nullable=False),
+        sa.Column("end_date", sa.Date(), nullable=False),
+        sa.Column("end_time", sa.Time(), nullable=False),
+        sa.Column("service_type", sa.Text(), nullable=False),
+        sa.Column("hours", sa.Float(), nullable=False),
+        sa.Column("done", sa.Boolean(), nullable=True),
+        sa.Column("approved", sa.Boolean(), nullable=True),
+        sa.Column("tasks_list", sa.Text(), nullable=True),
+        sa.Column("done_time", sa.DateTime(), nullable=True),
+    )
+    op.create_table(
+        "media",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("task_id", sa.Integer(), sa.ForeignKey("tasks.id"), nullable=False),
+        sa.Column("file_path", sa.Text(), nullable=False),
+    )
+    for table in ["companies", "users", "clients", "staffs", "tasks", "media"]:
+        op.create_index(f"ix_{table}_id", table, ["id"])
+    for name, table, column in UNIQUE_TEXT:
+        op.create_index(name, table, [column], unique=True, mysql_length=255)
+
+
+def downgrade() -> None:
+    for table in ["media", "tasks", "staffs", "clients", "users", "companies"]:
+        op.drop_table(table)
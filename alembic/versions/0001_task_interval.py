@@ -0,0 +1,56 @@
+"""task start_at/end_at interval columns
+
+Revision ID: 0001
+Revises: 0000
+Create Date: 2026-10-17 10:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = "0000"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # databases set up by create_all before the migrations may already have these
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("tasks")}
+    indexes = {index["name"] for index in inspector.get_indexes("tasks")}
+
+    if "start_at" not in columns:
+        op.add_column("tasks", sa.Column("start_at", sa.DateTime(), nullable=True))
+    if "end_at" not in columns:
+        op.add_column("tasks", sa.Column("end_at", sa.DateTime(), nullable=True))
+
+    # backfill from the separate date/time columns
+    op.execute(
+        "UPDATE tasks SET start_at = TIMESTAMP(start_date, start_time), "
+        "end_at = TIMESTAMP(end_date, end_time) "
+        "WHERE start_at IS NULL OR end_at IS NULL"
+    )
+    op.alter_column("tasks", "start_at", existing_type=sa.DateTime(), nullable=False)
+    op.alter_column("tasks", "end_at", existing_type=sa.DateTime(), nullable=False)
+
+    if "ix_tasks_staff_interval" not in indexes:
+        op.create_index("ix_tasks_staff_interval", "tasks", ["staff_id", "start_at", "end_at"])
+    # start_at < :end alone reads every past shift of the staff member, the tasks
+    # ending after :start are a short range of this one
+    if "ix_tasks_staff_end_at" not in indexes:
+        op.create_index("ix_tasks_staff_end_at", "tasks", ["staff_id", "end_at", "start_at"])
+
+
+def downgrade() -> None:
+    # missing on databases that got to 0001 before it created the index
+    indexes = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("tasks")}
+    if "ix_tasks_staff_end_at" in indexes:
+        op.drop_index("ix_tasks_staff_end_at", table_name="tasks")
+    op.drop_index("ix_tasks_staff_interval", table_name="tasks")
+    op.drop_column("tasks", "end_at")
+    op.drop_column("tasks", "start_at")
@@ -0,0 +1,56 @@
+"""indexes for the hot route predicates
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 11:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, columns), matched to the WHERE/ORDER BY of the routes
+INDEXES = [
+    # /tasks/staff/, /tasks/staff/{staff_id}, current week of a staff
+    ("ix_tasks_staff_start_date", "tasks", ["staff_id", "start_date"]),
+    # /tasks/client/{clientId}, current week of a participant
+    ("ix_tasks_client_start_date", "tasks", ["client_id", "start_date"]),
+    # /all-tasks ordered and paged by (start_date, id)
+    ("ix_tasks_start_date_id", "tasks", ["start_date", "id"]),
+    # media of a page of tasks
+    ("ix_media_task_id", "media", ["task_id"]),
+    # user -> client/staff lookups of the authenticated user
+    ("ix_clients_user_id", "clients", ["user_id"]),
+    ("ix_staffs_user_id", "staffs", ["user_id"]),
+    # company directories
+    ("ix_clients_company_id", "clients", ["company_id"]),
+    ("ix_staffs_company_id", "staffs", ["company_id"]),
+]
+
+
+def upgrade() -> None:
+    # databases set up by create_all before the migrations may already have these
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        existing = {index["name"] for index in inspector.get_indexes(table)}
+        if name not in existing:
+            op.create_index(name, table, columns)
+
+
+# innodb drops its implicit foreign key index once one of the above covers the column,
+# and refuses to drop the last index backing a foreign key, so only these can go back
+NON_FK_INDEXES = ["ix_tasks_staff_start_date", "ix_tasks_start_date_id"]
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        if name in NON_FK_INDEXES:
+            op.drop_index(name, table_name=table)
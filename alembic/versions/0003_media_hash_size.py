@@ -0,0 +1,35 @@
+"""media sha256/size columns
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 13:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # databases set up by create_all before the migrations may already have these
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("media")}
+
+    # left NULL for files uploaded before the streaming writer
+    if "sha256" not in columns:
+        op.add_column("media", sa.Column("sha256", sa.String(64), nullable=True))
+    if "size" not in columns:
+        op.add_column("media", sa.Column("size", sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("media", "size")
+    op.drop_column("media", "sha256")
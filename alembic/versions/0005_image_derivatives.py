@@ -0,0 +1,38 @@
+"""thumbnail/medium/webp variant paths
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 15:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ["media", "clients", "staffs"]
+COLUMNS = ["thumb_path", "medium_path", "webp_path"]
+
+
+def upgrade() -> None:
+    # databases set up by create_all before the migrations may already have these
+    inspector = sa.inspect(op.get_bind())
+    for table in TABLES:
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        for column in COLUMNS:
+            if column not in existing:
+                op.add_column(table, sa.Column(column, sa.Text(), nullable=True))
+    # existing photos get their variants from scripts/build_derivatives.py
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        for column in reversed(COLUMNS):
+            op.drop_column(table, column)
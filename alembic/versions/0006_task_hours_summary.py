@@ -0,0 +1,48 @@
+"""hours summary per staff, participant, service type and week
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 18:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from auth.summaries import rebuild_stmt
+from models import TaskHoursSummary
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # databases set up by create_all before the migrations may already have these
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("task_hours_summary"):
+        op.create_table(
+            "task_hours_summary",
+            sa.Column("staff_id", sa.Integer(), primary_key=True),
+            sa.Column("week_start", sa.Date(), primary_key=True),
+            sa.Column("client_id", sa.Integer(), primary_key=True),
+            sa.Column("service_type", sa.String(255), primary_key=True),
+            sa.Column("task_count", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("hours", sa.Float(), nullable=False, server_default="0"),
+            sa.Column("done_hours", sa.Float(), nullable=False, server_default="0"),
+            sa.Column("approved_hours", sa.Float(), nullable=False, server_default="0"),
+        )
+        op.create_index("ix_task_hours_summary_client_week", "task_hours_summary", ["client_id", "week_start"])
+        op.create_index("ix_task_hours_summary_week", "task_hours_summary", ["week_start"])
+    # summed up from the existing tasks, a table left by create_all is recounted too.
+    # scripts/rebuild_hours_summary.py does the same later on
+    op.execute(sa.delete(TaskHoursSummary))
+    op.execute(rebuild_stmt())
+
+
+def downgrade() -> None:
+    op.drop_table("task_hours_summary")
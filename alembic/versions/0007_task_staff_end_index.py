@@ -0,0 +1,33 @@
+"""index for the staff availability search
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 19:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # databases set up by create_all before the migrations may already have these
+    inspector = sa.inspect(op.get_bind())
+    existing = {index["name"] for index in inspector.get_indexes("tasks")}
+    # databases migrated past 0001 before it created this index get it here
+    if "ix_tasks_staff_end_at" not in existing:
+        # the staff busy in a window are found by the tasks ending after its start
+        op.create_index("ix_tasks_staff_end_at", "tasks", ["staff_id", "end_at", "start_at"])
+
+
+def downgrade() -> None:
+    # 0001 creates the index as well now, it goes with that revision
+    pass
@@ -0,0 +1,32 @@
+"""blob content kind
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 20:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("blobs", sa.Column("kind", sa.String(16), nullable=True))
+    # blobs already set as a participant's or staff member's picture were uploaded as one
+    op.execute(
+        "UPDATE blobs SET kind = 'image' WHERE path IN "
+        "(SELECT image_path FROM clients WHERE image_path IS NOT NULL "
+        "UNION SELECT image_path FROM staffs WHERE image_path IS NOT NULL)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("blobs", "kind")
@@ -0,0 +1,46 @@
+"""company directory name order indexes
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 21:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = {"clients": "ix_clients_company_name", "staffs": "ix_staffs_company_name"}
+
+
+def upgrade() -> None:
+    # names that would not fit are reported, not truncated or left to strict mode
+    bind = op.get_bind()
+    for table in TABLES:
+        for column in ["given_name", "surname"]:
+            longest = bind.execute(sa.text(f"SELECT MAX(CHAR_LENGTH({column})) FROM {table}")).scalar()
+            if longest is not None and longest > 255:
+                raise RuntimeError(
+                    f"{table}.{column} holds values of up to {longest} characters, shorten them to 255 "
+                    f"(SELECT id FROM {table} WHERE CHAR_LENGTH({column}) > 255) and run the migration again"
+                )
+
+    for table, index in TABLES.items():
+        # an index only serves an ORDER BY on whole columns, not on TEXT prefixes
+        for column in ["given_name", "surname"]:
+            op.alter_column(table, column, existing_type=sa.Text(), type_=sa.String(255), existing_nullable=True)
+        op.create_index(index, table, ["company_id", "given_name", "surname", "id"])
+
+
+def downgrade() -> None:
+    for table, index in TABLES.items():
+        op.drop_index(index, table_name=table)
+        for column in ["given_name", "surname"]:
+            op.alter_column(table, column, existing_type=sa.String(255), type_=sa.Text(), existing_nullable=True)
@@ -0,0 +1,38 @@
+"""indexes on the columns pointing at blobs
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 22:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, column), the reference counting of auth/blobs.py and the
+# thumbnail writes of auth/derivatives.py look the rows up by path. the columns are
+# TEXT, a 255 character prefix holds every path the store writes
+INDEXES = [
+    ("ix_media_file_path", "media", "file_path"),
+    ("ix_clients_image_path", "clients", "image_path"),
+    ("ix_staffs_image_path", "staffs", "image_path"),
+    ("ix_companies_logo", "companies", "logo"),
+]
+
+
+def upgrade() -> None:
+    for name, table, column in INDEXES:
+        op.create_index(name, table, [column], mysql_length=255)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,367 @@
+# content addressed, deduplicated file store
+# every uploaded file is stored once under uploads/blobs/<sha256[:2]>/<sha256><ext>,
+# the same photo uploaded to eight tasks is one file with ref_count 8. the rows that
+# point at files (Media.file_path, Company.logo, Client/Staff.image_path) are counted
+# by the session hooks below, so routes just set or delete those rows as usual and a
+# blob is dropped together with its last reference. its files are unlinked after the
+# commit by the cleanup worker, off the request.
+# paths outside the store (written before it existed) are unlinked as soon as their
+# row lets go of them, scripts/dedupe_uploads.py moves the old tree into the store.
+# every change of a ref_count first locks the blob row (SELECT ... FOR UPDATE), and so
+# does claiming an upload, so a blob taken by one transaction cannot be dropped by
+# another in between. the cleanup worker only unlinks a store file once its row is gone.
+# uploads nothing ever pointed at (a profile picture never used, a form that failed
+# after the upload) are swept by the worker once blob_grace_period has passed
+import queue
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import anyio
+from fastapi import UploadFile
+from sqlalchemy import delete, event, insert, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models import Blob, Media, Company, Client, Staff
+from auth.uploads import SavedUpload, safe_filename, stream_to_file
+
+UPLOAD_ROOT = Path("uploads")
+BLOB_ROOT = UPLOAD_ROOT / "blobs"
+# uploads are streamed here first, the hash (and so the final name) is only known at the end
+BLOB_TMP = BLOB_ROOT / "tmp"
+
+# the columns holding file paths, one per model
+BLOB_COLUMNS = {
+    Media: "file_path",
+    Company: "logo",
+    Client: "image_path",
+    Staff: "image_path",
+}
+
+# session.info key of the files to unlink once the transaction commits
+_UNLINK_KEY = "blobs_to_unlink"
+# session.info key of the files moved into the store by the transaction, unlinked
+# again when it rolls back
+_PLACED_KEY = "blobs_placed"
+
+# Blob.kind of content sniffed as an image by /profile-images
+IMAGE_KIND = "image"
+
+# a path set on a row whose blob was dropped meanwhile, answered with 409 by main
+class BlobGone(Exception):
+    def __init__(self, paths):
+        super().__init__(f"blobs no longer stored: {', '.join(sorted(paths))}")
+        self.paths = paths
+
+def blob_suffix(filename: str | None) -> str:
+    suffix = Path(safe_filename(filename)).suffix.lower()
+    return suffix if 1 < len(suffix) <= 10 and suffix[1:].isalnum() else ""
+
+def blob_path(sha256: str, suffix: str = "") -> Path:
+    return BLOB_ROOT / sha256[:2] / f"{sha256}{suffix}"
+
+def tmp_path() -> Path:
+    return BLOB_TMP / f"{uuid.uuid4().hex}.part"
+
+# moves a fully written temp file into the store, or drops it when the content is
+# already there, and makes sure the blob row exists. the row starts at ref_count 0,
+# the reference is counted when the row pointing at the path is flushed. the row stays
+# locked until the transaction ends, so it cannot be dropped before that flush.
+# kind is recorded when the caller checked the content, the same bytes stay that kind
+def claim_blob(db: Session, part: Path, sha256: str, size: int, suffix: str = "", kind: str | None = None) -> Path:
+    row = db.execute(select(Blob.path, Blob.kind, Blob.ref_count).where(Blob.sha256 == sha256).with_for_update()).first()
+    if row is None:
+        # a concurrent upload of the same content may insert the row first, the insert
+        # waits for it and fails once it committed
+        try:
+            with db.begin_nested():
+                db.execute(insert(Blob).values(sha256=sha256, path=str(blob_path(sha256, suffix)), size=size, ref_count=0, kind=kind))
+        except IntegrityError:
+            pass
+        row = db.execute(select(Blob.path, Blob.kind, Blob.ref_count).where(Blob.sha256 == sha256).with_for_update()).one()
+    if kind and row.kind != kind:
+        db.execute(update(Blob).where(Blob.sha256 == sha256).values(kind=kind))
+    if row.ref_count <= 0:
+        # the grace period before the sweep starts over with every upload of the content
+        db.execute(update(Blob).where(Blob.sha256 == sha256).values(created_at=datetime.utcnow()))
+    path = Path(row.path)
+    if path.exists():
+        part.unlink(missing_ok=True)
+        return path
+
+    # the file only goes into the store once its row is there
+    path.parent.mkdir(parents=True, exist_ok=True)
+    part.replace(path)
+    db.info.setdefault(_PLACED_KEY, set()).add(str(path))
+    return path
+
+async def store_upload(
+    db: AsyncSession, file: UploadFile, max_size: int | None = None, suffix: str | None = None, kind: str | None = None,
+) -> SavedUpload:
+    part = tmp_path()
+    await anyio.Path(part.parent).mkdir(parents=True, exist_ok=True)
+    try:
+        sha256, size = await stream_to_file(file, part, max_size)
+        path = await db.run_sync(claim_blob, part, sha256, size, suffix or blob_suffix(file.filename), kind)
+    except BaseException:
+        await anyio.Path(part).unlink(missing_ok=True)
+        raise
+    return SavedUpload(path=path, sha256=sha256, size=size)
+
+def unlink_blob(path: Path):
+    path.unlink(missing_ok=True)
+    # resized variants are named <sha256>_<variant>.<ext> next to the blob
+    if path.is_relative_to(BLOB_ROOT) and path.parent.is_dir():
+        for derivative in path.parent.glob(f"{path.stem}_*"):
+            derivative.unlink(missing_ok=True)
+
+def _is_upload(path: Path) -> bool:
+    return path.resolve().is_relative_to(UPLOAD_ROOT.resolve())
+
+# paths a flush adds and drops, from the new, changed and deleted rows
+def _flush_references(db: Session) -> tuple[list[str], list[str]]:
+    acquired, released = [], []
+    for obj in db.new:
+        column = BLOB_COLUMNS.get(type(obj))
+        if column and getattr(obj, column):
+            acquired.append(getattr(obj, column))
+    for obj in db.dirty:
+        column = BLOB_COLUMNS.get(type(obj))
+        if column:
+            history = inspect(obj).attrs[column].history
+            acquired.extend(path for path in history.added if path)
+            released.extend(path for path in history.deleted if path)
+    for obj in db.deleted:
+        column = BLOB_COLUMNS.get(type(obj))
+        if column:
+            history = inspect(obj).attrs[column].load_history()
+            released.extend(path for path in (history.deleted or history.unchanged) if path)
+    return acquired, released
+
+# paths per IN (...) of the reference counting
+BATCH_SIZE = 1000
+
+def _batches(items: list, size: int = BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _in_store(path: str) -> bool:
+    return Path(path).is_relative_to(BLOB_ROOT)
+
+# applies the +/- reference changes per path to the blob rows, locked first (in path
+# order, the same in every transaction), and deletes the rows nobody references
+# anymore. one update per distinct change and batch, not one per path. returns the
+# dropped paths and the paths that have a row. a store path gaining references
+# without a row raises BlobGone, paths from before the store have none
+def _change_references(db: Session, changes: Counter) -> tuple[list[str], set[str]]:
+    paths = sorted(path for path, change in changes.items() if change)
+    counts = {}
+    for batch in _batches(paths):
+        counts.update(db.execute(
+            select(Blob.path, Blob.ref_count).where(Blob.path.in_(batch)).order_by(Blob.path).with_for_update()
+        ).all())
+    gone = [path for path in paths if changes[path] > 0 and path not in counts and _in_store(path)]
+    if gone:
+        raise BlobGone(gone)
+
+    by_change = defaultdict(list)
+    for path in counts:
+        by_change[changes[path]].append(path)
+    for change, changed_paths in by_change.items():
+        for batch in _batches(changed_paths):
+            db.execute(
+                update(Blob).where(Blob.path.in_(batch)).values(ref_count=Blob.ref_count + change),
+                execution_options={"synchronize_session": False},
+            )
+    dropped = [path for path, ref_count in counts.items() if ref_count + changes[path] <= 0]
+    for batch in _batches(dropped):
+        db.execute(delete(Blob).where(Blob.path.in_(batch)), execution_options={"synchronize_session": False})
+    return dropped, set(counts)
+
+# legacy paths (no blob row) still pointed at by rows, after this transaction's changes
+def _legacy_references(db: Session, legacy: list[str]) -> Counter:
+    references = Counter()
+    for batch in _batches(legacy):
+        for model, column in BLOB_COLUMNS.items():
+            column = getattr(model, column)
+            references.update(db.execute(select(column).where(column.in_(batch))).scalars())
+    return references
+
+@event.listens_for(Session, "before_flush")
+def count_blob_references(db: Session, flush_context, instances):
+    acquired, released = _flush_references(db)
+    if not acquired and not released:
+        return
+
+    changes = Counter(acquired)
+    changes.subtract(released)
+    dropped, known = _change_references(db, changes)
+    # a path from before the store is only removed once no row points at it anymore,
+    # the rows of this flush are still in the database with their old paths
+    legacy = [path for path in set(released) - known if changes[path] < 0]
+    if legacy:
+        references = _legacy_references(db, legacy)
+        legacy = [path for path in legacy if references[path] + changes[path] <= 0]
+    db.info.setdefault(_UNLINK_KEY, set()).update(dropped, legacy)
+
+# rows written with bulk inserts never pass through the flush hook, their writer
+# counts the references itself, in the same transaction
+def acquire_blobs(db: Session, paths):
+    changes = Counter(path for path in paths if path)
+    if changes:
+        _change_references(db, changes)
+
+# the same for bulk deletes, called with the paths of the deleted rows after the
+# deletes ran, so a company's thousands of pictures and task photos take a handful
+# of statements
+def release_blobs(db: Session, paths):
+    changes = Counter()
+    changes.subtract(path for path in paths if path)
+    if not changes:
+        return
+    dropped, known = _change_references(db, changes)
+    # the deleted rows are gone already, a path from before the store goes once no
+    # other row points at it
+    legacy = [path for path in changes if path not in known]
+    references = _legacy_references(db, legacy) if legacy else Counter()
+    db.info.setdefault(_UNLINK_KEY, set()).update(dropped, (path for path in legacy if not references[path]))
+
+# unlinks the files of released blobs in the background, so a commit dropping
+# thousands of them returns at once, and every blob_sweep_interval drops the blobs
+# still unreferenced blob_grace_period after their upload. until start() (scripts,
+# tests) files are unlinked in the calling thread and nothing is swept
+class CleanupWorker:
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._unlinked = 0
+        self._failed = 0
+        self._swept = 0
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="blob-cleanup", daemon=True)
+        self._thread.start()
+
+    # the queued files are unlinked first, those still queued after timeout stay on disk
+    def stop(self, timeout: float = 5):
+        if not self._thread:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, paths):
+        paths = [Path(path) for path in paths]
+        if not paths:
+            return
+        if self._thread:
+            self._queue.put(paths)
+        else:
+            self.process(paths)
+
+    def process(self, paths: list[Path]):
+        unlinked = failed = 0
+        with SessionLocal() as db:
+            # a store file whose content was uploaded again after its row was dropped
+            # has a new row, locked by the uploading transaction until it commits
+            store = sorted(str(path) for path in paths if path.is_relative_to(BLOB_ROOT))
+            claimed = set()
+            for batch in _batches(store):
+                claimed.update(db.execute(
+                    select(Blob.path).where(Blob.path.in_(batch)).order_by(Blob.path).with_for_update()
+                ).scalars())
+            unlinked, failed = self._unlink([path for path in paths if str(path) not in claimed])
+            db.commit()
+        with self._lock:
+            self._unlinked += unlinked
+            self._failed += failed
+
+    # drops the rows of blobs nobody took up within the grace period, their files go
+    # through process like any released blob. rows locked by an upload claiming the
+    # content again right now are skipped, the upload restarts their grace period
+    def sweep(self) -> int:
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.blob_grace_period)
+        swept = 0
+        while True:
+            with SessionLocal() as db:
+                paths = list(db.execute(
+                    select(Blob.path)
+                    .where(Blob.ref_count <= 0, Blob.created_at < cutoff)
+                    .order_by(Blob.path).limit(BATCH_SIZE).with_for_update(skip_locked=True)
+                ).scalars())
+                if paths:
+                    db.execute(delete(Blob).where(Blob.path.in_(paths)), execution_options={"synchronize_session": False})
+                db.commit()
+            if not paths:
+                break
+            self.process([Path(path) for path in paths])
+            swept += len(paths)
+            if len(paths) < BATCH_SIZE:
+                break
+        with self._lock:
+            self._swept += swept
+        return swept
+
+    def _unlink(self, paths: list[Path]) -> tuple[int, int]:
+        unlinked = failed = 0
+        for path in paths:
+            try:
+                if _is_upload(path):
+                    unlink_blob(path)
+                    unlinked += 1
+            except OSError as e:
+                print(f"cleanup failed for {path}: {e!r}")
+                failed += 1
+        return unlinked, failed
+
+    def _run(self):
+        next_sweep = time.monotonic() + settings.blob_sweep_interval
+        while True:
+            try:
+                paths = self._queue.get(timeout=max(next_sweep - time.monotonic(), 0))
+            except queue.Empty:
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"blob sweep failed: {e!r}")
+                next_sweep = time.monotonic() + settings.blob_sweep_interval
+                continue
+            if paths is None:
+                return
+            self.process(paths)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "running": self._thread is not None,
+                "queued_batches": self._queue.qsize(),
+                "unlinked": self._unlinked,
+                "failed": self._failed,
+                "swept": self._swept,
+            }
+
+cleanup_worker = CleanupWorker()
+
+@event.listens_for(Session, "after_commit")
+def unlink_released_blobs(db: Session):
+    db.info.pop(_PLACED_KEY, None)
+    cleanup_worker.submit(db.info.pop(_UNLINK_KEY, ()))
+
+# a transaction ending without a commit (rolled back, or its session closed) unlinks
+# nothing it released and drops the files it placed. savepoints are left alone
+@event.listens_for(Session, "after_transaction_end")
+def forget_released_blobs(db: Session, transaction):
+    if transaction.parent is not None:
+        return
+    db.info.pop(_UNLINK_KEY, None)
+    cleanup_worker.submit(db.info.pop(_PLACED_KEY, ()))
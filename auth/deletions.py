@@ -0,0 +1,93 @@
+# set based deletes of users, participants and companies with everything under them
+# deleting went through the orm: delete_user committed up to four times and
+# delete_company loaded every client and staff user to db.delete them one by one.
+# here the participants and staff in scope are selected once and their tasks, the
+# tasks' media, the profiles, the users and the company go with one DELETE each,
+# children first, in a single transaction. bulk deletes skip the session hooks, so
+# the blob references and task hours they held are released here, and the files
+# nobody points at anymore are unlinked by the cleanup worker after the commit
+from dataclasses import dataclass
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.orm import Session
+
+from models import Client, Company, Media, Staff, Task, User
+from auth.blobs import release_blobs
+from auth.summaries import release_task_hours
+
+# bulk statements leave the objects loaded in the session alone
+BULK = {"synchronize_session": False}
+
+@dataclass
+class DeletionReport:
+    users: int = 0
+    clients: int = 0
+    staff: int = 0
+    tasks: int = 0
+    media: int = 0
+    companies: int = 0
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+# deletes the users and the company, with the participants and staff of either and
+# the tasks of those participants and staff and their media. the caller commits
+def delete_cascade(db: Session, user_ids=(), company_id: int | None = None) -> DeletionReport:
+    report = DeletionReport()
+    user_ids = list(user_ids)
+    client_ids = _profile_ids(db, Client, user_ids, company_id)
+    staff_ids = _profile_ids(db, Staff, user_ids, company_id)
+
+    # a task goes with its participant or with its staff member
+    task_filters = []
+    if client_ids:
+        task_filters.append(Task.client_id.in_(client_ids))
+    if staff_ids:
+        task_filters.append(Task.staff_id.in_(staff_ids))
+
+    paths = []
+    if task_filters:
+        paths += db.execute(
+            select(Media.file_path).join(Task, Task.id == Media.task_id).where(or_(*task_filters))
+        ).scalars()
+        release_task_hours(db, or_(*task_filters))
+        # one statement per side keeps each on its (client_id / staff_id) index
+        for task_filter in task_filters:
+            report.media += db.execute(
+                delete(Media).where(Media.task_id.in_(select(Task.id).where(task_filter))), execution_options=BULK
+            ).rowcount
+            report.tasks += db.execute(delete(Task).where(task_filter), execution_options=BULK).rowcount
+
+    if client_ids:
+        paths += db.execute(select(Client.image_path).where(Client.id.in_(client_ids))).scalars()
+        report.clients = db.execute(delete(Client).where(Client.id.in_(client_ids)), execution_options=BULK).rowcount
+    if staff_ids:
+        paths += db.execute(select(Staff.image_path).where(Staff.id.in_(staff_ids))).scalars()
+        report.staff = db.execute(delete(Staff).where(Staff.id.in_(staff_ids)), execution_options=BULK).rowcount
+
+    if user_ids:
+        report.users = db.execute(delete(User).where(User.id.in_(user_ids)), execution_options=BULK).rowcount
+
+    if company_id is not None:
+        paths += db.execute(select(Company.logo).where(Company.id == company_id)).scalars()
+        report.companies = db.execute(delete(Company).where(Company.id == company_id), execution_options=BULK).rowcount
+
+    release_blobs(db, paths)
+    return report
+
+def _profile_ids(db: Session, model, user_ids: list[int], company_id: int | None) -> list[int]:
+    criteria = []
+    if user_ids:
+        criteria.append(model.user_id.in_(user_ids))
+    if company_id is not None:
+        criteria.append(model.company_id == company_id)
+    if not criteria:
+        return []
+    return list(db.execute(select(model.id).where(or_(*criteria))).scalars())
+
+# users of the participants and staff of a company, they go with the company
+def company_user_ids(db: Session, company_id: int) -> list[int]:
+    return list(db.execute(
+        select(Client.user_id).where(Client.company_id == company_id)
+        .union(select(Staff.user_id).where(Staff.company_id == company_id))
+    ).scalars())
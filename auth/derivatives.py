@@ -0,0 +1,158 @@
+# resized photo variants, made in the background
+# list screens only need an avatar or a preview but used to load the full original
+# (often several MB) through /uploads. after an upload commits the route hands the
+# blob path to the worker, which writes a small thumbnail, a medium jpeg and a medium
+# webp next to the blob and records their paths on every Media/Client/Staff row
+# pointing at it. variants are per content like the blobs, so a photo already
+# processed for one row is only recorded for the next, and they are removed together
+# with the blob (auth/blobs.py)
+import queue
+import threading
+from pathlib import Path
+
+from PIL import Image, ImageOps
+from sqlalchemy import update
+
+from config import settings
+from database import SessionLocal
+from models import Media, Client, Staff
+from auth.blobs import BLOB_ROOT
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff"}
+
+# row column -> (variant name, longest side, format, suffix). the name carries the size
+# and quality: variants are served as immutable like the blobs, other settings have to
+# give other urls (scripts/build_derivatives.py moves the rows over)
+def _variant(name: str, size: int) -> str:
+    return f"{name}{size}q{settings.image_quality}"
+
+DERIVATIVES = {
+    "thumb_path": (_variant("thumb", settings.thumb_size), settings.thumb_size, "JPEG", ".jpg"),
+    "medium_path": (_variant("medium", settings.medium_size), settings.medium_size, "JPEG", ".jpg"),
+    "webp_path": (_variant("medium", settings.medium_size), settings.medium_size, "WEBP", ".webp"),
+}
+
+# the rows holding image paths and their column
+IMAGE_COLUMNS = [(Media, Media.file_path), (Client, Client.image_path), (Staff, Staff.image_path)]
+
+def is_image_path(path: str | None) -> bool:
+    return bool(path) and Path(path).is_relative_to(BLOB_ROOT) and Path(path).suffix.lower() in IMAGE_SUFFIXES
+
+def derivative_path(path: Path, name: str, suffix: str) -> Path:
+    return path.with_name(f"{path.stem}_{name}{suffix}")
+
+# end of the file names the current settings give a column's variants
+def variant_ending(column: str) -> str:
+    name, _, _, suffix = DERIVATIVES[column]
+    return f"_{name}{suffix}"
+
+def _save(image: Image.Image, path: Path, format: str):
+    part = path.with_name(f".{path.name}.part")
+    image.save(part, format=format, quality=settings.image_quality, optimize=format == "JPEG")
+    part.replace(path)
+
+def make_derivatives(path: Path) -> dict[str, str]:
+    paths = {
+        column: derivative_path(path, name, suffix)
+        for column, (name, _, _, suffix) in DERIVATIVES.items()
+    }
+    missing = {column: target for column, target in paths.items() if not target.exists()}
+    if missing:
+        with Image.open(path) as original:
+            # jpeg can decode straight at a reduced scale, much cheaper for big photos
+            original.draft("RGB", (settings.medium_size, settings.medium_size))
+            image = ImageOps.exif_transpose(original)
+            if image.mode != "RGB":
+                # flatten transparency onto white, jpeg has no alpha
+                background = Image.new("RGB", image.size, "white")
+                background.paste(image, mask=image.convert("RGBA").getchannel("A"))
+                image = background
+            # largest variant first, each smaller one is resized from the previous
+            for column, (_, size, format, _) in sorted(DERIVATIVES.items(), key=lambda item: -item[1][1]):
+                image.thumbnail((size, size), Image.Resampling.LANCZOS)
+                if column in missing:
+                    _save(image, missing[column], format)
+    return {column: str(target) for column, target in paths.items()}
+
+def record_derivatives(path: str, derivatives: dict[str, str]):
+    with SessionLocal() as db:
+        for model, column in IMAGE_COLUMNS:
+            db.execute(update(model).where(column == path).values(**derivatives))
+        db.commit()
+
+class DerivativeWorker:
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._queue = queue.Queue(maxsize=queue_limit)
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._pending: set[str] = set()
+        self._processed = 0
+        self._failed = 0
+        self._skipped = 0
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"derivatives-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    # called after the commit that made rows point at path, never blocks the request.
+    # when the queue is full the image is skipped, scripts/build_derivatives.py catches up
+    def submit(self, path: str | None) -> bool:
+        if not is_image_path(path):
+            return False
+        with self._lock:
+            if path in self._pending:
+                return True
+            try:
+                self._queue.put_nowait(path)
+            except queue.Full:
+                self._skipped += 1
+                return False
+            self._pending.add(path)
+        return True
+
+    def process(self, path: str):
+        record_derivatives(path, make_derivatives(Path(path)))
+
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            if path is None:
+                return
+            try:
+                self.process(path)
+                failed = False
+            except Exception as e:
+                print(f"derivatives failed for {path}: {e!r}")
+                failed = True
+            with self._lock:
+                self._pending.discard(path)
+                if failed:
+                    self._failed += 1
+                else:
+                    self._processed += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "workers": len(self._threads),
+                "queue_limit": self.queue_limit,
+                "queue_depth": self._queue.qsize(),
+                "processed": self._processed,
+                "failed": self._failed,
+                "skipped": self._skipped,
+            }
+
+derivative_worker = DerivativeWorker(settings.derivative_workers, settings.derivative_queue_limit)
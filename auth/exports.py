@@ -0,0 +1,103 @@
+# streaming export of tasks for payroll and invoicing
+# payroll used to page through /all-tasks and join the names client side. here one
+# select joins tasks to staff, participant and company and is read through a server
+# side cursor (stream_results) in export_batch_size partitions, every partition is
+# written out as one csv or ndjson chunk of the StreamingResponse. memory stays at one
+# partition however many rows the range holds, and the header (csv) goes out before
+# the query runs.
+# the response body is produced after the route returned, when its get_db session is
+# closed already, so the export opens its own session for as long as the stream runs
+import csv
+import io
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from typing import Iterator
+
+from sqlalchemy import select
+
+from config import settings
+from database import SessionLocal
+from models import Client, Company, Staff, Task
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.csv: "text/csv; charset=utf-8",
+    ExportFormat.ndjson: "application/x-ndjson",
+}
+
+def task_export_stmt(*criteria):
+    return (
+        select(
+            Task.id.label("task_id"),
+            Task.start_date,
+            Task.start_time,
+            Task.end_date,
+            Task.end_time,
+            Task.hours,
+            Task.service_type,
+            Task.done,
+            Task.done_time,
+            Task.approved,
+            Task.staff_id,
+            Staff.given_name.label("staff_given_name"),
+            Staff.surname.label("staff_surname"),
+            Task.client_id,
+            Client.given_name.label("client_given_name"),
+            Client.surname.label("client_surname"),
+            Client.ndi.label("client_ndis"),
+            Staff.company_id,
+            Company.name.label("company_name"),
+        )
+        .outerjoin(Staff, Staff.id == Task.staff_id)
+        .outerjoin(Client, Client.id == Task.client_id)
+        .outerjoin(Company, Company.id == Staff.company_id)
+        .where(*criteria)
+        # the (start_date, id) index of the /all-tasks paging
+        .order_by(Task.start_date, Task.id)
+    )
+
+EXPORT_COLUMNS = [column.name for column in task_export_stmt().selected_columns]
+
+def _json_value(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+# text cells a spreadsheet would run as a formula (names and notes are user input)
+# get a leading quote, so the export opens as plain text
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def _csv_value(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def _csv_chunk(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+def _ndjson_chunk(rows) -> bytes:
+    return "".join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=_json_value) + "\n" for row in rows
+    ).encode()
+
+# body of the StreamingResponse, a plain generator so starlette runs it in the threadpool
+def iter_task_export(format: ExportFormat, criteria: list, batch_size: int | None = None) -> Iterator[bytes]:
+    write = _csv_chunk if format == ExportFormat.csv else _ndjson_chunk
+    if format == ExportFormat.csv:
+        yield _csv_chunk([EXPORT_COLUMNS])
+    with SessionLocal() as db:
+        result = db.execute(
+            task_export_stmt(*criteria),
+            execution_options={"stream_results": True, "yield_per": batch_size or settings.export_batch_size},
+        )
+        for rows in result.partitions():
+            yield write(rows)
@@ -0,0 +1,85 @@
+# bounded executor for password hashing
+# bcrypt takes ~200ms of cpu per hash/verify, run on the event loop it froze the whole
+# worker on every login. bcrypt releases the GIL while hashing, so a small thread pool
+# runs hashes in parallel without blocking the loop. work beyond workers + queue_limit
+# is rejected with HashingPoolFull (503) instead of piling up behind a login rush
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+class HashingPoolFull(Exception):
+    pass
+
+class HashingPool:
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hashing")
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._hash_total = 0.0
+        self._hash_max = 0.0
+
+    # wait blocks until a slot frees up instead of rejecting, for bulk work off the loop
+    def submit(self, fn, *args, wait: bool = False) -> Future:
+        if not self._slots.acquire(blocking=wait):
+            with self._lock:
+                self._rejected += 1
+            raise HashingPoolFull()
+        enqueued_at = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+
+        def job():
+            started_at = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._wait_total += started_at - enqueued_at
+            try:
+                return fn(*args)
+            finally:
+                elapsed = time.perf_counter() - started_at
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+                    self._hash_total += elapsed
+                    self._hash_max = max(self._hash_max, elapsed)
+                self._slots.release()
+
+        try:
+            return self._executor.submit(job)
+        except BaseException:
+            with self._lock:
+                self._queued -= 1
+            self._slots.release()
+            raise
+
+    # blocking call, for sync routes (they already run in the threadpool) and scripts
+    def run(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+    # awaitable call, for async routes
+    async def run_async(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def metrics(self) -> dict:
+        with self._lock:
+            completed = self._completed
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "queue_depth": self._queued,
+                "running": self._running,
+                "completed": completed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._wait_total / completed * 1000, 2) if completed else 0.0,
+                "avg_hash_ms": round(self._hash_total / completed * 1000, 2) if completed else 0.0,
+                "max_hash_ms": round(self._hash_max * 1000, 2),
+            }
@@ -0,0 +1,246 @@
+# bulk import of participants and staff, with their logins
+# onboarding a provider used to be one /register plus one /register-participant (or
+# /register-staff) call per person, each with its own existence checks and commit.
+# here a csv (header row) or jsonl file is read and validated record by record, and
+# every batch is checked with one set query per unique key (username, ndis, company,
+# picture) and written with two executemany inserts in a single transaction. a batch
+# the database still refuses (a username registered meanwhile) is retried row by row
+# in savepoints, so every record ends up imported or reported with its line number.
+# used by POST /admin/import/{kind} and scripts/import_people.py
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import BinaryIO, Iterator
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config import settings
+from models import Blob, Client, Company, Staff, User
+from auth.blobs import IMAGE_KIND, BlobGone, acquire_blobs
+from auth.schemas import STAFF_RENAMES, ClientImport, StaffImport, orm_values
+from auth.utils import hash_passwords, pwd_context
+
+class ImportKind(str, Enum):
+    participants = "participants"
+    staff = "staff"
+
+class ImportFormat(str, Enum):
+    csv = "csv"
+    jsonl = "jsonl"
+
+@dataclass(frozen=True)
+class ImportTarget:
+    schema: type[BaseModel]
+    model: type
+    role: str
+    renames: dict
+
+IMPORT_TARGETS = {
+    ImportKind.participants: ImportTarget(ClientImport, Client, "client", {}),
+    ImportKind.staff: ImportTarget(StaffImport, Staff, "staff", STAFF_RENAMES),
+}
+
+FORMAT_SUFFIXES = {".csv": ImportFormat.csv, ".jsonl": ImportFormat.jsonl, ".ndjson": ImportFormat.jsonl}
+
+def import_format(filename: str | None) -> ImportFormat | None:
+    for suffix, format in FORMAT_SUFFIXES.items():
+        if (filename or "").lower().endswith(suffix):
+            return format
+    return None
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    failed: int = 0
+    errors: list[dict] = field(default_factory=list)
+    # pictures of the imported rows, for the thumbnail worker
+    image_paths: set[str] = field(default_factory=set)
+
+    def fail(self, line: int, error: str):
+        self.failed += 1
+        # the count stays exact, the list is capped to keep the response small
+        if len(self.errors) < settings.import_max_errors:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self) -> dict:
+        # records failing validation are reported as they are read, the others per batch
+        errors = sorted(self.errors, key=lambda error: error["line"])
+        return {"imported": self.imported, "failed": self.failed, "errors": errors}
+
+# (line, record or error) of every record in the file, the file is read as it goes
+def read_records(stream: BinaryIO, format: ImportFormat) -> Iterator[tuple[int, dict | str]]:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if format == ImportFormat.csv:
+        reader = csv.DictReader(text)
+        for row in reader:
+            # line_num is the line the record ends on, quoted values may span lines
+            if None in row:
+                yield reader.line_num, "More values than columns in the header"
+            else:
+                # empty cells are missing values
+                yield reader.line_num, {key: value if value != "" else None for key, value in row.items()}
+        return
+    for line, raw in enumerate(text, start=1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError as e:
+            yield line, f"Invalid JSON: {e}"
+            continue
+        yield line, record if isinstance(record, dict) else "Every line must be a JSON object"
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" if e["loc"] else e["msg"]
+        for e in error.errors()
+    )
+
+class BulkImport:
+    def __init__(self, db: Session, kind: ImportKind, batch_size: int | None = None):
+        self.db = db
+        self.target = IMPORT_TARGETS[kind]
+        self.batch_size = batch_size or settings.import_batch_size
+        self.report = ImportReport()
+        # usernames and ndis numbers taken by earlier records of the same file
+        self._usernames: set[str] = set()
+        self._ndis: set[str] = set()
+        self._companies: set[int] = set()
+
+    def run(self, records: Iterator[tuple[int, dict | str]]) -> ImportReport:
+        batch = []
+        for line, record in records:
+            if isinstance(record, str):
+                self.report.fail(line, record)
+                continue
+            try:
+                batch.append((line, self.target.schema.model_validate(record)))
+            except ValidationError as e:
+                self.report.fail(line, validation_message(e))
+                continue
+            if len(batch) >= self.batch_size:
+                self._import_batch(batch)
+                batch = []
+        if batch:
+            self._import_batch(batch)
+        return self.report
+
+    # the batch's keys already in the database, one query per key
+    def _lookups(self, batch) -> tuple[set, set, dict]:
+        db = self.db
+        usernames = {record.username for _, record in batch}
+        taken = set(db.execute(select(User.username).where(User.username.in_(usernames))).scalars())
+
+        companies = {record.company_id for _, record in batch if record.company_id is not None} - self._companies
+        if companies:
+            self._companies.update(db.execute(select(Company.id).where(Company.id.in_(companies))).scalars())
+
+        ndis = set()
+        if self.target.model is Client:
+            numbers = {record.ndi for _, record in batch}
+            ndis = set(db.execute(select(Client.ndi).where(Client.ndi.in_(numbers))).scalars())
+
+        image_ids = {record.image_id for _, record in batch if record.image_id}
+        images = {}
+        if image_ids:
+            # pictures checked by /profile-images, locked until the batch commits and counts the references
+            images = dict(db.execute(
+                select(Blob.sha256, Blob.path)
+                .where(Blob.sha256.in_(image_ids), Blob.kind == IMAGE_KIND)
+                .order_by(Blob.path).with_for_update()
+            ).all())
+        return taken, ndis, images
+
+    def _check(self, record, taken: set, ndis: set, images: dict) -> str | None:
+        if record.username in taken or record.username in self._usernames:
+            return "Username already exists! Choose another one."
+        if self.target.model is Client and (record.ndi in ndis or record.ndi in self._ndis):
+            return "A Participant with this Ndis already exists!"
+        if record.company_id not in self._companies:
+            return "Company does not exist! Check the company ID."
+        if record.image_id and record.image_id not in images:
+            return "Profile picture not found! Upload it first."
+        if not record.password and not pwd_context.identify(record.password_hash):
+            return "password_hash is not a bcrypt hash"
+        return None
+
+    def _import_batch(self, batch):
+        taken, ndis, images = self._lookups(batch)
+        rows = []
+        for line, record in batch:
+            error = self._check(record, taken, ndis, images)
+            if error:
+                self.report.fail(line, error)
+                continue
+            self._usernames.add(record.username)
+            if self.target.model is Client:
+                self._ndis.add(record.ndi)
+            rows.append((line, record, images.get(record.image_id)))
+        if not rows:
+            return
+
+        # only rows that passed the checks are hashed, bcrypt is the slow part
+        to_hash = [record.password for _, record, _ in rows if record.password]
+        hashes = iter(hash_passwords(to_hash))
+        users = [
+            {
+                "username": record.username,
+                # imported logins keep only the hash, the plaintext is not written
+                "password": "",
+                "password_hash": next(hashes) if record.password else record.password_hash,
+                "role": self.target.role,
+            }
+            for _, record, _ in rows
+        ]
+
+        try:
+            self._insert_batch(rows, users)
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            self._insert_rows(rows, users)
+            return
+        self.report.imported += len(rows)
+        self.report.image_paths.update(path for _, _, path in rows if path)
+
+    def _profile(self, record, user_id: int, image_path: str | None) -> dict:
+        return orm_values(record, self.target.model, self.target.renames, user_id=user_id, image_path=image_path)
+
+    def _insert_batch(self, rows, users):
+        db = self.db
+        db.execute(insert(User), users)
+        # mysql returns no ids from an executemany, the usernames are unique
+        ids = dict(db.execute(
+            select(User.username, User.id).where(User.username.in_([user["username"] for user in users]))
+        ).all())
+        db.execute(
+            insert(self.target.model),
+            [self._profile(record, ids[record.username], path) for _, record, path in rows],
+        )
+        acquire_blobs(db, (path for _, _, path in rows))
+
+    # one savepoint per row, for a batch the database refused as a whole
+    def _insert_rows(self, rows, users):
+        db = self.db
+        for (line, record, path), user in zip(rows, users):
+            try:
+                with db.begin_nested():
+                    user_id = db.execute(insert(User).values(**user)).inserted_primary_key[0]
+                    db.execute(insert(self.target.model).values(**self._profile(record, user_id, path)))
+                    acquire_blobs(db, [path])
+            except IntegrityError as e:
+                self.report.fail(line, f"Rejected by the database: {e.orig}")
+                continue
+            except BlobGone:
+                # the batch's rollback let go of the picture's lock
+                self.report.fail(line, "Profile picture not found! Upload it first.")
+                continue
+            self.report.imported += 1
+            if path:
+                self.report.image_paths.add(path)
+        db.commit()
@@ -0,0 +1,174 @@
+# serving of uploaded files, replaces the StaticFiles mount on /uploads
+# blob urls (uploads/blobs/...) are named by the sha256 of their content, so they never
+# change and are sent with a year long immutable cache-control, the browser does not
+# even revalidate them. everything else (files from before the blob store, the company
+# logo route) gets a strong etag and is revalidated, unchanged files answer 304.
+# single byte ranges are served as 206 so videos can seek, and small hot files (logos,
+# thumbnails) are kept in an in-memory lru so they skip the disk
+import mimetypes
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+from config import settings
+from auth.blobs import BLOB_ROOT, BLOB_TMP, UPLOAD_ROOT
+
+router = APIRouter()
+
+IMMUTABLE_CACHE_CONTROL = f"private, max-age={settings.media_max_age}, immutable"
+# not content addressed, cache but always check the etag
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+# stable urls pointing at changing files, checked again after a few minutes
+SHORT_CACHE_CONTROL = "private, max-age=300"
+
+class MediaCache:
+    def __init__(self, max_bytes: int, max_file_size: int):
+        self.max_bytes = max_bytes
+        self.max_file_size = max_file_size
+        self._entries: OrderedDict[Path, tuple[tuple, bytes]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    # version is (mtime, size) of the file, a file changed on disk is read again
+    def get(self, path: Path, version: tuple) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != version:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(path)
+            self._hits += 1
+            return entry[1]
+
+    def set(self, path: Path, version: tuple, data: bytes):
+        if len(data) > self.max_file_size:
+            return
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[path] = (version, data)
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+media_cache = MediaCache(settings.media_cache_bytes, settings.media_cache_file_size)
+
+# the stored path (uploads/...) as a file inside the uploads directory, or 404
+def resolve_media_path(stored_path: str) -> Path:
+    root = UPLOAD_ROOT.resolve()
+    path = Path(stored_path).resolve()
+    if not path.is_relative_to(root) or path.is_relative_to(BLOB_TMP.resolve()) or not path.is_file():
+        raise HTTPException(status_code=404, detail="File not found")
+    return path
+
+def is_immutable(path: Path) -> bool:
+    return path.is_relative_to(BLOB_ROOT.resolve())
+
+def media_etag(path: Path, stat) -> str:
+    # blobs and their variants are named by their content hash already
+    if is_immutable(path):
+        return f'"{path.stem}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+def etag_matches(header: str, etag: str) -> bool:
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+# (start, end) of a single "bytes=" range, end inclusive. None serves the whole file,
+# which is also the answer to multiple ranges
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    start, _, end = ranges.strip().partition("-")
+    try:
+        if start:
+            first = int(start)
+            last = min(int(end), size - 1) if end else size - 1
+        else:
+            # suffix range, the last n bytes
+            first = max(size - int(end), 0)
+            last = size - 1
+    except ValueError:
+        return None
+    if first >= size:
+        raise HTTPException(
+            status_code=416, detail="Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"}
+        )
+    # last before first (bytes=5-3) is an invalid range, ignored like an unknown unit
+    if first > last:
+        return None
+    return first, last
+
+async def _read_range(path: Path, start: int, end: int):
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(settings.upload_chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+async def serve_media(request: Request, stored_path: str, cache_control: str | None = None) -> Response:
+    path = resolve_media_path(stored_path)
+    stat = await anyio.Path(path).stat()
+    size = stat.st_size
+    etag = media_etag(path, stat)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control or (IMMUTABLE_CACHE_CONTROL if is_immutable(path) else REVALIDATE_CACHE_CONTROL),
+        "Accept-Ranges": "bytes",
+    }
+    media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header and etag_matches(request.headers.get("if-range", etag), etag):
+        byte_range = parse_range(range_header, size)
+    start, end = byte_range or (0, size - 1)
+    status_code = 206 if byte_range else 200
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1 if size else 0)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+
+    if size <= media_cache.max_file_size:
+        version = (stat.st_mtime_ns, size)
+        data = media_cache.get(path, version)
+        if data is None:
+            data = await anyio.Path(path).read_bytes()
+            media_cache.set(path, version, data)
+        return Response(data[start:end + 1], status_code=status_code, headers=headers, media_type=media_type)
+
+    return StreamingResponse(_read_range(path, start, end), status_code=status_code, headers=headers, media_type=media_type)
+
+# the uploads directory, same urls as the old static mount
+@router.api_route("/uploads/{file_path:path}", methods=["GET", "HEAD"])
+async def get_media_file(file_path: str, request: Request):
+    return await serve_media(request, str(UPLOAD_ROOT / file_path))
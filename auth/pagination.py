@@ -0,0 +1,61 @@
+# keyset (cursor) pagination helpers shared by the list routes
+# the cursor is an opaque urlsafe-base64 json list of the sort key values of the
+# last row on the page, the next page starts strictly after that key
+import base64
+import json
+from datetime import date, datetime, time
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _json_default(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+def encode_cursor(values) -> str:
+    raw = json.dumps(list(values), default=_json_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor!")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor!")
+    return values
+
+# comparisons of a nullable key, nulls sort before everything else in mysql
+def _equal(key, value):
+    return key.is_(None) if value is None else key == value
+
+def _after(key, value):
+    return key.is_not(None) if value is None else key > value
+
+def after_key(keys, values):
+    # (k1, k2, k3) > (v1, v2, v3) spelled out as an OR chain, mysql only does a
+    # range scan on the index for the expanded form, not for row constructors
+    clauses = []
+    for i, (key, value) in enumerate(zip(keys, values)):
+        equal_prefix = [_equal(k, v) for k, v in zip(keys[:i], values[:i])]
+        clauses.append(and_(*equal_prefix, _after(key, value)))
+    return or_(*clauses)
+
+def paginate(stmt, keys, cursor_values, limit: int):
+    # orders by the keys and fetches one extra row to know if there is a next page
+    if cursor_values is not None:
+        stmt = stmt.where(after_key(keys, cursor_values))
+    return stmt.order_by(*keys).limit(limit + 1)
+
+def trim_page(rows, limit: int, response: Response, key):
+    # drop the extra row and hand the cursor for the next page to the client
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key(rows[-1]))
+    return rows
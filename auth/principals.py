@@ -0,0 +1,88 @@
+# in-process cache of the authenticated principal
+# get_current_user used to select the user on every request and most task routes then
+# looked up the staff/client row again, the principal carries those ids for a short ttl.
+# the cache is per worker process, entries are dropped by the routes that change a
+# user's role, company or client/staff row, other workers catch up when the ttl runs out
+import threading
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import func, select
+
+from config import settings
+from models import User, Client, Staff
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    username: str
+    role: str
+    staff_id: int | None = None
+    client_id: int | None = None
+    company_id: int | None = None
+
+class PrincipalCache:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: dict[int, tuple[float, Principal]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Principal | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            return principal
+
+    def set(self, principal: Principal):
+        with self._lock:
+            if principal.id not in self._entries and len(self._entries) >= self.max_entries:
+                # dicts keep insertion order, the first key is the oldest entry
+                del self._entries[next(iter(self._entries))]
+            self._entries[principal.id] = (time.monotonic() + self.ttl, principal)
+
+    def invalidate(self, *user_ids: int):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+principal_cache = PrincipalCache(settings.principal_cache_ttl, settings.principal_cache_size)
+
+def principal_stmt(user_id: int):
+    return (
+        select(
+            User.id,
+            User.username,
+            User.role,
+            Staff.id.label("staff_id"),
+            Client.id.label("client_id"),
+            func.coalesce(Staff.company_id, Client.company_id).label("company_id"),
+        )
+        .outerjoin(Staff, Staff.user_id == User.id)
+        .outerjoin(Client, Client.user_id == User.id)
+        .where(User.id == user_id)
+        .limit(1)
+    )
+
+async def load_principal(db, user_id: int) -> Principal | None:
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    row = (await db.execute(principal_stmt(user_id))).first()
+    if row is None:
+        return None
+    principal = Principal(**row._asdict())
+    principal_cache.set(principal)
+    return principal
+
+def invalidate_principal(*user_ids: int):
+    principal_cache.invalidate(*user_ids)
@@ -0,0 +1,248 @@
+# column projections for the list routes
+# each one is a single select over the joined tables returning only the columns
+# the response schema needs, rows are turned into schemas without building orm objects
+from collections import defaultdict
+from typing import Literal
+
+from sqlalchemy import and_, func, or_, select
+
+from models import User, Client, Staff, Company, Task, Media
+from auth.schemas import ReadUserDetails, TaskReadDetails, ReadClientInfo, ReadStaffInfo
+
+# max ids per IN (...) list when batching the media lookup
+MEDIA_BATCH_SIZE = 1000
+
+# joining the name with null handling, given name + surname
+def full_name(given_name, surname):
+    return (given_name + " " if given_name else "") + (surname + " " if surname else "")
+
+# >>>>>> users with their client/staff contact details and company name
+def user_details_stmt(role: str | None = None, company_id: int | None = None):
+    # client/staff rows are only joined for the matching role, like the old per-user lookups
+    client_join = and_(Client.user_id == User.id, User.role == "client")
+    staff_join = and_(Staff.user_id == User.id, User.role == "staff")
+    stmt = (
+        select(
+            User.id,
+            User.username,
+            User.role,
+            func.coalesce(Client.given_name, Staff.given_name).label("given_name"),
+            func.coalesce(Client.surname, Staff.surname).label("surname"),
+            func.coalesce(Client.home_email, Staff.home_email).label("email"),
+            func.coalesce(Client.home_mobile, Staff.home_mobile).label("mobile"),
+            Company.name.label("company_name"),
+        )
+        .outerjoin(Client, client_join)
+        .outerjoin(Staff, staff_join)
+        .outerjoin(Company, Company.id == func.coalesce(Client.company_id, Staff.company_id))
+    )
+    if role:
+        stmt = stmt.where(User.role == role)
+    if company_id is not None:
+        stmt = stmt.where(or_(Client.company_id == company_id, Staff.company_id == company_id))
+    return stmt
+
+def user_details_from_row(row) -> ReadUserDetails:
+    # admins have no client/staff row, so they come back without name and contacts
+    name = full_name(row.given_name, row.surname) if row.role != "admin" else None
+    return ReadUserDetails(
+        id=row.id,
+        username=row.username,
+        role=row.role,
+        name=name,
+        email=row.email,
+        mobile=row.mobile,
+        company_name=row.company_name,
+    )
+
+# >>>>>> participant and staff directories of a company
+# username comes from the same joined select, sorted by name (or id) for keyset paging.
+# the name order is on the raw columns, read straight off ix_clients_company_name /
+# ix_staffs_company_name, people without a name come first (after_key handles the nulls)
+DirectorySort = Literal["name", "id"]
+
+def directory_keys(model, sort: DirectorySort):
+    if sort == "id":
+        return [model.id]
+    return [model.given_name, model.surname, model.id]
+
+def directory_cursor(row, sort: DirectorySort):
+    if sort == "id":
+        return [row.id]
+    return [row.given_name, row.surname, row.id]
+
+def client_directory_stmt(company_id: int):
+    return (
+        select(
+            Client.id,
+            Client.user_id,
+            User.username,
+            Client.given_name,
+            Client.surname,
+            Client.home_email,
+            Client.home_mobile,
+            Client.thumb_path,
+        )
+        .join(User, User.id == Client.user_id)
+        .where(Client.company_id == company_id)
+    )
+
+def staff_directory_stmt(company_id: int):
+    return (
+        select(
+            Staff.id,
+            User.username,
+            Staff.given_name,
+            Staff.surname,
+            Staff.home_email,
+            Staff.home_mobile,
+            Staff.thumb_path,
+        )
+        .join(User, User.id == Staff.user_id)
+        .where(Staff.company_id == company_id)
+    )
+
+def client_info_from_row(row) -> ReadClientInfo:
+    return ReadClientInfo(
+        id=row.id,
+        user_id=row.user_id,
+        username=row.username,
+        name=full_name(row.given_name, row.surname),
+        email=row.home_email,
+        mobile=row.home_mobile,
+        thumb_path=row.thumb_path,
+    )
+
+def staff_info_from_row(row) -> ReadStaffInfo:
+    return ReadStaffInfo(
+        id=row.id,
+        username=row.username,
+        name=full_name(row.given_name, row.surname),
+        email=row.home_email,
+        mobile=row.home_mobile,
+        thumb_path=row.thumb_path,
+    )
+
+# >>>>>> tasks with staff name, client name and media paths (and their thumbnails)
+# every route returning TaskReadDetails goes through these, the names come from one
+# joined select and the media from one IN (...) query per MEDIA_BATCH_SIZE tasks
+def task_details_stmt(*criteria):
+    return (
+        select(
+            Task.id,
+            Task.staff_id,
+            Task.client_id,
+            Task.start_date,
+            Task.start_time,
+            Task.end_date,
+            Task.end_time,
+            Task.hours,
+            Task.service_type,
+            Task.tasks_list,
+            Task.done,
+            Task.done_time,
+            Task.approved,
+            Staff.given_name.label("staff_given_name"),
+            Staff.surname.label("staff_surname"),
+            Client.given_name.label("client_given_name"),
+            Client.surname.label("client_surname"),
+        )
+        .outerjoin(Staff, Staff.id == Task.staff_id)
+        .outerjoin(Client, Client.id == Task.client_id)
+        .where(*criteria)
+    )
+
+# sql side filters of the task listings, all optional
+def task_criteria(
+    date_from=None,
+    date_to=None,
+    done: bool | None = None,
+    approved: bool | None = None,
+    staff_id: int | None = None,
+    client_id: int | None = None,
+    service_type: str | None = None,
+    company_id: int | None = None,
+):
+    criteria = []
+    if date_from is not None:
+        criteria.append(Task.start_date >= date_from)
+    if date_to is not None:
+        criteria.append(Task.start_date <= date_to)
+    if done is not None:
+        criteria.append(Task.done == done)
+    if approved is not None:
+        criteria.append(Task.approved == approved)
+    if staff_id is not None:
+        criteria.append(Task.staff_id == staff_id)
+    if client_id is not None:
+        criteria.append(Task.client_id == client_id)
+    if service_type:
+        criteria.append(Task.service_type == service_type)
+    if company_id is not None:
+        criteria.append(Staff.company_id == company_id)
+    return criteria
+
+def media_paths_stmt(task_ids):
+    return (
+        select(Media.task_id, Media.file_path, Media.thumb_path)
+        .where(Media.task_id.in_(task_ids))
+        .order_by(Media.id)
+    )
+
+def media_paths_stmts(task_ids):
+    for i in range(0, len(task_ids), MEDIA_BATCH_SIZE):
+        yield media_paths_stmt(task_ids[i:i + MEDIA_BATCH_SIZE])
+
+def media_paths_by_task(db, task_ids) -> dict:
+    media_files = defaultdict(list)
+    for stmt in media_paths_stmts(task_ids):
+        for row in db.execute(stmt):
+            media_files[row.task_id].append(row)
+    return media_files
+
+async def media_paths_by_task_async(db, task_ids) -> dict:
+    media_files = defaultdict(list)
+    for stmt in media_paths_stmts(task_ids):
+        for row in await db.execute(stmt):
+            media_files[row.task_id].append(row)
+    return media_files
+
+def task_details_from_row(row, media_files=None) -> TaskReadDetails:
+    media_files = media_files or []
+    return TaskReadDetails(
+        id=row.id,
+        staff_id=row.staff_id,
+        staff_name=full_name(row.staff_given_name, row.staff_surname),
+        client_id=row.client_id,
+        client_name=full_name(row.client_given_name, row.client_surname),
+        start_date=row.start_date,
+        start_time=row.start_time,
+        end_date=row.end_date,
+        end_time=row.end_time,
+        hours=row.hours,
+        service_type=row.service_type,
+        tasks_list=row.tasks_list,
+        done=row.done,
+        done_time=row.done_time,
+        approved=row.approved,
+        media_files=[media.file_path for media in media_files],
+        # same order as media_files, None until the thumbnail is made (or not a photo)
+        media_thumbs=[media.thumb_path for media in media_files],
+    )
+
+def task_details_from_rows(db, rows, with_media: bool = True) -> list[TaskReadDetails]:
+    media_files = media_paths_by_task(db, [row.id for row in rows]) if with_media and rows else {}
+    return [task_details_from_row(row, media_files.get(row.id, [])) for row in rows]
+
+async def task_details_from_rows_async(db, rows, with_media: bool = True) -> list[TaskReadDetails]:
+    media_files = await media_paths_by_task_async(db, [row.id for row in rows]) if with_media and rows else {}
+    return [task_details_from_row(row, media_files.get(row.id, [])) for row in rows]
+
+# listings are in (start_date, id) order, which the (staff_id|client_id, start_date) indexes serve
+def read_task_details(db, *criteria, with_media: bool = True) -> list[TaskReadDetails]:
+    rows = db.execute(task_details_stmt(*criteria).order_by(Task.start_date, Task.id)).all()
+    return task_details_from_rows(db, rows, with_media=with_media)
+
+async def read_task_details_async(db, *criteria, with_media: bool = True) -> list[TaskReadDetails]:
+    rows = (await db.execute(task_details_stmt(*criteria).order_by(Task.start_date, Task.id))).all()
+    return await task_details_from_rows_async(db, rows, with_media=with_media)
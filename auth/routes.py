@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException, Depends, status,File, UploadFile
+from fastapi import APIRouter, HTTPException, Depends, status,File, UploadFile, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pathlib import Path
-from database import get_db
+from database import get_db, get_async_db
+from sqlalchemy.ext.asyncio import AsyncSession
 from auth.utils import hash_password, verify_password, verify_access_token, create_access_token, authenticate_user, role_required, get_current_user
 from auth.schemas import *
 from sqlalchemy.orm import Session, load_only
@@ -8,15 +10,37 @@ from models import *
 from fastapi.security import OAuth2PasswordRequestForm
 # from jose import JWTError, jwt
 from pydantic import BaseModel
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 # from database import SessionLocal, engine
-from sqlalchemy.sql.expression import select
+from sqlalchemy.sql.expression import insert, select
 from typing import Optional, Annotated, List
 from config import settings
+from cache import response_cache
 from sqlalchemy.orm import joinedload
+from auth.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, paginate, trim_page
+from auth.scheduling import busy_intervals_stmt, busy_staff_stmt, expand_roster, find_conflicts, has_overlap, rank_available_staff
+from auth.blobs import IMAGE_KIND, store_upload
+from auth.uploads import sniff_image
+from auth.media import SHORT_CACHE_CONTROL, serve_media
+from auth.derivatives import derivative_worker
+from auth.principals import Principal, invalidate_principal
+from auth.responses import json_list_response, orm_list_response
+from auth.imports import BulkImport, ImportFormat, ImportKind, import_format, read_records
+from auth.exports import EXPORT_MEDIA_TYPES, ExportFormat, iter_task_export
+from auth.summaries import (
+    SummaryGroup, SummaryPeriod, add_task_hours, hours_summary_stmt, fold_fortnights, week_start,
+    company_week_hours_stmt,
+)
+from auth.deletions import company_user_ids, delete_cascade
+from auth.projections import (
+    full_name, user_details_stmt, user_details_from_row,
+    task_criteria, task_details_stmt, task_details_from_rows_async, read_task_details, read_task_details_async,
+    DirectorySort, directory_keys, directory_cursor, client_directory_stmt, staff_directory_stmt,
+    client_info_from_row, staff_info_from_row,
+)
 
 router = APIRouter()
-user_dependency = Annotated[Session, Depends(get_current_user)]
+user_dependency = Annotated[Principal, Depends(get_current_user)]
 
 # Define a Pydantic model for the login request body
 class LoginRequest(BaseModel):
@@ -42,9 +66,9 @@ def login_user(login_data: LoginRequest, db: Session = Depends(get_db)):
     }
 
 @router.post("/token")
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):    
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):    
     
-    user = authenticate_user(form_data.username, form_data.password, db)
+    user = await authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -87,7 +111,7 @@ def register_user(
 
     try:
         # Try to Create and save the user
-        new_user = User(**user.dict(), password_hash=hashed_password)
+        new_user = User(**user.model_dump(), password_hash=hashed_password)
         db.add(new_user)
         db.commit()
         db.refresh(new_user)
@@ -106,54 +130,21 @@ def get_all_users(db: Session = Depends(get_db)):
     return user_data
 
 # getting all-users and their specific infos
-@router.get("/admin/all-users") # add role based dependency later
-def get_all_users(db: Session = Depends(get_db)):
-    # returing a list of users with their details
-    users = db.query(User).options(load_only(User.id, User.username, User.role)).all()
-    admin_users = db.query(User).filter(User.role == "admin").all()
-    # users_details = []
-    users_details = [admin for admin in admin_users] # including admin info
-    for user in users:
-        if user.role == "client":
-            details = db.query(Client).filter(Client.user_id == user.id).first()
-            # adding information seperately for now, because the table have difference in column naming
-            name = (details.given_name + " " if details.given_name else "") + (details.surname + " " if details.surname else "") # sending given name + surname  
-
-            company = db.query(Company).filter(Company.id == details.company_id).first()
-
-            user_details = ReadUserDetails(
-                id = user.id,
-                username = user.username,
-                role = user.role,
-                name = name,
-                email = details.home_email,
-                mobile = details.home_mobile,
-                company_name = company.name,
-            )
-            users_details.append(user_details)
-            
-        if user.role == "staff":
-            details = db.query(Staff).filter(Staff.user_id == user.id).first()
-            # title = details.title
-            # given_name = details.given_name            
-            # surname = details.surname
-            # preferred_name = details.preferred_name
-            # joining the name with null handling
-            name = (details.given_name + " " if details.given_name else "") + (details.surname + " " if details.surname else "") # sending given name + surname  
-
-            company = db.query(Company).filter(Company.id == details.company_id).first()
-        
-            user_details = ReadUserDetails(
-                id = user.id,
-                username = user.username,
-                role = user.role,
-                name = name,
-                email = details.home_email,
-                mobile = details.home_mobile,
-                company_name = company.name,
-            )
-            users_details.append(user_details)   
-    return users_details
+@router.get("/admin/all-users", response_model=List[ReadUserDetails]) # add role based dependency later
+def get_all_users(
+    response: Response,
+    role: Optional[UserRole] = None,
+    company_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    ):
+    # one outer join over users, clients, staffs and companies, paged by user id
+    cursor_values = decode_cursor(cursor, 1) if cursor else None
+    stmt = user_details_stmt(role=role.value if role else None, company_id=company_id)
+    rows = db.execute(paginate(stmt, [User.id], cursor_values, limit)).all()
+    rows = trim_page(rows, limit, response, key=lambda row: [row.id])
+    return json_list_response(user_details_list_adapter, [user_details_from_row(row) for row in rows], response)
 
 # get user by user_id
 @router.get("/users/{user_id}")
@@ -187,6 +178,7 @@ def update_user(userId: int, user_update: UserUpdate, db: Session = Depends(get_
     
     db.commit()
     db.refresh(user)
+    invalidate_principal(userId)
     
     return {"message": "User updated successfully", "user": user}
 
@@ -198,39 +190,91 @@ def delete_user(userId: int, db: Session = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
-    if user.role == "client":
-        ob_client = db.query(Client).filter(Client.user_id == userId).first()
-        if ob_client:
-            # Delete all tasks associated with this client
-            db.query(Task).filter(Task.client_id == ob_client.id).delete()
-            db.commit()
-            # Now delete the client record
-            db.delete(ob_client)
-            db.commit()
-
-    # Manually delete associated staffs and their tasks
-    if user.role == "staff":
-        ob_staff = db.query(Staff).filter(Staff.user_id == userId).first()
-        if ob_staff:
-            # Delete all tasks associated with this staff
-            db.query(Task).filter(Task.staff_id == ob_staff.id).delete()
-            db.commit()
-            db.delete(ob_staff)
-            db.commit()
-
-    db.delete(user)
+    # the user's participant or staff profile, its tasks and their media go with it.
+    # the loaded user is detached first, it is still returned below
+    db.expunge(user)
+    delete_cascade(db, user_ids=[userId])
     db.commit()
+    invalidate_principal(userId)
+    response_cache.invalidate("staff", "client")
     return {"message": "User deleted successfully", "user": user}
 
 # get current user
 @router.get("/users/me")
 async def get_current_user_info(
-    current_user: UserRead = Depends(get_current_user),
-    # current_user: user_dependency,
+    current_user: user_dependency,
     # db: Session = Depends(get_db)
     ):
     return current_user
 
+# upload a profile picture for a participant or staff, streamed into the blob store.
+# registration and update refer to it by the returned id instead of a base64 image in the json
+@router.post("/profile-images", response_model=ProfileImageRead)
+async def upload_profile_image(
+    current_user: user_dependency,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_async_db),
+    ):
+    # check the type from the first bytes before anything is written
+    suffix = sniff_image(await file.read(16))
+    await file.seek(0)
+    if suffix is None:
+        raise HTTPException(status_code=415, detail="Profile picture must be a JPEG, PNG, GIF or WebP image!")
+
+    saved = await store_upload(db, file, max_size=settings.max_profile_image_size, suffix=suffix, kind=IMAGE_KIND)
+    await db.commit()
+    # start on the thumbnails before the picture is even used
+    derivative_worker.submit(str(saved.path))
+    return ProfileImageRead(id=saved.sha256, path=str(saved.path), size=saved.size)
+
+# blob path of an uploaded profile picture, its row stays locked until the commit
+# that counts the new reference. only blobs checked as images by /profile-images,
+# not the pdfs and videos uploaded as task media
+def profile_image_stmt(image_id: str):
+    return select(Blob.path).where(Blob.sha256 == image_id, Blob.kind == IMAGE_KIND).with_for_update()
+
+def profile_image_path(db: Session, image_id: str) -> str:
+    path = db.execute(profile_image_stmt(image_id)).scalar()
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile picture not found! Upload it first.")
+    return path
+
+async def profile_image_path_async(db: AsyncSession, image_id: str) -> str:
+    path = (await db.execute(profile_image_stmt(image_id))).scalar()
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile picture not found! Upload it first.")
+    return path
+
+# points a participant/staff at a new picture, its thumbnails follow from the worker
+def set_profile_image(row, path: str | None):
+    row.image_path = path
+    row.thumb_path = row.medium_path = row.webp_path = None
+
+# bulk import of participants or staff together with their logins, a csv with a header
+# row or a jsonl file, one record per person: username, password and the fields of
+# register-participant/register-staff. answers with the per-line errors
+@router.post("/admin/import/{kind}")
+def import_people(
+    kind: ImportKind,
+    current_user: user_dependency,
+    file: UploadFile = File(...),
+    format: Optional[ImportFormat] = None,
+    db: Session = Depends(get_db),
+    ):
+    if current_user.role != 'admin':
+        raise HTTPException(status_code=400, detail="Not authorized to perform this action!")
+
+    format = format or import_format(file.filename)
+    if format is None:
+        raise HTTPException(status_code=400, detail="Unknown file format! Upload a .csv or .jsonl file.")
+
+    report = BulkImport(db, kind).run(read_records(file.file, format))
+    if report.imported:
+        response_cache.invalidate("client" if kind == ImportKind.participants else "staff")
+    for path in report.image_paths:
+        derivative_worker.submit(path)
+    return report.as_dict()
+
 # creating client
 @router.post("/register-participant/{userId}")
 def register_client(
@@ -260,162 +304,45 @@ def register_client(
         raise HTTPException(status_code=404, detail="Company does not exist! Check the company ID.")
     # If company information is needed
 
-    file_path = None
-    # Process the base64 image
-    if client.image:
-        image_data_bytes = base64.b64decode(client.image.split(",")[1])
-        upload_dir = Path("uploads/profile_pics/") / str(userId)
-        upload_dir.mkdir(parents=True, exist_ok=True)
-        file_path = upload_dir / f"{userId}.jpg"
-        with open(f"{upload_dir}/{userId}.jpg", "wb") as image_file:
-            image_file.write(image_data_bytes)
+    # picture uploaded beforehand through /profile-images
+    file_path = profile_image_path(db, client.image_id) if client.image_id else None
     
     # Create the client
-    db_client = Client(
-        user_id=userId,
-        disability=client.disability,
-        ndi=client.ndi,
-        company_id=client.company_id,
-        reference=client.reference,
-        image_path=str(file_path),
-        # New fields for additional information
-        date_of_reg=client.date_of_reg,
-        plan_start_date = client.plan_start_date,
-        plan_end_date = client.plan_end_date,
-
-        surname=client.surname,
-        given_name=client.given_name,
-        sex=client.sex,
-        aboriginal=client.aboriginal,
-        preferred_name=client.preferred_name,
-        date_of_birth=client.date_of_birth,
-        residence_street=client.residence_street,
-        residence_state=client.residence_state,
-        residence_postcode=client.residence_postcode,
-        postal_street=client.postal_street,
-        postal_state=client.postal_state,
-        postal_postcode=client.postal_postcode,
-        home_mobile=client.home_mobile, # renamed mobile_phone to home_mobile in model, db and shcema
-        home_phone=client.home_phone,
-        home_email=client.home_email, # renamed email to home_email in model, db and schema
-        ndis_start_date=client.ndis_start_date,
-        ndis_end_date=client.ndis_end_date,
-        ndis_plan_review_date=client.ndis_plan_review_date, # added ndis_plan_review_date in model, db and schema
-        funding_type=client.funding_type,
-        plan_provider_name=client.plan_provider_name,
-        plan_provider_email=client.plan_provider_email,
-        plan_provider_phone=client.plan_provider_phone,
-        registered_other_ndis=client.registered_other_ndis,
-        service_received_other_ndis=client.service_received_other_ndis,
-        adv_surname=client.adv_surname,
-        adv_given_name=client.adv_given_name,
-        adv_relationship=client.adv_relationship,
-        adv_phone=client.adv_phone,
-        adv_mobile=client.adv_mobile,
-        adv_email=client.adv_email,
-        adv_address=client.adv_address,
-        adv_postal_address=client.adv_postal_address,
-        birth_country=client.birth_country,
-        main_language=client.main_language,
-        lang_interpreter_required=client.lang_interpreter_required,
-        cultural_bariers=client.cultural_bariers,
-
-        verbal_communication=client.verbal_communication, # added verbal_communication in model, db, schema and route
-        interpreter_needed=client.interpreter_needed, # added interpreter_needed in model, db, schema and route
-        interpreter_language=client.interpreter_language, # added interpreter_language in model, db, schema and route
-
-        cultural_values=client.cultural_values,
-        cultural_behaviours=client.cultural_behaviours,
-        communication_literacy=client.communication_literacy,
-        weight=client.weight,
-        height=client.height,
-        eye_color=client.eye_color,
-        complexion=client.complexion,
-        build=client.build,
-        hair_color=client.hair_color,
-        facial_hair=client.facial_hair,
-        birth_marks=client.birth_marks,
-        tattos=client.tattos,
-        emergency1_name=client.emergency1_name,
-        emergency1_relationship=client.emergency1_relationship,
-        emergency1_mobile=client.emergency1_mobile,
-        emergency1_phone=client.emergency1_phone,
-        emergency2_name=client.emergency2_name,
-        emergency2_relationship=client.emergency2_relationship,
-        emergency2_mobile=client.emergency2_mobile,
-        emergency2_phone=client.emergency2_phone,
-        gp_clinic_name=client.gp_clinic_name,
-        gp_firstname=client.gp_firstname,
-        gp_surname=client.gp_surname,
-        gp_email=client.gp_email,
-        gp_address=client.gp_address,
-        gp_phone=client.gp_phone,
-        gp_mobile=client.gp_mobile,
-        support_contact_name=client.support_contact_name,
-        support_relationship=client.support_relationship,
-        support_mobile=client.support_mobile,
-        support_phone=client.support_phone,
-        have_specialist=client.have_specialist,
-        specialist_clinic_name=client.specialist_clinic_name,
-        specialist_email=client.specialist_email,
-        specialist_firstname=client.specialist_firstname,
-        specialist_surname=client.specialist_surname,
-        specialist_address=client.specialist_address,
-        specialist_mobile=client.specialist_mobile,
-        specialist_phone=client.specialist_phone,
-        living_arrangement=client.living_arrangement,
-        travel=client.travel,
-        important_people=client.important_people, # added important_people in model, db, schema and route
-    )
+    db_client = Client(**orm_values(client, Client, user_id=userId, image_path=file_path))
 
     db.add(db_client)
     db.commit()
-    db.refresh(db_client)
+    db.refresh(db_client, all_columns(Client))
+    invalidate_principal(userId)
+    response_cache.invalidate("client")
+    derivative_worker.submit(db_client.image_path)
     return db_client
 
 # get all clients staff-company specific
-@router.get("/staff/all-participants")
+@router.get("/staff/all-participants", response_model=List[ReadClientInfo])
 def get_all_clients_staff(
     current_user: user_dependency, 
+    response: Response,
+    sort: DirectorySort = "name",
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db)
     ):
     
-    staff = db.query(Staff).filter(Staff.user_id == current_user.id).first()
-    if not staff:
+    if current_user.staff_id is None:
         raise HTTPException(status_code=404, detail="Staff not found!")
     
-    clients = db.query(Client).filter(Client.company_id == staff.company_id).all()
-    clients_details = []
-    # user_details = ReadUserDetails()
-    for client in clients:
-        given_name = client.given_name            
-        surname = client.surname
-        # joining the name
-        name = (given_name + " " if given_name else "") + (surname + " " if surname else "")
-        email = client.home_email
-        mobile = client.home_mobile
-
-        # company = db.query(Company).filter(Company.id == client.company_id).first()
-        # company_name = company.name
-
-        client_user = db.query(User).filter(User.id == client.user_id).first()
-        
-        client_details = ReadClientInfo(
-            id = client.id,
-            user_id = client.user_id,
-            username = client_user.username,
-            name = name,
-            email = email,
-            mobile = mobile,
-        )
-        clients_details.append(client_details)        
-    return clients_details
+    keys = directory_keys(Client, sort)
+    cursor_values = decode_cursor(cursor, len(keys)) if cursor else None
+    rows = db.execute(paginate(client_directory_stmt(current_user.company_id), keys, cursor_values, limit)).all()
+    rows = trim_page(rows, limit, response, key=lambda row: directory_cursor(row, sort))
+    return json_list_response(client_info_list_adapter, [client_info_from_row(row) for row in rows], response)
 
 from dataclasses import asdict
 # get client details by userId
 @router.get("/participant/{userId}")
 def get_client_details(userId: int, db: Session = Depends(get_db)):
-    client = db.query(Client).filter(Client.user_id == userId).first()
+    client = db.query(Client).options(*undefer_groups(CLIENT_GROUPS)).filter(Client.user_id == userId).first()
     if not client:
         raise HTTPException(status_code=404, detail="Client not found!")
     
@@ -424,7 +351,7 @@ def get_client_details(userId: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="User not found!")
 
     # return client
-    return ReadClientDetails.from_orm(client)
+    return ReadClientDetails.model_validate(client)
     # return ReadClientDetails(
     #     user_id=userId,
     #     disability=client.disability,
@@ -528,7 +455,7 @@ def get_client_details(clientId: int,
                        current_user: user_dependency,
                         db: Session = Depends(get_db)
                         ):
-    client = db.query(Client).filter(Client.id == clientId).first()
+    client = db.query(Client).options(*undefer_groups(CLIENT_GROUPS)).filter(Client.id == clientId).first()
     if not client:
         raise HTTPException(status_code=404, detail="Client not found!")
     return client
@@ -560,11 +487,17 @@ def update_client(userId: int, client_update: ClientUpdate, db: Session = Depend
     #     raise HTTPException(status_code=400, detail="Client with the same ndi already exists!")
 
     # Update all the fields if provided in the request
-    for key, value in client_update.dict(exclude_unset=True).items():
+    if "image_id" in client_update.model_fields_set:
+        image_id = client_update.image_id
+        set_profile_image(db_client, profile_image_path(db, image_id) if image_id else None)
+    for key, value in orm_values(client_update, Client, exclude_unset=True).items():
         setattr(db_client, key, value)
     
     db.commit()
-    db.refresh(db_client)
+    db.refresh(db_client, all_columns(Client))
+    invalidate_principal(userId)
+    response_cache.invalidate("client")
+    derivative_worker.submit(db_client.image_path)
     
     return db_client
 
@@ -572,21 +505,24 @@ def update_client(userId: int, client_update: ClientUpdate, db: Session = Depend
 @router.delete("/staff/participant/{userId}/delete")
 def delete_participant(userId: int, current_user: user_dependency, db: Session = Depends(get_db)):
 
-    if current_user.role != UserRole.staff:
+    if current_user.role != UserRole.staff.value:
         raise HTTPException(status_code=403, detail="Not authorized to perform this action!")
     db_user = db.query(User).filter(User.id == userId).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found!")
-    ob_client = db.query(Client).filter(Client.user_id == userId).first()
-    if ob_client:
-        # Delete all tasks associated with this client
-        db.query(Task).filter(Task.client_id == ob_client.id).delete()
-        db.commit()
-        # Now delete the client record
-        db.delete(ob_client)
-        db.commit()
-    db.delete(db_user)
+    # only participants of the staff member's own company
+    participant = db.execute(select(Client.company_id).where(Client.user_id == userId)).first()
+    if db_user.role != UserRole.client.value or participant is None:
+        raise HTTPException(status_code=404, detail="Participant not found!")
+    if current_user.company_id is None or participant.company_id != current_user.company_id:
+        raise HTTPException(status_code=403, detail="Not authorized to delete participants of another company!")
+    # the participant profile, its tasks and their media go with the user,
+    # which is detached first to be returned below
+    db.expunge(db_user)
+    delete_cascade(db, user_ids=[userId])
     db.commit()
+    invalidate_principal(userId)
+    response_cache.invalidate("client")
     return {"detail": "User deleted successfully", 
             "participant": db_user}
 
@@ -709,19 +645,16 @@ def delete_participant(userId: int, current_user: user_dependency, db: Session =
 
 # register staff endpoint
 
-import base64
-class ImageData(BaseModel):
-    image: str
 @router.post("/register-staff/{userId}")
 async def register_staff(
     userId: int,
     staff: StaffCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     ):
 
     print("MMMMMMM Hit the route for registering staff, staffData: ", locals())
     # Ensure the user exists and is of role 'staff'
-    user = db.query(User).filter(User.id == userId).first()
+    user = await db.get(User, userId)
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found!")
@@ -729,136 +662,95 @@ async def register_staff(
     if user.role != "staff":
         raise HTTPException(status_code=400, detail="User is not a staff! This is only for staff registration.")
     
-    existing_staff = db.query(Staff).filter(Staff.user_id == userId).first()
+    existing_staff = (await db.execute(select(Staff.id).where(Staff.user_id == userId))).first()
     if existing_staff:
         raise HTTPException(status_code=400, detail="Staff already registered!")
     
     # Ensure the company exists
-    company = db.query(Company).filter(Company.id == staff.company_id).first()
+    company = await db.get(Company, staff.company_id)
     if not company:
         raise HTTPException(status_code=404, detail="Company does not exist! Check the company name.")
     
-    file_path = None
-    # Process the base64 image
-    if staff.image:
-        image_data_bytes = base64.b64decode(staff.image.split(",")[1])
-        upload_dir = Path("uploads/profile_pics/") / str(userId)
-        upload_dir.mkdir(parents=True, exist_ok=True)
-        file_path = upload_dir / f"{userId}.jpg"
-        with open(f"{upload_dir}/{userId}.jpg", "wb") as image_file:
-            image_file.write(image_data_bytes)
+    # picture uploaded beforehand through /profile-images
+    file_path = await profile_image_path_async(db, staff.image_id) if staff.image_id else None
 
     # Create the staff
-    db_staff = Staff(
-        user_id=userId,
-        company_id=staff.company_id, # if company exists
-        date_of_reg=staff.date_of_reg, # added date_of_reg field from model, db, shcema and route
-        image_path = file_path,
-        title=staff.title,
-        surname=staff.surname,
-        given_name=staff.given_name,
-        preferred_name=staff.preferred_name,
-        dob=staff.date_of_birth, # changed dob to date_of_birth in schema only
-        residence_street=staff.residence_street,
-        residence_state=staff.residence_state,
-        residence_postcode=staff.residence_postcode,
-        postal_street=staff.postal_street,
-        postal_state=staff.postal_state,
-        postal_postcode=staff.postal_postcode,
-        home_email=staff.home_email,
-        home_phone=staff.home_phone,
-        home_mobile=staff.home_mobile,
-        emergency1_name=staff.emergency1_name,
-        emergency1_relationship=staff.emergency1_relationship,
-        emergency1_mobile=staff.emergency1_mobile,
-        emergency1_phone=staff.emergency1_phone,
-        emergency2_name=staff.emergency2_name,
-        emergency2_relationship=staff.emergency2_relationship,
-        emergency2_mobile=staff.emergency2_mobile,
-        emergency2_phone=staff.emergency2_phone,
-        bank1_name=staff.bank1_name,
-        bank1_acc_name=staff.bank1_acc_name,
-        bank1_acc_no=staff.bank1_acc_no,
-        bank1_branch=staff.bank1_branch,
-        bank1_bsb=staff.bank1_bsb,
-        bank2_name=staff.bank2_name,
-        bank2_acc_name=staff.bank2_acc_name,
-        bank2_acc_no=staff.bank2_acc_no,
-        bank2_branch=staff.bank2_branch,
-        bank2_bsb=staff.bank2_bsb,
-        bank_unit=staff.bank_unit,
-        bank_amount=staff.bank_amount,
-        bank_percent_net_pay=staff.bank_percent_net_pay,
-        employee_tax=staff.employee_tax,
-        abn=staff.abn,
-        secondary_employment=staff.secondary_employment,
-        secondary_employment_details=staff.secondary_employment_details,
-        epilepsy=staff.epilepsy,
-        diabetes=staff.diabetes,
-        diabetes_type=staff.diabetes_type,
-        heart_condition=staff.heart_condition,
-        heart_condition_details=staff.heart_condition_details,
-        allergies=staff.allergies,
-        allergies_details=staff.allergies_details,
-        health_others=staff.health_others,
-        health_others_details=staff.health_others_details,
-        australian=staff.australian,
-        aus_permanent=staff.aus_permanent,
-        have_working_visa=staff.have_working_visa,
-        visa_expiary_date=staff.visa_expiary_date,
-        visa_restrictions=staff.visa_restrictions
-    )
+    db_staff = Staff(**orm_values(staff, Staff, STAFF_RENAMES, user_id=userId, image_path=file_path))
     print(db_staff)
     db.add(db_staff)
-    db.commit()
-    db.refresh(db_staff)
+    await db.commit()
+    await db.refresh(db_staff, all_columns(Staff))
+    invalidate_principal(userId)
+    response_cache.invalidate("staff")
+    derivative_worker.submit(db_staff.image_path)
     return db_staff
 
 # get all staffs by company_id
-@router.get("/admin/company/{companyId}/all-staffs")
+@router.get("/admin/company/{companyId}/all-staffs", response_model=List[ReadStaffInfo])
 def get_all_clients_staff(
     companyId: int,
     current_user: user_dependency, 
+    response: Response,
+    sort: DirectorySort = "name",
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db)
     ):
     
-    admin = db.query(User).filter(User.id == current_user.id).first()
-    if not admin or (admin.role != 'admin'):
+    if current_user.role != 'admin':
         raise HTTPException(status_code=400, detail="Not authorized to perform this action!")
     
-    staffs = db.query(Staff).filter(Staff.company_id == companyId).all()
-    staffs_details = []
-    # user_details = ReadUserDetails()
-    for staff in staffs:
-        name = ""
-        email = ""
-        mobile = ""
-        
-        # title = staff.title # not sending title
-        given_name = staff.given_name            
-        surname = staff.surname
-        # joining the name
-        name = (given_name + " " if given_name else "") + (surname + " " if surname else "") # sending only given name and surname
-        email = staff.home_email # renamed email to home_email in model, db and schema
-        mobile = staff.home_mobile # renamed mobile_phone to mobile_phone in model, db and schema
-
-        staff_user = db.query(User).filter(User.id == staff.user_id).first()
-        
-        staff_details = ReadStaffInfo(
-            id = staff.id,
-            username = staff_user.username,
-            name = name,
-            email = email,
-            mobile = mobile,
+    keys = directory_keys(Staff, sort)
+    cursor_values = decode_cursor(cursor, len(keys)) if cursor else None
+    rows = db.execute(paginate(staff_directory_stmt(companyId), keys, cursor_values, limit)).all()
+    rows = trim_page(rows, limit, response, key=lambda row: directory_cursor(row, sort))
+    return json_list_response(staff_info_list_adapter, [staff_info_from_row(row) for row in rows], response)
+
+# staff of a company free for the whole of [start_at, end_at), least booked first
+# by their hours in the week of start_at. with a service_type, staff already doing
+# it that week come first among equally booked ones
+@router.get("/companies/{company_id}/available-staff", response_model=List[AvailableStaff])
+def get_available_staff(
+    company_id: int,
+    start_at: datetime,
+    end_at: datetime,
+    current_user: user_dependency,
+    service_type: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    if current_user.role != "admin" and not (
+        current_user.role == UserRole.staff.value and current_user.company_id == company_id
+    ):
+        raise HTTPException(status_code=403, detail="Not authorized to perform this action!")
+    if end_at <= start_at:
+        raise HTTPException(status_code=400, detail="End time must be after start time!")
+
+    staff_rows = db.execute(staff_directory_stmt(company_id)).all()
+    busy = set(db.execute(busy_staff_stmt(company_id, start_at, end_at)).scalars())
+    hours = {
+        row.staff_id: (row.hours, row.service_type_hours)
+        for row in db.execute(company_week_hours_stmt(company_id, week_start(start_at.date()), service_type))
+    }
+    available = [
+        AvailableStaff(
+            id=row.id,
+            username=row.username,
+            name=full_name(row.given_name, row.surname),
+            email=row.home_email,
+            mobile=row.home_mobile,
+            thumb_path=row.thumb_path,
+            week_hours=round(week_hours, 2),
+            service_type_hours=round(service_hours, 2),
         )
-        staffs_details.append(staff_details)        
-    return staffs_details
+        for row, week_hours, service_hours in rank_available_staff(staff_rows, busy, hours)
+    ]
+    return json_list_response(available_staff_list_adapter, available)
 
 # get staff details by userId
 @router.get("/user/staff/{userId}")
 def get_staff_details(userId: int, db:Session = Depends(get_db)):
     
-    staff = db.query(Staff).filter(Staff.user_id == userId).first()
+    staff = db.query(Staff).options(*undefer_groups(STAFF_GROUPS)).filter(Staff.user_id == userId).first()
 
     if not staff:
         raise HTTPException(status_code=404, detail="Staff not found!")
@@ -867,67 +759,13 @@ def get_staff_details(userId: int, db:Session = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    return ReadStaffDetail(
+    return schema_from_orm(
+        ReadStaffDetail, staff, STAFF_RENAMES,
         user_id=userId,
         staff_id=staff.id,
         username=user.username,
-        role = user.role,
+        role=user.role,
         name=staff.given_name or "Unknown",  # Handle possible None value
-        image_path=staff.image_path,
-        company_id=staff.company_id,
-        title=staff.title,
-        surname=staff.surname,
-        given_name=staff.given_name,
-        preferred_name=staff.preferred_name,
-        date_of_birth=staff.dob, # changed dob to date_of_birth in model, db and schema
-        residence_street=staff.residence_street,
-        residence_state=staff.residence_state,
-        residence_postcode=staff.residence_postcode,
-        postal_street=staff.postal_street,
-        postal_state=staff.postal_state,
-        postal_postcode=staff.postal_postcode,
-        home_email=staff.home_email,
-        home_phone=staff.home_phone,
-        home_mobile=staff.home_mobile,
-        emergency1_name=staff.emergency1_name,
-        emergency1_relationship=staff.emergency1_relationship,
-        emergency1_mobile=staff.emergency1_mobile,
-        emergency1_phone=staff.emergency1_phone,
-        emergency2_name=staff.emergency2_name,
-        emergency2_relationship=staff.emergency2_relationship,
-        emergency2_mobile=staff.emergency2_mobile,
-        emergency2_phone=staff.emergency2_phone,
-        bank1_name=staff.bank1_name,
-        bank1_acc_name=staff.bank1_acc_name,
-        bank1_acc_no=staff.bank1_acc_no,
-        bank1_branch=staff.bank1_branch,
-        bank1_bsb=staff.bank1_bsb,
-        bank2_name=staff.bank2_name,
-        bank2_acc_name=staff.bank2_acc_name,
-        bank2_acc_no=staff.bank2_acc_no,
-        bank2_branch=staff.bank2_branch,
-        bank2_bsb=staff.bank2_bsb,
-        bank_unit=staff.bank_unit,
-        bank_amount=staff.bank_amount,
-        bank_percent_net_pay=staff.bank_percent_net_pay,
-        employee_tax=staff.employee_tax,
-        abn=staff.abn,
-        secondary_employment=staff.secondary_employment,
-        secondary_employment_details=staff.secondary_employment_details,
-        epilepsy=staff.epilepsy,
-        diabetes=staff.diabetes,
-        diabetes_type=staff.diabetes_type,
-        heart_condition=staff.heart_condition,
-        heart_condition_details=staff.heart_condition_details,
-        allergies=staff.allergies,
-        allergies_details=staff.allergies_details,
-        health_others=staff.health_others,
-        health_others_details=staff.health_others_details,
-        australian=staff.australian,
-        aus_permanent=staff.aus_permanent,
-        have_working_visa=staff.have_working_visa,
-        visa_expiary_date=staff.visa_expiary_date,
-        visa_restrictions=staff.visa_restrictions
     )
 
 # updating staff info
@@ -940,23 +778,31 @@ def update_staff(userId: int, staff_update: StaffUpdate, db: Session = Depends(g
         raise HTTPException(status_code=404, detail="Staff not found!")
     
     # Update staff information
-    for key, value in staff_update.dict(exclude_unset=True).items():
+    if "image_id" in staff_update.model_fields_set:
+        image_id = staff_update.image_id
+        set_profile_image(db_staff, profile_image_path(db, image_id) if image_id else None)
+    for key, value in orm_values(staff_update, Staff, STAFF_RENAMES, exclude_unset=True).items():
         setattr(db_staff, key, value)
 
     db.commit()
-    db.refresh(db_staff)
+    db.refresh(db_staff, all_columns(Staff))
+    invalidate_principal(userId)
+    response_cache.invalidate("staff")
+    derivative_worker.submit(db_staff.image_path)
     return db_staff
 
 # getting all staff info
 @router.get("/staffs/", response_model=List[StaffRead])
 def get_all_staffs(db: Session = Depends(get_db)):
-    staffs = db.query(Staff).all()
-    return staffs
+    return response_cache.json_response(
+        "staffs:all", ["staff"],
+        lambda: dump_json(staff_list_adapter, db.query(Staff).options(*undefer_groups(STAFF_GROUPS)).all()),
+    )
 
 # getting staff details by staff_id
 @router.get("/staff/{staffId}")
 def get_staff_by_id(staffId: int, db: Session = Depends(get_db)):
-    db_staff = db.query(Staff).filter(Staff.id == staffId).first()
+    db_staff = db.query(Staff).options(*undefer_groups(STAFF_GROUPS)).filter(Staff.id == staffId).first()
     
     if not db_staff:
         raise HTTPException(status_code=404, detail="Staff not found!")
@@ -966,12 +812,15 @@ def get_staff_by_id(staffId: int, db: Session = Depends(get_db)):
 # getting all staff by company name
 @router.get("/staffs/company/{company_id}", response_model=List[StaffRead])
 def get_staff_by_company_id(company_id: int, db: Session = Depends(get_db)):
-    staffs = db.query(Staff).filter(Staff.company_id == company_id).all()
-    
-    if not staffs:
-        raise HTTPException(status_code=404, detail="No staff found for the given company ID!")
-    
-    return staffs
+    def read_staffs():
+        staffs = db.query(Staff).options(*undefer_groups(STAFF_GROUPS)).filter(Staff.company_id == company_id).all()
+        
+        if not staffs:
+            raise HTTPException(status_code=404, detail="No staff found for the given company ID!")
+        
+        return dump_json(staff_list_adapter, staffs)
+
+    return response_cache.json_response(f"staffs:company:{company_id}", ["staff"], read_staffs)
 
 # making task for a client by client_id
 @router.post("/create-tasks/{participantId}", response_model=TaskRead)
@@ -986,8 +835,8 @@ def create_task(
         raise HTTPException(status_code=403, detail="Not authorized")
 
     # Getting the staff
-    staff = db.query(Staff).filter(Staff.user_id == current_user.id).first()
-    if not staff:
+    staff_id = current_user.staff_id
+    if staff_id is None:
         raise HTTPException(status_code=404, detail="Staff not found!")
     # Getting the participant
     client = db.query(Client).filter(Client.id == participantId).first()
@@ -1003,24 +852,11 @@ def create_task(
         raise HTTPException(status_code=404, detail="End time must be after start time!")
     
     # Check for time overlapping
-    # overlapping_tasks = db.query(Task).filter(
-    #     Task.staff_id == staff.id,
-    #     Task.start_date <= task.end_date,
-    #     Task.end_date >= task.start_date
-    # ).all()
-    overlapping_tasks = db.query(Task).filter(
-        Task.staff_id == staff.id,
-        Task.start_date <= task.end_date,
-        Task.end_date >= task.start_date,
-        Task.start_time <= task.end_time,
-        Task.end_time >= task.start_time
-    ).all()
-
-    if overlapping_tasks:
+    if has_overlap(db, staff_id, start, end):
         raise HTTPException(status_code=400, detail="Overlapping task found in the selected time!")
     
     new_task = Task(
-        staff_id=staff.id,
+        staff_id=staff_id,
         client_id=participantId,
         start_date=task.start_date, 
         start_time=task.start_time,
@@ -1035,45 +871,206 @@ def create_task(
     db.refresh(new_task)
     return new_task
 
+# making recurring tasks for a client, e.g. every mon/wed 9-11 until a date
+# shifts clashing with the staff's tasks (or each other) are skipped and reported,
+# the others are created together
+@router.post("/create-tasks/{participantId}/roster", response_model=RosterRead)
+def create_roster(
+    participantId: int,
+    roster: RosterCreate,
+    current_user: user_dependency,
+    db: Session = Depends(get_db)
+    ):
+
+    if current_user.role != 'staff':
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    staff_id = current_user.staff_id
+    if staff_id is None:
+        raise HTTPException(status_code=404, detail="Staff not found!")
+    client = db.execute(select(Client.id).where(Client.id == participantId)).first()
+    if not client:
+        raise HTTPException(status_code=404, detail="Participant not found!")
+
+    shifts = expand_roster(
+        roster.weekdays, roster.start_time, roster.end_time, roster.start_date, roster.until, roster.every_weeks,
+        limit=settings.roster_max_shifts,
+    )
+    if not shifts:
+        raise HTTPException(status_code=400, detail="No shifts fall between the start date and the until date!")
+    if len(shifts) > settings.roster_max_shifts:
+        raise HTTPException(
+            status_code=400, detail=f"Too many shifts! A roster can have at most {settings.roster_max_shifts}."
+        )
+
+    busy = db.execute(busy_intervals_stmt(staff_id, shifts[0][0], shifts[-1][1])).all()
+    accepted, conflicts = [], []
+    for (start_at, end_at), (fits, task_id) in zip(shifts, find_conflicts(shifts, busy)):
+        shift = dict(start_date=start_at.date(), start_time=start_at.time(), end_date=end_at.date(), end_time=end_at.time())
+        if fits:
+            accepted.append(shift)
+        else:
+            conflicts.append(RosterConflict(**shift, task_id=task_id))
+
+    if accepted and not roster.dry_run:
+        rows = [
+            dict(
+                shift,
+                staff_id=staff_id,
+                client_id=participantId,
+                service_type=roster.service_type,
+                tasks_list=roster.tasks_list,
+                start_at=datetime.combine(shift["start_date"], shift["start_time"]),
+                end_at=datetime.combine(shift["end_date"], shift["end_time"]),
+                hours=Task.calculate_hours(shift["start_date"], shift["start_time"], shift["end_date"], shift["end_time"]),
+            )
+            for shift in accepted
+        ]
+        db.execute(insert(Task), rows)
+        add_task_hours(db, rows)
+        db.commit()
+
+    return RosterRead(
+        created=0 if roster.dry_run else len(accepted),
+        shifts=[RosterShift(**shift) for shift in accepted],
+        conflicts=conflicts,
+    )
+
 # Get all tasks for admin
+# paged by (start_date, id), filters are pushed down to sql
 @router.get("/all-tasks", response_model=List[TaskReadDetails])
 async def get_all_tasks(
     current_user: user_dependency,
-    db: Session = Depends(get_db)
+    response: Response,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    done: Optional[bool] = None,
+    approved: Optional[bool] = None,
+    staff_id: Optional[int] = None,
+    client_id: Optional[int] = None,
+    service_type: Optional[str] = None,
+    company_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized! Only admin can access all tasks.")
 
-    # Fetch all tasks with only the necessary fields for Staff and Client
-    tasks = db.query(Task).options(
-        joinedload(Task.staff).load_only(Staff.given_name, Staff.surname),  # Only load the necessary columns
-        joinedload(Task.client).load_only(Client.given_name, Client.surname)  # Only load the necessary columns
-    ).all()
-
-    if not tasks:
+    cursor_values = None
+    if cursor:
+        cursor_values = decode_cursor(cursor, 2)
+        try:
+            cursor_values[0] = date.fromisoformat(cursor_values[0])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor!")
+
+    stmt = task_details_stmt(*task_criteria(
+        date_from=date_from,
+        date_to=date_to,
+        done=done,
+        approved=approved,
+        staff_id=staff_id,
+        client_id=client_id,
+        service_type=service_type,
+        company_id=company_id,
+    ))
+    rows = (await db.execute(paginate(stmt, [Task.start_date, Task.id], cursor_values, limit))).all()
+    if not rows:
         raise HTTPException(status_code=404, detail="No tasks found")
 
-    task_data = [
-        TaskReadDetails(
-            id=task.id,
-            staff_id=task.staff_id,
-            staff_name=f"{task.staff.given_name} {task.staff.surname}" if task.staff else None,
-            client_id=task.client_id,
-            client_name=f"{task.client.given_name} {task.client.surname}" if task.client else None,
-            start_date=task.start_date,
-            start_time=task.start_time,
-            end_date=task.end_date,
-            end_time=task.end_time,
-            hours=task.hours,
-            service_type=task.service_type,
-            tasks_list=task.tasks_list,
-            done=task.done,
-            done_time=task.done_time,
-            approved=task.approved,
-        ) for task in tasks
-    ]
+    rows = trim_page(rows, limit, response, key=lambda row: [row.start_date, row.id])
+    return json_list_response(task_details_list_adapter, await task_details_from_rows_async(db, rows), response)
+
+# tasks of a date range with staff, participant and company, for payroll and invoicing
+# streamed as csv or ndjson, in (start_date, id) order
+@router.get("/admin/export/tasks")
+def export_tasks(
+    current_user: user_dependency,
+    date_from: date,
+    date_to: date,
+    format: ExportFormat = ExportFormat.csv,
+    done: Optional[bool] = None,
+    approved: Optional[bool] = None,
+    staff_id: Optional[int] = None,
+    client_id: Optional[int] = None,
+    service_type: Optional[str] = None,
+    company_id: Optional[int] = None,
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized! Only admin can export tasks.")
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to must not be before date_from!")
+
+    criteria = task_criteria(
+        date_from=date_from,
+        date_to=date_to,
+        done=done,
+        approved=approved,
+        staff_id=staff_id,
+        client_id=client_id,
+        service_type=service_type,
+        company_id=company_id,
+    )
+    filename = f"tasks_{date_from}_{date_to}.{format.value}"
+    return StreamingResponse(
+        iter_task_export(format, criteria),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
-    return task_data
+# total hours per staff, participant and/or service type, per week, fortnight or in
+# total, read from the task_hours_summary table instead of summing the tasks
+# the summary is weekly, date_from and date_to select the weeks they fall in
+@router.get("/hours-summary", response_model=List[HoursSummaryRow])
+def get_hours_summary(
+    current_user: user_dependency,
+    group_by: List[SummaryGroup] = Query([SummaryGroup.staff]),
+    period: SummaryPeriod = SummaryPeriod.week,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    staff_id: Optional[int] = None,
+    client_id: Optional[int] = None,
+    service_type: Optional[str] = None,
+    company_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    # staff only see their own hours
+    if current_user.role == UserRole.staff.value:
+        if current_user.staff_id is None:
+            raise HTTPException(status_code=404, detail="Staff not found!")
+        staff_id = current_user.staff_id
+    elif current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized to perform this action!")
+    if date_from and date_to and date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to must not be before date_from!")
+
+    criteria = []
+    if date_from:
+        criteria.append(TaskHoursSummary.week_start >= week_start(date_from))
+    if date_to:
+        criteria.append(TaskHoursSummary.week_start <= date_to)
+    if staff_id is not None:
+        criteria.append(TaskHoursSummary.staff_id == staff_id)
+    if client_id is not None:
+        criteria.append(TaskHoursSummary.client_id == client_id)
+    if service_type:
+        criteria.append(TaskHoursSummary.service_type == service_type)
+    if company_id is not None:
+        criteria.append(TaskHoursSummary.staff_id.in_(select(Staff.id).where(Staff.company_id == company_id)))
+
+    groups = list(dict.fromkeys(group_by))
+    rows = db.execute(hours_summary_stmt(groups, period, *criteria)).all()
+    if period == SummaryPeriod.fortnight:
+        # fortnights are counted from the week of date_from, or of the first row
+        anchor = week_start(date_from) if date_from else min((row.period_start for row in rows), default=None)
+        rows = fold_fortnights(rows, anchor)
+    else:
+        rows = [row._asdict() for row in rows]
+    for row in rows:
+        for counter in ("hours", "done_hours", "approved_hours"):
+            row[counter] = round(row[counter] or 0, 2)
+    return rows
 
 # get all staff specific tasks
 @router.get("/tasks/staff/", response_model=List[TaskReadDetails])
@@ -1082,36 +1079,10 @@ def get_tasks_by_staff(
     db: Session = Depends(get_db)
     ):
 
-    staff = db.query(Staff).filter(Staff.user_id == current_user.id).first()
-    staff_name = (staff.given_name + " " if staff.given_name else "") + (staff.surname + " " if staff.surname else "") # sending given name + surname
-
-    tasks = db.query(Task).filter(Task.staff_id == staff.id).options(
-        joinedload(Task.client).load_only(Client.given_name, Client.surname),  # Only load the necessary columns
-        joinedload(Task.medias)  # Only load the necessary columns
-    ).all()
-
-    results = [
-        TaskReadDetails(
-            id=task.id,
-            staff_id=task.staff_id,
-            staff_name=staff_name,
-            client_id=task.client_id,
-            client_name=f"{task.client.given_name} {task.client.surname}" if task.client else None,
-            start_date=task.start_date,
-            start_time=task.start_time,
-            end_date=task.end_date,
-            end_time=task.end_time,
-            hours=task.hours,
-            service_type=task.service_type,
-            tasks_list=task.tasks_list,
-            done=task.done,
-            done_time=task.done_time,
-            approved=task.approved,
-            media_files= [media.file_path for media in task.medias],
-        )
-            for task in tasks]
+    if current_user.staff_id is None:
+        raise HTTPException(status_code=404, detail="Staff not found!")
 
-    return results
+    return json_list_response(task_details_list_adapter, read_task_details(db, Task.staff_id == current_user.staff_id))
 
 # may be can be deleted, will see later
 # get all tasks by staff_id
@@ -1121,84 +1092,24 @@ def get_tasks_by_staff_id(
     current_user: user_dependency,
     db: Session = Depends(get_db)):
     
-    staff = db.query(Staff).filter(Staff.id == staff_id).first()
+    staff = db.query(Staff.id, Staff.user_id).filter(Staff.id == staff_id).first()
     if not staff:
         raise HTTPException(status_code=404, detail="Staff not found!")
     
     if current_user.role != "admin" and current_user.id != staff.user_id:
         raise HTTPException(status_code=403, detail="You are not authorized to access this information!")
 
-    tasks = db.query(Task).filter(Task.staff_id == staff.id).all()
-    staff_name = (staff.given_name + " " if staff.given_name else "") + (staff.surname + " " if staff.surname else "") # sending given name + surname
-
-    results = []
-    for task in tasks:
-        client_name=db.query(Client).filter(Client.id == task.client_id).first().preferred_name
-        # fetching the media files
-        media_files = db.query(Media).filter(Media.task_id == task.id).all()
-        media_file_paths = [media.file_path for media in media_files]
-
-        task_data = TaskReadDetails(
-            id=task.id,
-            staff_id=task.staff_id,
-            staff_name=staff_name,
-            client_id=task.client_id,
-            client_name=client_name,
-            start_date=task.start_date,
-            start_time=task.start_time,
-            end_date=task.end_date,
-            end_time=task.end_time,
-            hours=task.hours,
-            service_type=task.service_type,
-            tasks_list=task.tasks_list,
-            done=task.done,
-            done_time=task.done_time,
-            approved=task.approved,
-            media_files=media_file_paths
-        )
-        results.append(task_data)
-
-    return results
+    return json_list_response(task_details_list_adapter, read_task_details(db, Task.staff_id == staff.id))
 
 # get all tasks by clientId
 @router.get("/tasks/client/{clientId}", response_model=List[TaskReadDetails])
 def get_tasks_by_staff(clientId: int, db: Session = Depends(get_db)):
     
-    client = db.query(Client).filter(Client.id == clientId).first()
-    client_name =(client.given_name + " " if client.given_name else "") + (client.surname + " " if client.surname else "") # sending given name + surname
-
-    tasks = db.query(Task).filter(Task.client_id == clientId).all()
-    if not tasks:
+    results = read_task_details(db, Task.client_id == clientId)
+    if not results:
         raise HTTPException(status_code=404, detail="No tasks found for this client")
 
-    results = []
-    for task in tasks:
-        staff = db.query(Staff).filter(Staff.id == task.staff_id).options(load_only(Staff.given_name, Staff.surname)).first() # optimized
-        staff_name = (staff.given_name + " " if staff.given_name else "") + (staff.surname + " " if staff.surname else "") # sending given name + surname  
-        media_files = db.query(Media).filter(Media.task_id == task.id).all()
-        media_file_paths = [media.file_path for media in media_files]
-
-        task_data = TaskReadDetails(
-            id=task.id,
-            staff_id=task.staff_id,
-            staff_name=staff_name,
-            client_id=task.client_id,
-            client_name=client_name,
-            start_date=task.start_date,
-            start_time=task.start_time,
-            end_date=task.end_date,
-            end_time=task.end_time,
-            hours=task.hours,
-            service_type=task.service_type,
-            tasks_list=task.tasks_list,
-            done=task.done,
-            done_time=task.done_time,
-            approved=task.approved,
-            media_files=media_file_paths
-        )
-        results.append(task_data)
-
-    return results
+    return json_list_response(task_details_list_adapter, results)
 
 # get a specific task by id
 @router.get("/task/{task_id}")
@@ -1220,60 +1131,28 @@ def get_current_week_start():
 @router.get("/tasks/current-week", response_model=List[TaskReadDetails])
 async def get_current_week_tasks( 
     current_user: user_dependency,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     ):
     start_of_week = get_current_week_start()
     end_of_week = start_of_week + timedelta(days=6)
-    print("MMMMMMMMMMMMMMMM: \n, start_of_week: ", start_of_week, "\n, end_of_week: ", end_of_week)
     if current_user.role == UserRole.staff.value:
-        staff = db.query(Staff).filter(Staff.user_id == current_user.id).first()
-        tasks = db.query(Task).filter(
-            Task.staff_id == staff.id,
-            Task.start_date >= start_of_week,
-            Task.start_date <= end_of_week
-        ).all()
+        if current_user.staff_id is None:
+            raise HTTPException(status_code=404, detail="Staff not found!")
+        owner_filter = Task.staff_id == current_user.staff_id
     elif current_user.role == UserRole.client.value:
-        client = db.query(Client).filter(Client.user_id == current_user.id).first()
-        tasks = db.query(Task).filter(
-            Task.client_id == client.id,
-            Task.start_date >= start_of_week,
-            Task.start_date <= end_of_week
-        ).all()
-    
+        if current_user.client_id is None:
+            raise HTTPException(status_code=404, detail="Client not found!")
+        owner_filter = Task.client_id == current_user.client_id
     else:
         raise HTTPException(status_code=403, detail="Access forbidden!")
-    results = []
-    for task in tasks:
-        staff = db.query(Staff).filter(Staff.id == task.staff_id).options(load_only(Staff.given_name, Staff.surname)).first() # optimized
-        client = db.query(Client).filter(Client.id == task.client_id).options(load_only(Client.given_name, Client.surname)).first() # optimized
-        staff_name = (staff.given_name + " " if staff.given_name else "") + (staff.surname + " " if staff.surname else "") # sending given name + surname
-        client_name = (client.given_name + " " if client.given_name else "") + (client.surname + " " if client.surname else "") # sending given name + surname
-
-        media_files = db.query(Media).filter(Media.task_id == task.id).all()
-        media_file_paths = [media.file_path for media in media_files]
-
-        task_data = TaskReadDetails(
-            id=task.id,
-            # timesheet_id=task.timesheet_id,
-            staff_id=task.staff_id,
-            staff_name=staff_name,
-            client_id=task.client_id,
-            client_name=client_name,
-            start_date=task.start_date,
-            start_time=task.start_time,
-            end_date=task.end_date,
-            end_time=task.end_time,
-            hours=task.hours,
-            service_type=task.service_type,
-            tasks_list=task.tasks_list,
-            done=task.done,
-            done_time=task.done_time,
-            approved=task.approved,
-            media_files=media_file_paths
-        )
-        results.append(task_data)
 
-    return results
+    tasks = await read_task_details_async(
+        db,
+        owner_filter,
+        Task.start_date >= start_of_week,
+        Task.start_date <= end_of_week,
+    )
+    return json_list_response(task_details_list_adapter, tasks)
 
 
 # editing task
@@ -1289,13 +1168,11 @@ def edit_task(
     if not task_to_edit:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    staff = db.query(Staff).filter(Staff.user_id == current_user.id).first()
-    if not staff:
+    staff_id = current_user.staff_id
+    if staff_id is None:
         raise HTTPException(status_code=404, detail="Staff not found!")
-    
-    print("MMMMMMM: \n staff.id: ", staff.id, "\n task_to_edit.staff_id: ", task_to_edit.staff_id)
 
-    if task_to_edit.staff_id != staff.id:
+    if task_to_edit.staff_id != staff_id:
         raise HTTPException(status_code=403, detail="Not authorized to edit this task")
 
     # Update the task fields if they are provided
@@ -1314,12 +1191,13 @@ def edit_task(
     if task_update.tasks_list is not None:
         task_to_edit.tasks_list = task_update.tasks_list
 
-    # Recalculate hours if any date/time was updated
+    # Recalculate the interval and hours if any date/time was updated
     if any([task_update.start_date, task_update.start_time, task_update.end_date, task_update.end_time]):
-        task_to_edit.hours = Task.calculate_hours(
-            task_to_edit.start_date, task_to_edit.start_time,
-            task_to_edit.end_date, task_to_edit.end_time
-        )
+        task_to_edit.update_schedule()
+        if task_to_edit.end_at < task_to_edit.start_at:
+            raise HTTPException(status_code=400, detail="End time must be after start time!")
+        if has_overlap(db, staff_id, task_to_edit.start_at, task_to_edit.end_at, exclude_task_id=task_to_edit.id):
+            raise HTTPException(status_code=400, detail="Overlapping task found in the selected time!")
 
     db.commit()
     db.refresh(task_to_edit)
@@ -1340,14 +1218,12 @@ def delete_task(
     if task is None:
         raise HTTPException(status_code=404, detail="Task not found!")
 
-    staff = db.query(Staff).filter(Staff.user_id == current_user.id).first()
-
-    # print("MMMMMMMMMMMMM: \n, staff or not: ", staff, not staff)
+    staff_id = current_user.staff_id
 
     # Check if user is allowed to delete the task
-    if (current_user.role != "admin") and (not staff):
+    if (current_user.role != "admin") and (staff_id is None):
         raise HTTPException(status_code=403, detail="You are Not authorized to delete this task!")
-    elif staff and (task.staff_id != staff.id):
+    elif staff_id is not None and (task.staff_id != staff_id):
         # print("MMMMMMMMMMMMM: \n, task.staff_id: ", task.staff_id)
         raise HTTPException(status_code=403, detail="You are Not authorized to delete other staffs task!")
 
@@ -1364,10 +1240,10 @@ def delete_task(
 async def update_task_status(
     task_id: int,
     status_upudate: TaskStatusUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     print("MMMMMMMMMMMMM: \n, task_id, done:", task_id, status_upudate.done)
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = await db.get(Task, task_id)
     
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -1378,8 +1254,7 @@ async def update_task_status(
     else:
         task.done_time = None  # Clear done_time if the task is not done
 
-    db.commit()
-    db.refresh(task)
+    await db.commit()
     
     # return task
     return {"message": "Task status updated successfully"}
@@ -1387,63 +1262,49 @@ async def update_task_status(
 # adding media
 from fastapi.responses import FileResponse
 @router.post("/tasks/{task_id}/upload-media", response_model=MediaRead)
-async def upload_media(task_id: int, file: UploadFile = File(...), db: Session = Depends(get_db)):
-    task = db.query(Task).filter(Task.id == task_id).first()
+async def upload_media(task_id: int, file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db)):
+    task = (await db.execute(select(Task.id).where(Task.id == task_id))).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    # Define the directory to save the files
-    upload_dir = Path("uploads/") / str(task_id)
-    upload_dir.mkdir(parents=True, exist_ok=True)
-
-    file_path = upload_dir / file.filename
-
-    with open(file_path, "wb") as buffer:
-        buffer.write(file.file.read())
+    # Stream the file into the blob store, the same content is only kept once
+    saved = await store_upload(db, file)
 
     # Save the file path in the Media table
-    new_media = Media(task_id=task_id, file_path=str(file_path))
+    new_media = Media(task_id=task_id, file_path=str(saved.path), sha256=saved.sha256, size=saved.size)
     db.add(new_media)
-    db.commit()
-    db.refresh(new_media)
+    await db.commit()
+    # thumbnails are made in the background, the row gets their paths when done
+    derivative_worker.submit(new_media.file_path)
 
     # return FileResponse(file_path) # used for debugging
     return new_media
 
 # get media task specific
 @router.get("/tasks/{task_id}/media", response_model=List[MediaRead])
-async def get_media_for_task(task_id: int, db: Session = Depends(get_db)):
-    media_list = db.query(Media).filter(Media.task_id == task_id).all()
+async def get_media_for_task(task_id: int, db: AsyncSession = Depends(get_async_db)):
+    media_list = (await db.execute(select(Media).where(Media.task_id == task_id))).scalars().all()
     # if not media_list:
     #     raise HTTPException(status_code=404, detail="No media found for this task")
-    return media_list
+    return orm_list_response(media_list_adapter, media_list)
 
 # delete media
 @router.delete("/tasks/{media_id}/delete-media", response_model=dict)
-async def delete_media(media_id: int, db: Session = Depends(get_db)):
+async def delete_media(media_id: int, db: AsyncSession = Depends(get_async_db)):
     # Fetch the media record from the database
-    media = db.query(Media).filter(Media.id == media_id).first()
+    media = await db.get(Media, media_id)
     
     if not media:
         raise HTTPException(status_code=404, detail="Media not found")
 
-    # Convert the file path to a Path object
-    file_path = Path(media.file_path)
-    
     try:
-        # Delete the file from the filesystem
-        if file_path.exists():
-            file_path.unlink()  # This deletes the file from the filesystem
-        else:
-            raise HTTPException(status_code=404, detail="File not found on disk")
-
-        # Remove the record from the database
-        db.delete(media)
-        db.commit()
+        # Remove the record from the database, the file goes with its last reference
+        await db.delete(media)
+        await db.commit()
         
     except Exception as e:
         # Rollback the transaction in case of error
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error deleting media: {str(e)}")
 
     return {"detail": "Media deleted successfully"}
@@ -1454,7 +1315,7 @@ from fastapi import Form, UploadFile, File
 @router.post("/register/company", response_model=CompanyOut)
 async def add_company(
     current_user: user_dependency,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     name: str = Form(...),
     abn: str = Form(...),
     web: str = Form(None),
@@ -1466,7 +1327,7 @@ async def add_company(
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized! Only Admin can See this.")
     
-    db_company = db.query(Company).filter((Company.name == name) | (Company.abn == abn)).first()
+    db_company = (await db.execute(select(Company.id).where((Company.name == name) | (Company.abn == abn)))).first()
     if db_company:
         raise HTTPException(status_code=400, detail="Company with this name or ABN already exists")
     
@@ -1474,18 +1335,13 @@ async def add_company(
     
     # Save the logo if uploaded
     if logo:
-        logo_dir = Path("uploads/logos/") / name
-        logo_dir.mkdir(parents=True, exist_ok=True)
-        logo_path = logo_dir / logo.filename
-
-        with open(logo_path, "wb") as buffer:
-            buffer.write(logo.file.read())
-
-        new_company.logo = str(logo_path)
+        saved = await store_upload(db, logo)
+        new_company.logo = str(saved.path)
 
     db.add(new_company)
-    db.commit()
-    db.refresh(new_company)
+    await db.commit()
+    await db.refresh(new_company)
+    response_cache.invalidate("company")
     return new_company
 
 # Get all the companies
@@ -1497,8 +1353,10 @@ def get_all_companies(
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized! Only Admin can See this.")
 
-    companies = db.query(Company).all()
-    return companies
+    return response_cache.json_response(
+        "companies:all", ["company"],
+        lambda: dump_json(company_list_adapter, db.query(Company).all()),
+    )
 
 # get all company name
 @router.get("/all-companies/name")
@@ -1509,16 +1367,21 @@ def get_all_companies(
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not authorized! Only Admin can See this.")
 
-    companies = db.query(Company).options(load_only(Company.name)).all()
-    return companies
+    return response_cache.json_response(
+        "companies:names", ["company"],
+        lambda: dump_json(company_name_list_adapter, db.execute(select(Company.id, Company.name)).all()),
+    )
 
 # Get company info by id
 @router.get("/companies/{company_id}", response_model=CompanyOut)
 def get_company(company_id: int, db: Session = Depends(get_db)):
-    company = db.query(Company).filter(Company.id == company_id).first()
-    if not company:
-        raise HTTPException(status_code=404, detail="Company not found")
-    return company
+    def read_company():
+        company = db.query(Company).filter(Company.id == company_id).first()
+        if not company:
+            raise HTTPException(status_code=404, detail="Company not found")
+        return dump_json(company_adapter, company)
+
+    return response_cache.json_response(f"company:{company_id}", ["company"], read_company)
 
 # Edit company info (name and ABN not editable)
 @router.put("/companies/{company_id}", response_model=CompanyOut)
@@ -1530,9 +1393,9 @@ async def edit_company(
     email: str = Form(None),
     address: str = Form(None),
     logo: UploadFile = File(None),  # Logo upload is optional
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_company = db.query(Company).filter(Company.id == company_id).first()
+    db_company = await db.get(Company, company_id)
     if not db_company:
         raise HTTPException(status_code=404, detail="Company not found")
     
@@ -1543,25 +1406,14 @@ async def edit_company(
     db_company.email = email or db_company.email
     db_company.address = address or db_company.address
 
-    # Save the new logo if uploaded
+    # Save the new logo if uploaded, the old one is released on commit
     if logo:
-        # Delete the old logo file if it exists
-        if db_company.logo:
-            old_logo_path = Path(db_company.logo)
-            if old_logo_path.exists():
-                old_logo_path.unlink()
-
-        logo_dir = Path("uploads/logos/") / db_company.name
-        logo_dir.mkdir(parents=True, exist_ok=True)
-        logo_path = logo_dir / logo.filename
-
-        with open(logo_path, "wb") as buffer:
-            buffer.write(logo.file.read())
-
-        db_company.logo = str(logo_path)
+        saved = await store_upload(db, logo)
+        db_company.logo = str(saved.path)
 
-    db.commit()
-    db.refresh(db_company)
+    await db.commit()
+    await db.refresh(db_company)
+    response_cache.invalidate("company")
     return db_company
 
 # Delete company
@@ -1571,31 +1423,25 @@ def delete_company(company_id: int, db: Session = Depends(get_db)):
     if not db_company:
         raise HTTPException(status_code=404, detail="Company not found")
     
-    # Delete the logo file if it exists
-    if db_company.logo:
-        logo_path = Path(db_company.logo)
-        if logo_path.exists():
-            logo_path.unlink()
-    
-    # Delete the associated user data
-    users = db.query(User).join(Client, User.id == Client.user_id).filter(Client.company_id == company_id).all()
-    users.extend(db.query(User).join(Staff, User.id == Staff.user_id).filter(Staff.company_id == company_id).all())
-
-    for user in users:
-        db.delete(user)
-
-    db.delete(db_company)
+    # the company's participants and staff with their users, tasks and media, the
+    # files are unlinked in the background after the commit
+    user_ids = company_user_ids(db, company_id)
+    delete_cascade(db, user_ids=user_ids, company_id=company_id)
     db.commit()
+    invalidate_principal(*user_ids)
+    response_cache.invalidate("company", "staff", "client")
     return {"detail": "Company deleted successfully"}
 
 # Get company logo
+# the url stays the same when the logo changes, so it is revalidated with its etag
+# after a short max-age instead of cached for good like the /uploads/blobs urls
 @router.get("/companies/{company_id}/logo")
-def get_company_logo(company_id: int, db: Session = Depends(get_db)):
-    company = db.query(Company).filter(Company.id == company_id).first()
-    if not company or not company.logo:
+async def get_company_logo(company_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    logo = (await db.execute(select(Company.logo).where(Company.id == company_id))).scalar()
+    if not logo:
         raise HTTPException(status_code=404, detail="Logo not found")
 
-    return FileResponse(company.logo)
+    return await serve_media(request, logo, cache_control=SHORT_CACHE_CONTROL)
 
 
 
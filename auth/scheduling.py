@@ -0,0 +1,123 @@
+# shift scheduling helpers
+# tasks are compared on their start_at/end_at datetimes, which the
+# ix_tasks_staff_interval (staff_id, start_at, end_at) index covers. the tasks ending
+# after a window starts are a range of ix_tasks_staff_end_at (staff_id, end_at, start_at),
+# so an overlap check does not read the staff member's past shifts
+import heapq
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import select
+
+from models import Staff, Task
+
+# two shifts overlap when each one starts before the other ends,
+# back to back shifts (one ends at 11:00, the next starts at 11:00) are allowed
+def overlapping_tasks_stmt(staff_id: int, start_at: datetime, end_at: datetime, exclude_task_id: int | None = None):
+    stmt = select(Task.id).where(
+        Task.staff_id == staff_id,
+        Task.start_at < end_at,
+        Task.end_at > start_at,
+    )
+    if exclude_task_id is not None:
+        stmt = stmt.where(Task.id != exclude_task_id)
+    return stmt.limit(1)
+
+def has_overlap(db, staff_id: int, start_at: datetime, end_at: datetime, exclude_task_id: int | None = None) -> bool:
+    return db.execute(overlapping_tasks_stmt(staff_id, start_at, end_at, exclude_task_id)).first() is not None
+
+# >>>>> recurring rosters
+# a roster (every mon/wed 9-11 until a date) is expanded here, checked against the
+# staff member's tasks with one range query and a sweep over both sorted lists, and
+# the accepted shifts are inserted together by the route
+WEEKDAYS = {"mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6}
+
+# (start_at, end_at) of every shift of the roster, in order. an end time at or before
+# the start time ends the shift on the next day. walks the roster week by week and
+# stops after limit + 1 shifts, so the caller can tell a roster is too long without
+# expanding a far off until
+def expand_roster(weekdays, start_time: time, end_time: time, start_date: date, until: date, every_weeks: int = 1, limit: int | None = None) -> list[tuple[datetime, datetime]]:
+    days = sorted({WEEKDAYS[day] for day in weekdays})
+    length = datetime.combine(start_date, end_time) - datetime.combine(start_date, start_time)
+    if length <= timedelta(0):
+        length += timedelta(days=1)
+    # weeks counted from the monday of the first week
+    monday = start_date - timedelta(days=start_date.weekday())
+    shifts = []
+    try:
+        while monday <= until:
+            for weekday in days:
+                day = monday + timedelta(days=weekday)
+                if day < start_date:
+                    continue
+                if day > until:
+                    return shifts
+                start_at = datetime.combine(day, start_time)
+                shifts.append((start_at, start_at + length))
+                if limit is not None and len(shifts) > limit:
+                    return shifts
+            monday += timedelta(weeks=every_weeks)
+    except OverflowError:
+        # the end of the calendar (date.max), nothing can be scheduled past it
+        pass
+    return shifts
+
+# the staff member's tasks touching [start_at, end_at), by start, served by ix_tasks_staff_interval
+def busy_intervals_stmt(staff_id: int, start_at: datetime, end_at: datetime):
+    return (
+        select(Task.id, Task.start_at, Task.end_at)
+        .where(Task.staff_id == staff_id, Task.start_at < end_at, Task.end_at > start_at)
+        .order_by(Task.start_at)
+    )
+
+# (fits, task_id in the way) for every shift of the roster, which are sorted and all
+# of the same length. task_id is None when the shift fits or when it runs into an
+# earlier shift of the same roster. busy is the rows of busy_intervals_stmt
+def find_conflicts(shifts: list[tuple[datetime, datetime]], busy) -> list[tuple[bool, int | None]]:
+    busy = list(busy)
+    results = []
+    # busy intervals starting before the current shift ends, smallest end first
+    active = []
+    next_busy = 0
+    for start_at, end_at in shifts:
+        while next_busy < len(busy) and busy[next_busy][1] < end_at:
+            task_id, _, busy_end = busy[next_busy]
+            heapq.heappush(active, (busy_end, next_busy, task_id))
+            next_busy += 1
+        # shifts only move forward, an interval ending before this one starts is done
+        while active and active[0][0] <= start_at:
+            heapq.heappop(active)
+        if active:
+            results.append((False, active[0][2]))
+            continue
+        results.append((True, None))
+        # an accepted shift is busy time for the next ones
+        heapq.heappush(active, (end_at, len(busy) + len(results), None))
+    return results
+
+# >>>>> availability
+# who of a company is free for a new shift: one interval query for the staff busy at
+# some point of the window, then one pass over the company's staff keeping the others
+
+# the company's staff with a task overlapping [start_at, end_at). per staff member
+# this is a range of ix_tasks_staff_end_at over the tasks ending after the window
+# starts, however long their history of past shifts
+def busy_staff_stmt(company_id: int, start_at: datetime, end_at: datetime):
+    return (
+        select(Task.staff_id)
+        .join(Staff, Staff.id == Task.staff_id)
+        .where(Staff.company_id == company_id, Task.end_at > start_at, Task.start_at < end_at)
+        .distinct()
+    )
+
+# the staff rows not in busy, least booked first so new shifts spread over the team.
+# hours maps staff_id to (hours that week, hours of the service type that week), ties
+# go to the staff already doing the service type, then by name
+def rank_available_staff(staff_rows, busy: set, hours: dict) -> list[tuple]:
+    available = []
+    for row in staff_rows:
+        if row.id in busy:
+            continue
+        week_hours, service_hours = hours.get(row.id, (0.0, 0.0))
+        available.append((row, week_hours or 0.0, service_hours or 0.0))
+    available.sort(key=lambda item: (item[1], -item[2], (item[0].given_name or "").lower(), (item[0].surname or "").lower()))
+    return available
@@ -1,4 +1,5 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, TypeAdapter, model_validator
+from sqlalchemy import inspect as sa_inspect
 from typing import Optional, List
 from enum import Enum
 from datetime import date, time, datetime
@@ -24,8 +25,7 @@ class UserRead(BaseModel):
     # email: EmailStr
     role: UserRole  # Use the Enum to match the type with the role
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class UserUpdate(BaseModel):
     username: Optional[str] = None
@@ -95,7 +95,8 @@ class TaskCreate(BaseModel):
     start_time: Optional[time] = None
     end_date: Optional[date] = None
     end_time: Optional[time] = None
-    service_type: Optional[str] = None
+    # at most the length of the task_hours_summary key column
+    service_type: Optional[str] = Field(None, max_length=255)
     # adding this new field to add tasks_list functionality
     tasks_list: Optional[str] = None  # New field
 
@@ -118,8 +119,7 @@ class TaskRead(BaseModel):
     tasks_list: Optional[str] = None  # New field
     done_time: Optional[datetime] = None  # New field
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class TaskStatusUpdate(BaseModel):
     done: bool
@@ -128,6 +128,53 @@ class TaskReadDetails(TaskRead):
     staff_name: Optional[str]  # Add staff_name field
     client_name: Optional[str]  # Add client_name field
     media_files: Optional[list] = []
+    media_thumbs: Optional[list] = [] # thumbnail of each media file, None if there is none
+
+# >>>>> recurring shifts, expanded and checked in one go (auth/scheduling.py)
+class Weekday(str, Enum):
+    mon = "mon"
+    tue = "tue"
+    wed = "wed"
+    thu = "thu"
+    fri = "fri"
+    sat = "sat"
+    sun = "sun"
+
+class RosterCreate(BaseModel):
+    weekdays: List[Weekday] = Field(..., min_length=1)
+    start_time: time
+    end_time: time # at or before start_time, the shift ends the next day
+    start_date: date # first day of the roster
+    until: date # last day a shift may start on
+    every_weeks: int = Field(1, ge=1) # 2 for a fortnightly roster
+    service_type: str = Field(..., max_length=255) # as in TaskCreate
+    tasks_list: Optional[str] = None
+    dry_run: bool = False # only report what would be created
+
+class RosterShift(BaseModel):
+    start_date: date
+    start_time: time
+    end_date: date
+    end_time: time
+
+class RosterConflict(RosterShift):
+    task_id: Optional[int] = None # the existing task in the way, None for another shift of the roster
+
+class RosterRead(BaseModel):
+    created: int
+    shifts: List[RosterShift]
+    conflicts: List[RosterConflict]
+
+# one row of /hours-summary, only the grouped by fields and period_start are set
+class HoursSummaryRow(BaseModel):
+    staff_id: Optional[int] = None
+    client_id: Optional[int] = None
+    service_type: Optional[str] = None
+    period_start: Optional[date] = None
+    task_count: int
+    hours: float
+    done_hours: float
+    approved_hours: float
 
 ## commenting timesheet schemas
 # class TimesheetCreate(BaseModel):
@@ -146,22 +193,25 @@ class MediaCreate(BaseModel):
     task_id: int
     file_path: str
 
-class MediaRead(BaseModel):
-    id: int
-    task_id: int
-    file_path: str
-
-    class Config:
-        orm_mode = True
-  
 # for reading media
 class MediaRead(BaseModel):
     id: int
     task_id: int
     file_path: str
+    sha256: Optional[str] = None
+    size: Optional[int] = None
+    # resized variants of photos, None until the background worker made them
+    thumb_path: Optional[str] = None
+    medium_path: Optional[str] = None
+    webp_path: Optional[str] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+# uploaded profile picture, registered/updated participants and staff refer to it by id
+class ProfileImageRead(BaseModel):
+    id: str
+    path: str
+    size: int
 
 # >>>>>>>>>> schemas for company
 from pydantic import BaseModel, EmailStr, HttpUrl, constr
@@ -185,8 +235,13 @@ class CompanyOut(CompanyBase):
     name: str
     abn: str
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+class CompanyName(BaseModel):
+    id: int
+    name: str
+
+    model_config = ConfigDict(from_attributes=True)
 
 
 # # >>>>>> schemas for staff crud for new db
@@ -227,10 +282,10 @@ class ClientBase(BaseModel):
     # date_of_reg: Optional[date] = None # updating schema for dry
     plan_start_date: Optional[date] = None
     plan_end_date: Optional[date] = None
-    image_path: Optional[str] = None
+    # image_path is set through image_id only, see ClientRead
     
-    given_name: Optional[str] = None
-    surname: Optional[str] = None
+    given_name: Optional[str] = Field(None, max_length=255) # varchar columns, like service_type
+    surname: Optional[str] = Field(None, max_length=255)
     preferred_name: Optional[str] = None
     sex: Optional[str] = None
     aboriginal: Optional[bool] = False
@@ -316,33 +371,34 @@ class ClientBase(BaseModel):
     disability: Optional[str] = None
     important_people: Optional[str] = None # added important_people in model, db and schema
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
     
 class ClientCreate(ClientBase):
     ndi: str
     date_of_reg: date
-    image: Optional[str] = None
+    image_id: Optional[str] = None # id returned by POST /profile-images
     # surname: Optional[str] = None # updating schema for dry
     # given_name: Optional[str] = None # updating schema for dry
 
 class ClientUpdate(ClientBase):
-    pass
+    image_id: Optional[str] = None # id returned by POST /profile-images, null removes the picture
 
 class ClientRead(ClientBase):
     id: int
     user_id: int
+    image_path: Optional[str] = None
     date_of_reg: Optional[date] = None
     ndi: str
+    thumb_path: Optional[str] = None
+    medium_path: Optional[str] = None
+    webp_path: Optional[str] = None
 
 class ReadClientDetails(ClientRead):
     name: Optional[str] = None
     role: Optional[str] = 'client'
     
-    class Config:
-        orm_mode = True
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class ReadClientInfo(BaseModel):
     id: int
@@ -352,6 +408,7 @@ class ReadClientInfo(BaseModel):
     name: Optional[str]
     email: Optional[str]
     mobile: Optional[str]
+    thumb_path: Optional[str] = None
 
 # >>>>> adding new columns to the staff schema
 
@@ -363,8 +420,8 @@ class StaffBase(BaseModel):
     # image_path: Optional[str] = None
 
     title: Optional[str] = None
-    surname: Optional[str] = None
-    given_name: Optional[str] = None
+    surname: Optional[str] = Field(None, max_length=255) # as in ClientBase
+    given_name: Optional[str] = Field(None, max_length=255)
     preferred_name: Optional[str] = None
     date_of_birth: Optional[date] = None # changed from dob to date_of_birth in schema only
     residence_street: Optional[str] = None
@@ -416,29 +473,26 @@ class StaffBase(BaseModel):
     visa_expiary_date: Optional[date] = None
     visa_restrictions: Optional[str] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class StaffCreate(StaffBase):
     # company_name: str
     # Including fields specific to staff creation
     # company_id: Optional[int] = None
-    image: Optional[str] = None,
-    pass
+    image_id: Optional[str] = None # id returned by POST /profile-images
 
 class StaffUpdate(StaffBase):
     company_id: Optional[int] = None
+    image_id: Optional[str] = None # id returned by POST /profile-images, null removes the picture
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class StaffRead(StaffBase):
     id: int
     user_id: int
     company_id: Optional[int] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class ReadStaffInfo(BaseModel):
     id: int
@@ -446,6 +500,12 @@ class ReadStaffInfo(BaseModel):
     name: str
     email: Optional[str]
     mobile: Optional[str]
+    thumb_path: Optional[str] = None
+
+# a staff member free for the whole window of /companies/{id}/available-staff
+class AvailableStaff(ReadStaffInfo):
+    week_hours: float
+    service_type_hours: float = 0
 
 class ReadStaffDetail(BaseModel):
     user_id: int
@@ -454,6 +514,9 @@ class ReadStaffDetail(BaseModel):
     role: str
     name: Optional[str]
     image_path: Optional[str]
+    thumb_path: Optional[str] = None
+    medium_path: Optional[str] = None
+    webp_path: Optional[str] = None
     company_id: int
     address: Optional[str] = None
     # Personal details
@@ -521,4 +584,71 @@ class ReadStaffDetail(BaseModel):
     aus_permanent: Optional[bool] = None  # if not australian
     have_working_visa: Optional[bool] = None  # if not australian
     visa_expiary_date: Optional[date] = None  # if not australian
-    visa_restrictions: Optional[str] = None  # if not australian
\ No newline at end of file
+    visa_restrictions: Optional[str] = None  # if not australian
+
+# >>>>> records of the bulk import (auth/imports.py), the login and the profile in one row
+class ImportLogin(BaseModel):
+    username: str
+    password: Optional[str] = None
+    # an existing bcrypt hash instead of the password, for users moved from another system
+    password_hash: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_password(self):
+        if not self.password and not self.password_hash:
+            raise ValueError("password or password_hash is required")
+        return self
+
+class ClientImport(ImportLogin, ClientCreate):
+    pass
+
+class StaffImport(ImportLogin, StaffCreate):
+    pass
+
+# >>>>> adapters of the cached list responses, built once instead of per request
+company_list_adapter = TypeAdapter(List[CompanyOut])
+company_name_list_adapter = TypeAdapter(List[CompanyName])
+company_adapter = TypeAdapter(CompanyOut)
+staff_list_adapter = TypeAdapter(List[StaffRead])
+# fast path of the big lists (auth/responses.py)
+task_details_list_adapter = TypeAdapter(List[TaskReadDetails])
+user_details_list_adapter = TypeAdapter(List[ReadUserDetails])
+client_info_list_adapter = TypeAdapter(List[ReadClientInfo])
+staff_info_list_adapter = TypeAdapter(List[ReadStaffInfo])
+available_staff_list_adapter = TypeAdapter(List[AvailableStaff])
+media_list_adapter = TypeAdapter(List[MediaRead])
+
+# validated from orm objects or rows and serialized to json bytes in one pass
+def dump_json(adapter: TypeAdapter, rows) -> bytes:
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+# >>>>> mapping between schemas and orm rows, instead of copying every field by hand
+# columns named differently in the model, schema field -> model attribute
+STAFF_RENAMES = {"date_of_birth": "dob"}
+
+# column values of a new (or updated) row of model from a request schema, fields the
+# model has no column for (like image_id) are left out, values passed in win
+def orm_values(data: BaseModel, model, renames: dict[str, str] | None = None, exclude_unset: bool = False, **overrides) -> dict:
+    renames = renames or {}
+    columns = sa_inspect(model).column_attrs.keys()
+    values = {}
+    for name, value in data.model_dump(exclude_unset=exclude_unset).items():
+        attr = renames.get(name, name)
+        if attr in columns:
+            values[attr] = value
+    values.update(overrides)
+    return values
+
+# a response schema from an orm row, every field read from the attribute of the same
+# (or renamed) name, values not on the row are passed in
+def schema_from_orm(schema: type[BaseModel], obj, renames: dict[str, str] | None = None, **values) -> BaseModel:
+    renames = renames or {}
+    data = {}
+    for name in schema.model_fields:
+        if name in values:
+            continue
+        attr = renames.get(name, name)
+        if hasattr(obj, attr):
+            data[name] = getattr(obj, attr)
+    data.update(values)
+    return schema.model_validate(data)
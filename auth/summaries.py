@@ -0,0 +1,202 @@
+# hour totals per staff, participant, service type and week
+# the weekly and fortnightly totals used to be summed client side over every task.
+# task_hours_summary holds one row per (staff, week, participant, service type) and is
+# kept up to date in the same transaction as the tasks: the session hook below turns
+# every flushed insert, change and delete of a Task into +/- deltas of its row, written
+# with one upsert per row touched. writers bypassing the flush (bulk inserts and
+# deletes) call add_task_hours / release_task_hours themselves, like acquire_blobs.
+# the totals are read by GET /auth/hours-summary, scripts/rebuild_hours_summary.py
+# recomputes the whole table from the tasks
+from collections import defaultdict
+from datetime import date, timedelta
+from enum import Enum
+
+from sqlalchemy import case, delete, event, func, insert, inspect, literal, select, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+
+from models import Staff, Task, TaskHoursSummary
+
+# the task columns a summary row depends on
+SUMMARY_COLUMNS = ("staff_id", "client_id", "service_type", "start_date", "hours", "done", "approved")
+_SELECT_COLUMNS = [getattr(Task, column) for column in SUMMARY_COLUMNS]
+# the counters of a row, in the order of a delta
+SUMMARY_COUNTERS = ("task_count", "hours", "done_hours", "approved_hours")
+# service types are cut to the key column, tasks written before the schemas capped
+# them may hold longer ones
+SERVICE_TYPE_LENGTH = TaskHoursSummary.service_type.type.length
+
+def week_start(day: date) -> date:
+    # weeks start on monday, like /tasks/current-week
+    return day - timedelta(days=day.weekday())
+
+# (key, counters) one task adds to the summary, from its SUMMARY_COLUMNS values
+def task_contribution(staff_id, client_id, service_type, start_date, hours, done, approved):
+    hours = hours or 0
+    key = (staff_id, week_start(start_date), client_id, service_type[:SERVICE_TYPE_LENGTH])
+    return key, (1, hours, hours if done else 0, hours if approved else 0)
+
+class SummaryDeltas:
+    def __init__(self):
+        self.rows = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+
+    def add(self, values, sign: int = 1):
+        key, counters = task_contribution(*values)
+        row = self.rows[key]
+        for i, counter in enumerate(counters):
+            row[i] += sign * counter
+
+    def changes(self) -> dict:
+        # a task edited back and forth within one flush leaves nothing to write
+        return {key: row for key, row in self.rows.items() if any(row)}
+
+def _upsert_stmt(rows: list[dict]):
+    stmt = mysql_insert(TaskHoursSummary).values(rows)
+    return stmt.on_duplicate_key_update({
+        counter: getattr(TaskHoursSummary, counter) + stmt.inserted[counter] for counter in SUMMARY_COUNTERS
+    })
+
+def apply_deltas(db: Session, deltas: SummaryDeltas):
+    changes = deltas.changes()
+    if not changes:
+        return
+    rows = [
+        dict(zip(("staff_id", "week_start", "client_id", "service_type"), key), **dict(zip(SUMMARY_COUNTERS, row)))
+        for key, row in changes.items()
+    ]
+    db.execute(_upsert_stmt(rows))
+    # a row whose last task moved away or was deleted goes too
+    keys = [key for key, row in changes.items() if row[0] < 0]
+    if keys:
+        db.execute(delete(TaskHoursSummary).where(
+            tuple_(
+                TaskHoursSummary.staff_id, TaskHoursSummary.week_start,
+                TaskHoursSummary.client_id, TaskHoursSummary.service_type,
+            ).in_(keys),
+            TaskHoursSummary.task_count <= 0,
+        ))
+
+def _changed(obj) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[column].history.has_changes() for column in SUMMARY_COLUMNS)
+
+@event.listens_for(Session, "before_flush")
+def count_task_hours(db: Session, flush_context, instances):
+    deltas = SummaryDeltas()
+    for obj in db.new:
+        if isinstance(obj, Task):
+            deltas.add([getattr(obj, column) for column in SUMMARY_COLUMNS])
+
+    changed = [obj for obj in db.dirty if isinstance(obj, Task) and _changed(obj)]
+    deleted = [obj for obj in db.deleted if isinstance(obj, Task)]
+    ids = [obj.id for obj in changed + deleted if obj.id is not None]
+    if ids:
+        # the database still holds the rows as the summary knows them. locked (in id
+        # order, like the blob rows) so a concurrent edit of the same task waits for
+        # this transaction and then reads what it wrote, not the values both started from
+        for row in db.execute(select(*_SELECT_COLUMNS).where(Task.id.in_(ids)).order_by(Task.id).with_for_update()):
+            deltas.add(row, -1)
+    for obj in changed:
+        deltas.add([getattr(obj, column) for column in SUMMARY_COLUMNS])
+    apply_deltas(db, deltas)
+
+# tasks written with bulk inserts never pass through the flush hook, their writer
+# counts them itself, in the same transaction. rows are the inserted values
+def add_task_hours(db: Session, rows):
+    deltas = SummaryDeltas()
+    for row in rows:
+        deltas.add([row.get(column) for column in SUMMARY_COLUMNS])
+    apply_deltas(db, deltas)
+
+# the same for bulk deletes, called with the delete's criteria before it runs
+def release_task_hours(db: Session, *criteria):
+    deltas = SummaryDeltas()
+    for row in db.execute(select(*_SELECT_COLUMNS).where(*criteria).order_by(Task.id).with_for_update()):
+        deltas.add(row, -1)
+    apply_deltas(db, deltas)
+
+# the whole table recomputed from the tasks, for scripts/rebuild_hours_summary.py.
+# mysql's weekday() counts from monday like date.weekday()
+def rebuild_stmt():
+    week = func.subdate(Task.start_date, func.weekday(Task.start_date))
+    hours = func.coalesce(Task.hours, 0)
+    service_type = func.substr(Task.service_type, 1, SERVICE_TYPE_LENGTH)
+    totals = (
+        select(
+            Task.staff_id,
+            week.label("week_start"),
+            Task.client_id,
+            service_type.label("service_type"),
+            func.count().label("task_count"),
+            func.sum(hours).label("hours"),
+            func.sum(case((Task.done.is_(True), hours), else_=0)).label("done_hours"),
+            func.sum(case((Task.approved.is_(True), hours), else_=0)).label("approved_hours"),
+        )
+        .group_by(Task.staff_id, week, Task.client_id, service_type)
+    )
+    return insert(TaskHoursSummary).from_select(
+        ["staff_id", "week_start", "client_id", "service_type", *SUMMARY_COUNTERS], totals
+    )
+
+def rebuild_hours_summary(db: Session) -> int:
+    db.execute(delete(TaskHoursSummary))
+    db.execute(rebuild_stmt())
+    return db.execute(select(func.count()).select_from(TaskHoursSummary)).scalar_one()
+
+# >>>>> reading
+class SummaryGroup(str, Enum):
+    staff = "staff"
+    client = "client"
+    service_type = "service_type"
+
+class SummaryPeriod(str, Enum):
+    week = "week"
+    fortnight = "fortnight"
+    total = "total"
+
+GROUP_COLUMNS = {
+    SummaryGroup.staff: TaskHoursSummary.staff_id,
+    SummaryGroup.client: TaskHoursSummary.client_id,
+    SummaryGroup.service_type: TaskHoursSummary.service_type,
+}
+
+# totals of the summary rows matching criteria, per group and per week unless the
+# period is total. a staff member's or participant's weeks are a range of the primary
+# key or of ix_task_hours_summary_client_week, whatever the number of tasks
+def hours_summary_stmt(groups: list[SummaryGroup], period: SummaryPeriod, *criteria):
+    keys = [GROUP_COLUMNS[group].label(GROUP_COLUMNS[group].key) for group in groups]
+    if period != SummaryPeriod.total:
+        keys.append(TaskHoursSummary.week_start.label("period_start"))
+    totals = [func.sum(getattr(TaskHoursSummary, counter)).label(counter) for counter in SUMMARY_COUNTERS]
+    return select(*keys, *totals).where(*criteria).group_by(*keys).order_by(*keys)
+
+# (staff_id, hours, service_type_hours) of the company's staff in the week starting
+# on week, served by ix_task_hours_summary_week. staff without tasks that week have no row
+def company_week_hours_stmt(company_id: int, week: date, service_type: str | None = None):
+    service_hours = (
+        func.sum(case((TaskHoursSummary.service_type == service_type, TaskHoursSummary.hours), else_=0))
+        if service_type else literal(0.0)
+    )
+    return (
+        select(TaskHoursSummary.staff_id, func.sum(TaskHoursSummary.hours).label("hours"), service_hours.label("service_type_hours"))
+        .where(
+            TaskHoursSummary.week_start == week,
+            TaskHoursSummary.staff_id.in_(select(Staff.id).where(Staff.company_id == company_id)),
+        )
+        .group_by(TaskHoursSummary.staff_id)
+    )
+
+# weekly rows of hours_summary_stmt summed into fortnights starting at anchor (a monday)
+def fold_fortnights(rows, anchor: date) -> list[dict]:
+    fortnights = {}
+    for row in rows:
+        row = row._asdict()
+        weeks = (row["period_start"] - anchor).days // 7
+        row["period_start"] = anchor + timedelta(weeks=weeks - weeks % 2)
+        key = tuple(value for name, value in row.items() if name not in SUMMARY_COUNTERS)
+        if key in fortnights:
+            for counter in SUMMARY_COUNTERS:
+                fortnights[key][counter] += row[counter]
+        else:
+            fortnights[key] = row
+    return list(fortnights.values())
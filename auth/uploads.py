@@ -0,0 +1,120 @@
+# streaming upload writer
+# starlette parses the multipart body into a spooled temporary file before the route
+# runs, so the size of an upload has to be capped while the body comes in:
+# UploadSizeLimit refuses a request whose content length is over max_upload_size
+# before reading it, and cuts off a chunked one once that many bytes arrived.
+# the spooled file is then copied to disk chunk by chunk with non-blocking file io,
+# the sha256 and byte size are computed in the same pass, and the route's own limit
+# (smaller for profile pictures) is checked on the way. the file is written under a
+# temporary name and only renamed into place once complete, so a failed upload never
+# leaves a partial file
+import hashlib
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+import anyio
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+from config import settings
+
+@dataclass(frozen=True)
+class SavedUpload:
+    path: Path
+    sha256: str
+    size: int
+
+# only the last component of the client supplied name, no directories
+def safe_filename(filename: str | None, default: str = "upload") -> str:
+    name = Path((filename or "").replace("\\", "/")).name
+    return name if name not in ("", ".", "..") else default
+
+def upload_too_large(max_size: int | None = None):
+    limit_mb = (max_size or settings.max_upload_size) // (1024 * 1024)
+    return HTTPException(status_code=413, detail=f"File is too large! The limit is {limit_mb} MB.")
+
+# boundaries, part headers and the other form fields around the file
+MULTIPART_OVERHEAD = 64 * 1024
+
+# asgi middleware capping the body of multipart requests at max_upload_size
+class UploadSizeLimit:
+    def __init__(self, app, max_size: int | None = None):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            return await self.app(scope, receive, send)
+
+        max_size = self.max_size or settings.max_upload_size
+        limit = max_size + MULTIPART_OVERHEAD
+        length = headers.get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            # refused before a byte of the body is read
+            error = upload_too_large(max_size)
+            return await JSONResponse({"detail": error.detail}, status_code=error.status_code)(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # raised inside the form parsing of the route, answered with 413
+                    raise upload_too_large(max_size)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+# leading bytes of the accepted image types, the client's content type is not trusted
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+]
+
+# file suffix of the image type the header belongs to, None for anything else
+def sniff_image(head: bytes) -> str | None:
+    for signature, suffix in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return suffix
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+async def stream_to_file(file: UploadFile, path: Path, max_size: int | None = None) -> tuple[str, int]:
+    max_size = max_size or settings.max_upload_size
+    # the size is known up front when the client sent a content length for the part
+    if file.size is not None and file.size > max_size:
+        raise upload_too_large(max_size)
+
+    digest = hashlib.sha256()
+    size = 0
+    async with await anyio.open_file(path, "wb") as out:
+        chunk = await file.read(settings.upload_chunk_size)
+        while chunk:
+            size += len(chunk)
+            if size > max_size:
+                raise upload_too_large(max_size)
+            digest.update(chunk)
+            await out.write(chunk)
+            chunk = await file.read(settings.upload_chunk_size)
+    return digest.hexdigest(), size
+
+async def save_upload(file: UploadFile, dest: Path, max_size: int | None = None) -> SavedUpload:
+    await anyio.Path(dest.parent).mkdir(parents=True, exist_ok=True)
+    part = dest.with_name(f".{dest.name}.{uuid.uuid4().hex}.part")
+    try:
+        sha256, size = await stream_to_file(file, part, max_size)
+        await anyio.Path(part).replace(dest)
+    except BaseException:
+        await anyio.Path(part).unlink(missing_ok=True)
+        raise
+    return SavedUpload(path=dest, sha256=sha256, size=size)
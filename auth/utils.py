@@ -1,12 +1,16 @@
+from collections import deque
+
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from config import settings
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from database import get_db
+from database import get_async_db
 from models import User
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from auth.hashing import HashingPool
 
 SECRET_KEY = settings.secret_key
 ALGORITHM = settings.algorithm
@@ -15,12 +19,36 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# every bcrypt hash/verify goes through the bounded hashing pool, off the event loop
+hashing_pool = HashingPool(settings.hashing_workers, settings.hashing_queue_limit)
+
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return hashing_pool.run(pwd_context.hash, password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing_pool.run(pwd_context.verify, plain_password, hashed_password)
+
+# many hashes for a bulk import, at most `workers` of them in the pool at a time so
+# logins queued in between keep their turn
+def hash_passwords(passwords: list[str]) -> list[str]:
+    hashes = [None] * len(passwords)
+    pending = deque()
+    for i, password in enumerate(passwords):
+        if len(pending) >= hashing_pool.workers:
+            j, future = pending.popleft()
+            hashes[j] = future.result()
+        # when logins fill the pool this waits for one of their slots to free up
+        pending.append((i, hashing_pool.submit(pwd_context.hash, password, wait=True)))
+    for j, future in pending:
+        hashes[j] = future.result()
+    return hashes
+
+async def hash_password_async(password: str) -> str:
+    return await hashing_pool.run_async(pwd_context.hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hashing_pool.run_async(pwd_context.verify, plain_password, hashed_password)
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
@@ -45,16 +73,17 @@ def verify_access_token(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise HTTPException(status_code=403, detail="Invalid or expired token")
 
-def authenticate_user(username: str, password: str, db: Session):
-    user = db.query(User).filter(User.username == username).first()
+async def authenticate_user(username: str, password: str, db: AsyncSession):
+    user = (await db.execute(select(User).where(User.username == username))).scalars().first()
     if not user:
         return False
-    if not verify_password(password, user.password_hash):
+    if not await verify_password_async(password, user.password_hash):
         return False
     return user
 
 from auth.schemas import UserRead
-async def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+from auth.principals import Principal, load_principal
+async def get_current_user(db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -69,14 +98,14 @@ async def get_current_user(db: Session = Depends(get_db), token: str = Depends(o
     except JWTError:
         raise credentials_exception
     
-    # Fetch the user from the database using the user_id
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
+    # Fetch the user, with its staff/client ids, from the principal cache or the database
+    principal = await load_principal(db, user_id)
+    if principal is None:
         raise credentials_exception
-    return user
+    return principal
 
 def role_required(role: str):
-    def role_checker(current_user: User = Depends(get_current_user)):
+    def role_checker(current_user: Principal = Depends(get_current_user)):
         if current_user.role != role:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
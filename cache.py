@@ -0,0 +1,172 @@
+# read-through cache of serialized responses for the reference data routes
+# companies and the staff lists change a few times a day but were read from mysql on
+# every call. entries are the response json, tagged with the entities they were built
+# from ("company", "staff", "client") and dropped by the write routes touching those
+# entities, the ttl bounds how stale an entry can get otherwise.
+# the memory backend is per worker process, so with several workers an invalidation
+# only reaches the worker that handled the write until the ttl runs out, use the redis
+# backend (cache_backend=redis, any redis compatible server) to share entries instead
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable
+
+from fastapi import Response
+
+from config import settings
+
+class MemoryBackend:
+    errors: tuple = ()
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, bytes, tuple[str, ...]]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def _drop(self, key: str):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: int, tags: Iterable[str]):
+        tags = tuple(tags)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            while len(self._entries) >= self.max_entries:
+                # least recently used first
+                self._drop(next(iter(self._entries)))
+            self._entries[key] = (time.monotonic() + ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+    def invalidate(self, *tags: str):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+# entries are plain keys with an expiry, every tag is a set of the keys built from it.
+# eviction is left to the server (maxmemory-policy allkeys-lru)
+class RedisBackend:
+    def __init__(self, url: str, prefix: str = "cache:"):
+        # only needed with cache_backend=redis
+        import redis
+
+        self.errors = (redis.RedisError,)
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def get(self, key: str) -> bytes | None:
+        return self._redis.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: int, tags: Iterable[str]):
+        pipe = self._redis.pipeline()
+        pipe.set(self.prefix + key, value, ex=ttl)
+        for tag in tags:
+            pipe.sadd(f"{self.prefix}tag:{tag}", self.prefix + key)
+            pipe.expire(f"{self.prefix}tag:{tag}", ttl * 2)
+        pipe.execute()
+
+    def invalidate(self, *tags: str):
+        for tag in tags:
+            tag_key = f"{self.prefix}tag:{tag}"
+            keys = self._redis.smembers(tag_key)
+            self._redis.delete(tag_key, *keys)
+
+    def clear(self):
+        for key in self._redis.scan_iter(f"{self.prefix}*"):
+            self._redis.delete(key)
+
+    def size(self) -> int | None:
+        return None
+
+class ResponseCache:
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._errors = 0
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    # the cached bytes under key, or produce() stored under key and tags.
+    # a backend that is down is a miss, the route still answers from the database
+    def get_or_set(self, key: str, tags: Iterable[str], produce: Callable[[], bytes], ttl: int | None = None) -> bytes:
+        try:
+            value = self.backend.get(key)
+        except self.backend.errors as e:
+            print(f"cache get failed for {key}: {e!r}")
+            self._count("_errors")
+            value = None
+        if value is not None:
+            self._count("_hits")
+            return value
+
+        self._count("_misses")
+        value = produce()
+        try:
+            self.backend.set(key, value, ttl or self.ttl, tags)
+        except self.backend.errors as e:
+            print(f"cache set failed for {key}: {e!r}")
+            self._count("_errors")
+        return value
+
+    def json_response(self, key: str, tags: Iterable[str], produce: Callable[[], bytes]) -> Response:
+        return Response(content=self.get_or_set(key, tags, produce), media_type="application/json")
+
+    # called by the write routes after their commit
+    def invalidate(self, *tags: str):
+        try:
+            self.backend.invalidate(*tags)
+        except self.backend.errors as e:
+            print(f"cache invalidation failed for {tags}: {e!r}")
+            self._count("_errors")
+
+    def metrics(self) -> dict:
+        with self._lock:
+            hits, misses, errors = self._hits, self._misses, self._errors
+        return {
+            "backend": type(self.backend).__name__,
+            "ttl": self.ttl,
+            "entries": self.backend.size(),
+            "hits": hits,
+            "misses": misses,
+            "errors": errors,
+        }
+
+def create_backend():
+    if settings.cache_backend == "redis":
+        return RedisBackend(settings.cache_url)
+    return MemoryBackend(settings.cache_max_entries)
+
+response_cache = ResponseCache(create_backend(), settings.cache_ttl)
@@ -9,6 +9,46 @@ class Settings(BaseSettings):
     secret_key: str
     algorithm: str = 'HS256'
     access_token_expire_minutes: int = 4320
+    # connection pool, per engine and per worker process (database.py)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30 # seconds to wait for a free connection
+    db_pool_recycle: int = 1800 # seconds, below mysql wait_timeout
+    db_pool_pre_ping: bool = True
+    # uploads (auth/uploads.py)
+    max_upload_size: int = 200 * 1024 * 1024 # bytes, larger uploads are aborted with 413
+    upload_chunk_size: int = 1024 * 1024 # bytes read and written per step
+    max_profile_image_size: int = 10 * 1024 * 1024 # bytes
+    blob_grace_period: int = 24 * 3600 # seconds an upload nothing points at is kept (auth/blobs.py)
+    blob_sweep_interval: int = 3600 # seconds between the sweeps of those
+    # serving of uploaded files (auth/media.py)
+    media_max_age: int = 365 * 24 * 3600 # seconds, for the content addressed blob urls
+    media_cache_bytes: int = 64 * 1024 * 1024 # in-memory lru of small files
+    media_cache_file_size: int = 512 * 1024 # bytes, larger files are streamed from disk
+    # resized photo variants made in the background (auth/derivatives.py)
+    derivative_workers: int = 1
+    derivative_queue_limit: int = 1000 # pending images before new ones are skipped
+    thumb_size: int = 256 # px, longest side
+    medium_size: int = 1024 # px, longest side
+    image_quality: int = 80
+    # response cache of the reference data routes (cache.py)
+    cache_backend: str = "memory" # memory (per worker) or redis (shared)
+    cache_url: str = "redis://localhost:6379/0"
+    cache_ttl: int = 300 # seconds
+    cache_max_entries: int = 1000 # memory backend only
+    # authenticated principal cache (auth/principals.py)
+    principal_cache_ttl: int = 60 # seconds
+    principal_cache_size: int = 10000
+    # bcrypt hashing pool (auth/hashing.py)
+    hashing_workers: int = 4
+    hashing_queue_limit: int = 64 # waiting hashes before new ones get a 503
+    # bulk import of participants and staff (auth/imports.py)
+    import_batch_size: int = 500 # records checked and inserted per transaction
+    import_max_errors: int = 1000 # row errors listed in the report, the count is always exact
+    # recurring shifts (auth/scheduling.py)
+    roster_max_shifts: int = 500 # shifts one roster request may expand to
+    # streaming task export (auth/exports.py)
+    export_batch_size: int = 1000 # rows fetched from the server side cursor per chunk
 
     class Config:
         env_file = ".env"
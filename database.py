@@ -28,7 +28,11 @@
 # Connecting using sqlalchemy
 # Path: community_service_backend/app/database.py
 
-from sqlalchemy import create_engine
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import settings
@@ -47,12 +51,94 @@ SQLALCHEMY_DATABASE_URL = (
     f"{settings.db_host}:{settings.db_port}/{settings.db_name}"
 )
 
+# checkout counters of a pool, kept by the public pool events (connect, checkout,
+# checkin). the pool has no event before a checkout, so the wait itself cannot be
+# timed: exhausted counts the checkouts that took the last connection, after which
+# requests queue for up to pool_timeout, and hold is how long connections stay out
+class PoolMetrics:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.exhausted = 0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+        self.holds = 0
+
+    def listen(self, pool):
+        event.listen(pool, "connect", self.on_connect)
+        event.listen(pool, "checkout", self.on_checkout)
+        event.listen(pool, "checkin", self.on_checkin)
+
+    def on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+            if self.checked_out >= self.capacity:
+                self.exhausted += 1
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        with self._lock:
+            self.checked_out = max(self.checked_out - 1, 0)
+            # an invalidated connection comes back without its checkout time
+            if checked_out_at is None:
+                return
+            hold = time.perf_counter() - checked_out_at
+            self.holds += 1
+            self.hold_total += hold
+            self.hold_max = max(self.hold_max, hold)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "peak_checked_out": self.peak_checked_out,
+                "exhausted": self.exhausted,
+                "avg_hold_ms": round(self.hold_total / self.holds * 1000, 3) if self.holds else 0.0,
+                "max_hold_ms": round(self.hold_max * 1000, 3),
+            }
+
+POOL_OPTIONS = dict(
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+)
+
 # Create the SQLAlchemy engine
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **POOL_OPTIONS)
 
 # Create a session maker
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the async def routes, same database through aiomysql
+ASYNC_SQLALCHEMY_DATABASE_URL = (
+    f"mysql+aiomysql://{settings.db_user}:{settings.db_password}@"
+    f"{settings.db_host}:{settings.db_port}/{settings.db_name}"
+)
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, **POOL_OPTIONS)
+
+# checkout counters per engine, for pool_status
+POOL_CAPACITY = settings.db_pool_size + settings.db_max_overflow
+pool_metrics = {"sync": PoolMetrics(POOL_CAPACITY), "async": PoolMetrics(POOL_CAPACITY)}
+pool_metrics["sync"].listen(engine.pool)
+pool_metrics["async"].listen(async_engine.sync_engine.pool)
+
+# objects stay loaded after commit, an async session cannot lazy load them again
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 # Base class for models
 Base = declarative_base()
 
@@ -63,3 +149,24 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency to get an async session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# live pool state plus the checkout counters of both engines
+def pool_status() -> dict:
+    status = {}
+    for name, pool in (("sync", engine.pool), ("async", async_engine.pool)):
+        status[name] = {
+            "size": pool.size(),
+            # queue pools count overflow from -size, so size + overflow is the open connections
+            "open": pool.size() + pool.overflow(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": settings.db_max_overflow,
+            **pool_metrics[name].snapshot(),
+        }
+    return status
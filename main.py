@@ -1,9 +1,18 @@
-from fastapi import FastAPI
+from fastapi import APIRouter, Depends, FastAPI, Request
+from fastapi.responses import JSONResponse
 # from models import create_user_table
 from auth import routes as auth_routes
-from database import engine
-from models import Base
+from auth import media as media_routes
+from auth.media import media_cache
+from database import pool_status
+from cache import response_cache
 from fastapi.middleware.cors import CORSMiddleware
+from auth.pagination import NEXT_CURSOR_HEADER
+from auth.hashing import HashingPoolFull
+from auth.utils import hashing_pool, role_required
+from auth.derivatives import derivative_worker
+from auth.blobs import BlobGone, cleanup_worker
+from auth.uploads import UploadSizeLimit
 
 # import sys
 # sys.setrecursionlimit(150)  # Increase the recursion limit
@@ -24,18 +33,27 @@ origins = [
     # "http://localhost:3000/all-users",
 ]
 
+# oversized uploads are refused while the body comes in, not after it was spooled
+app.add_middleware(UploadSizeLimit)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER], # cursor for the next page of the paginated lists
 )
 
 @app.on_event("startup")
 def on_startup():
-    # Create all tables in the database
-    Base.metadata.create_all(bind=engine)
+    # the schema comes from the migrations, run `alembic upgrade head` before starting
+    derivative_worker.start()
+    cleanup_worker.start()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    derivative_worker.stop()
+    cleanup_worker.stop()
 
 @app.get("/")
 def read_root():
@@ -45,9 +63,57 @@ def read_root():
 def health_check():
     return {"status": "OK"}
 
+# the bcrypt pool is saturated, ask the client to retry instead of queueing forever
+@app.exception_handler(HashingPoolFull)
+async def hashing_pool_full_handler(request: Request, exc: HashingPoolFull):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many login attempts in progress, please try again."},
+        headers={"Retry-After": "1"},
+    )
+
+# a picture or file picked by id was deleted by another request meanwhile
+@app.exception_handler(BlobGone)
+async def blob_gone_handler(request: Request, exc: BlobGone):
+    return JSONResponse(
+        status_code=409,
+        content={"detail": "The file was deleted in the meantime, please upload it again."},
+    )
+
+# internals of the workers, pools and caches, for admins only
+metrics = APIRouter(prefix="/metrics", dependencies=[Depends(role_required("admin"))])
+
+# queue depth and latency of the bcrypt hashing pool
+@metrics.get("/hashing")
+def hashing_metrics():
+    return hashing_pool.metrics()
+
+# queue of the background thumbnail worker
+@metrics.get("/derivatives")
+def derivative_metrics():
+    return derivative_worker.metrics()
+
+# files of released blobs waiting to be unlinked
+@metrics.get("/cleanup")
+def cleanup_metrics():
+    return cleanup_worker.metrics()
+
+# hit rate of the reference data response cache
+@metrics.get("/cache")
+def cache_metrics():
+    return response_cache.metrics()
+
+# checked out connections, overflow and checkout wait of the database pools
+@metrics.get("/db-pool")
+def db_pool_metrics():
+    return pool_status()
+
+# hit rate and size of the in-memory cache of small uploaded files
+@metrics.get("/media-cache")
+def media_cache_metrics():
+    return media_cache.metrics()
+
+app.include_router(metrics)
 
-# Serve the uploads directory as static files
-from fastapi.staticfiles import StaticFiles
-import os
-upload_dir = os.path.join(os.getcwd(), "uploads")
-app.mount("/uploads", StaticFiles(directory=upload_dir), name="uploads")
\ No newline at end of file
+# Serve the uploads directory, with etags, ranges and long caching of the blob urls
+app.include_router(media_routes.router)
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, Text, ForeignKey, Date, Time, Float, Boolean, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, Text, ForeignKey, Date, Time, Float, Boolean, DateTime, Index
+from sqlalchemy.orm import relationship, deferred, undefer_group
 from database import Base
 import enum
 from datetime import datetime
@@ -36,127 +36,141 @@ class Client(Base):
 
     
     image_path = Column(Text, nullable=True)
+    # resized variants of image_path, filled in by the derivative worker
+    thumb_path = Column(Text, nullable=True)
+    medium_path = Column(Text, nullable=True)
+    webp_path = Column(Text, nullable=True)
 
     # personal details
-    surname = Column(Text, nullable=True)
-    given_name = Column(Text, nullable=True)
+    # varchar so the directory index can hold them whole and serve the name order
+    surname = Column(String(255), nullable=True)
+    given_name = Column(String(255), nullable=True)
     preferred_name = Column(Text, nullable=True)
     sex = Column(Text, nullable=True)
     aboriginal = Column(Boolean, nullable=True)
     date_of_birth = Column(Date, nullable=True)
     # residential details
-    residence_street = Column(Text, nullable=True) # number or street of residence
-    residence_state = Column(Text, nullable=True)
-    residence_postcode = Column(Text, nullable=True)
+    residence_street = deferred(Column(Text, nullable=True), group="contacts") # number or street of residence
+    residence_state = deferred(Column(Text, nullable=True), group="contacts")
+    residence_postcode = deferred(Column(Text, nullable=True), group="contacts")
     # postal details
-    postal_street = Column(Text, nullable=True) # number or street of postal address
-    postal_state = Column(Text, nullable=True)
-    postal_postcode = Column(Text, nullable=True)
+    postal_street = deferred(Column(Text, nullable=True), group="contacts") # number or street of postal address
+    postal_state = deferred(Column(Text, nullable=True), group="contacts")
+    postal_postcode = deferred(Column(Text, nullable=True), group="contacts")
     
     # contact details
-    home_mobile = Column(Text, nullable=True) # changed mobile_phone to home_mobile
-    home_phone = Column(Text, nullable=True)
-    home_email = Column(Text, nullable=True) # renamed email to home_email in model and db
+    home_mobile = deferred(Column(Text, nullable=True), group="contacts") # changed mobile_phone to home_mobile
+    home_phone = deferred(Column(Text, nullable=True), group="contacts")
+    home_email = deferred(Column(Text, nullable=True), group="contacts") # renamed email to home_email in model and db
     
     # ndis info ndi no. previously included
     ndi = Column(Text, unique=True, nullable=False) # ndis
-    ndis_start_date = Column(Date, nullable=True)
-    ndis_end_date = Column(Date, nullable=True)
-    ndis_plan_review_date = Column(Date, nullable=True) # added plan review date in model and db
-    funding_type = Column(Text, nullable=True) # plan managed, self managed, ndi-managed, other
+    ndis_start_date = deferred(Column(Date, nullable=True), group="ndis")
+    ndis_end_date = deferred(Column(Date, nullable=True), group="ndis")
+    ndis_plan_review_date = deferred(Column(Date, nullable=True), group="ndis") # added plan review date in model and db
+    funding_type = deferred(Column(Text, nullable=True), group="ndis") # plan managed, self managed, ndi-managed, other
         # if plan managed
-    plan_provider_name = Column(Text, nullable=True)
-    plan_provider_email = Column(Text, nullable=True)
-    plan_provider_phone = Column(Text, nullable=True)
+    plan_provider_name = deferred(Column(Text, nullable=True), group="ndis")
+    plan_provider_email = deferred(Column(Text, nullable=True), group="ndis")
+    plan_provider_phone = deferred(Column(Text, nullable=True), group="ndis")
 
-    registered_other_ndis = Column(Boolean, nullable=True)
-    service_received_other_ndis = Column(Text, nullable=True) # if service received from other ndis
+    registered_other_ndis = deferred(Column(Boolean, nullable=True), group="ndis")
+    service_received_other_ndis = deferred(Column(Text, nullable=True), group="ndis") # if service received from other ndis
     
     # advocate/representative details
-    adv_surname = Column(Text, nullable=True)
-    adv_given_name = Column(Text, nullable=True)
-    adv_relationship = Column(Text, nullable=True)
-    adv_phone = Column(Text, nullable=True)
-    adv_mobile = Column(Text, nullable=True)
-    adv_email = Column(Text, nullable=True)
-    adv_address = Column(Text, nullable=True)
-    adv_postal_address = Column(Text, nullable=True)
+    adv_surname = deferred(Column(Text, nullable=True), group="advocate")
+    adv_given_name = deferred(Column(Text, nullable=True), group="advocate")
+    adv_relationship = deferred(Column(Text, nullable=True), group="advocate")
+    adv_phone = deferred(Column(Text, nullable=True), group="advocate")
+    adv_mobile = deferred(Column(Text, nullable=True), group="advocate")
+    adv_email = deferred(Column(Text, nullable=True), group="advocate")
+    adv_address = deferred(Column(Text, nullable=True), group="advocate")
+    adv_postal_address = deferred(Column(Text, nullable=True), group="advocate")
 
     # other info
-    birth_country = Column(Text, nullable=True)
-    main_language = Column(Text, nullable=True)
-    lang_interpreter_required = Column(Boolean, nullable=True)
-    cultural_bariers = Column(Boolean, nullable=True) # cultural/communication
+    birth_country = deferred(Column(Text, nullable=True), group="background")
+    main_language = deferred(Column(Text, nullable=True), group="background")
+    lang_interpreter_required = deferred(Column(Boolean, nullable=True), group="background")
+    cultural_bariers = deferred(Column(Boolean, nullable=True), group="background") # cultural/communication
         
         # if cultural/communication bariers
 
         # if verbal_communication
-    verbal_communication = Column(Text, nullable=True) # added verbal_communication in model and db # yes or no
-    interpreter_needed = Column(Boolean, nullable=True) # added interpreter_needed in model and db # yes or no
-    interpreter_language = Column(Text, nullable=True) # added interpreter_language in model and db
+    verbal_communication = deferred(Column(Text, nullable=True), group="background") # added verbal_communication in model and db # yes or no
+    interpreter_needed = deferred(Column(Boolean, nullable=True), group="background") # added interpreter_needed in model and db # yes or no
+    interpreter_language = deferred(Column(Text, nullable=True), group="background") # added interpreter_language in model and db
 
-    cultural_values = Column(Text, nullable=True)
-    cultural_behaviours = Column(Text, nullable=True)
-    communication_literacy = Column(Text, nullable=True) # written communication/literacy
+    cultural_values = deferred(Column(Text, nullable=True), group="background")
+    cultural_behaviours = deferred(Column(Text, nullable=True), group="background")
+    communication_literacy = deferred(Column(Text, nullable=True), group="background") # written communication/literacy
 
     # physical profile
-    weight = Column(Float, nullable=True)
-    height = Column(Float, nullable=True)
-    eye_color = Column(Text, nullable=True)
-    complexion = Column(Text, nullable=True) # body color
-    build = Column(Text, nullable=True) # body size
-    hair_color = Column(Text, nullable=True)
-    facial_hair = Column(Text, nullable=True)
-    birth_marks = Column(Boolean, nullable=True)
-    tattos = Column(Boolean, nullable=True)
+    weight = deferred(Column(Float, nullable=True), group="physical")
+    height = deferred(Column(Float, nullable=True), group="physical")
+    eye_color = deferred(Column(Text, nullable=True), group="physical")
+    complexion = deferred(Column(Text, nullable=True), group="physical") # body color
+    build = deferred(Column(Text, nullable=True), group="physical") # body size
+    hair_color = deferred(Column(Text, nullable=True), group="physical")
+    facial_hair = deferred(Column(Text, nullable=True), group="physical")
+    birth_marks = deferred(Column(Boolean, nullable=True), group="physical")
+    tattos = deferred(Column(Boolean, nullable=True), group="physical")
 
     # emergency details primary
-    emergency1_name = Column(Text, nullable=True)
-    emergency1_relationship = Column(Text, nullable=True)
-    emergency1_mobile = Column(Text, nullable=True)
-    emergency1_phone = Column(Text, nullable=True)
+    emergency1_name = deferred(Column(Text, nullable=True), group="contacts")
+    emergency1_relationship = deferred(Column(Text, nullable=True), group="contacts")
+    emergency1_mobile = deferred(Column(Text, nullable=True), group="contacts")
+    emergency1_phone = deferred(Column(Text, nullable=True), group="contacts")
 
     # emergency details secondary
-    emergency2_name = Column(Text, nullable=True)
-    emergency2_relationship = Column(Text, nullable=True)
-    emergency2_mobile = Column(Text, nullable=True)
-    emergency2_phone = Column(Text, nullable=True)
+    emergency2_name = deferred(Column(Text, nullable=True), group="contacts")
+    emergency2_relationship = deferred(Column(Text, nullable=True), group="contacts")
+    emergency2_mobile = deferred(Column(Text, nullable=True), group="contacts")
+    emergency2_phone = deferred(Column(Text, nullable=True), group="contacts")
 
     # gp medical contact
-    gp_clinic_name = Column(Text, nullable=True)
-    gp_firstname = Column(Text, nullable=True)
-    gp_surname = Column(Text, nullable=True)
-    gp_email = Column(Text, nullable=True)
-    gp_address = Column(Text, nullable=True)
-    gp_phone = Column(Text, nullable=True)
-    gp_mobile = Column(Text, nullable=True)
+    gp_clinic_name = deferred(Column(Text, nullable=True), group="medical")
+    gp_firstname = deferred(Column(Text, nullable=True), group="medical")
+    gp_surname = deferred(Column(Text, nullable=True), group="medical")
+    gp_email = deferred(Column(Text, nullable=True), group="medical")
+    gp_address = deferred(Column(Text, nullable=True), group="medical")
+    gp_phone = deferred(Column(Text, nullable=True), group="medical")
+    gp_mobile = deferred(Column(Text, nullable=True), group="medical")
 
     # support coordination details
-    support_contact_name = Column(Text, nullable=True)
-    support_relationship = Column(Text, nullable=True)
-    support_mobile = Column(Text, nullable=True)
-    support_phone = Column(Text, nullable=True)
+    support_contact_name = deferred(Column(Text, nullable=True), group="contacts")
+    support_relationship = deferred(Column(Text, nullable=True), group="contacts")
+    support_mobile = deferred(Column(Text, nullable=True), group="contacts")
+    support_phone = deferred(Column(Text, nullable=True), group="contacts")
 
     # specialist medical contact
-    have_specialist = Column(Boolean, nullable=True)
-    specialist_clinic_name = Column(Text, nullable=True)
-    specialist_email = Column(Text, nullable=True)
-    specialist_firstname = Column(Text, nullable=True)
-    specialist_surname = Column(Text, nullable=True)
-    specialist_address = Column(Text, nullable=True)
-    specialist_mobile = Column(Text, nullable=True)
-    specialist_phone = Column(Text, nullable=True)
+    have_specialist = deferred(Column(Boolean, nullable=True), group="medical")
+    specialist_clinic_name = deferred(Column(Text, nullable=True), group="medical")
+    specialist_email = deferred(Column(Text, nullable=True), group="medical")
+    specialist_firstname = deferred(Column(Text, nullable=True), group="medical")
+    specialist_surname = deferred(Column(Text, nullable=True), group="medical")
+    specialist_address = deferred(Column(Text, nullable=True), group="medical")
+    specialist_mobile = deferred(Column(Text, nullable=True), group="medical")
+    specialist_phone = deferred(Column(Text, nullable=True), group="medical")
 
     # living and support arrangements
-    living_arrangement = Column(Text, nullable=True) # other_arrangement also included here
+    living_arrangement = deferred(Column(Text, nullable=True), group="background") # other_arrangement also included here
     # other_arrangement = Column(Text, nullable=True) # if type others
 
     # travel
-    travel = Column(Text, nullable=True) # other_travel also included here
+    travel = deferred(Column(Text, nullable=True), group="background") # other_travel also included here
     # disability
-    disability = Column(Text, nullable=True)
+    disability = deferred(Column(Text, nullable=True), group="medical")
     # important people in the Participant’s life such as family member and their relationship?
-    important_people = Column(Text, nullable=True) # added important_people in the model and db # important_people and their relationship also included here
+    important_people = deferred(Column(Text, nullable=True), group="background") # added important_people in the model and db # important_people and their relationship also included here
+
+    __table_args__ = (
+        Index("ix_clients_user_id", "user_id"),
+        Index("ix_clients_company_id", "company_id"),
+        # company directory in name order, keyset paged
+        Index("ix_clients_company_name", "company_id", "given_name", "surname", "id"),
+        # blob reference counting and thumbnails look rows up by path, a prefix covers it
+        Index("ix_clients_image_path", "image_path", mysql_length=255),
+    )
 
     # Relationships
     user = relationship("User", back_populates="client")
@@ -171,82 +185,107 @@ class Staff(Base):
     company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
     date_of_reg = Column(Date, nullable=True) # added date of registration in model and db
     image_path = Column(Text, nullable=True)
+    # resized variants of image_path, filled in by the derivative worker
+    thumb_path = Column(Text, nullable=True)
+    medium_path = Column(Text, nullable=True)
+    webp_path = Column(Text, nullable=True)
     
     # personale details
     title = Column(Text, nullable=True)
-    given_name = Column(Text, nullable=True)
-    surname = Column(Text, nullable=True)
+    given_name = Column(String(255), nullable=True) # varchar like Client's
+    surname = Column(String(255), nullable=True)
     preferred_name = Column(Text, nullable=True)
     dob = Column(Date, nullable=True) # date of birth
     # residential address details   
-    residence_street = Column(Text, nullable=True) # number/street
-    residence_state = Column(Text, nullable=True)
-    residence_postcode = Column(Text, nullable=True)
+    residence_street = deferred(Column(Text, nullable=True), group="contacts") # number/street
+    residence_state = deferred(Column(Text, nullable=True), group="contacts")
+    residence_postcode = deferred(Column(Text, nullable=True), group="contacts")
     # postal address details
-    postal_street = Column(Text, nullable=True) # number/street
-    postal_state = Column(Text, nullable=True)
-    postal_postcode = Column(Text, nullable=True)
+    postal_street = deferred(Column(Text, nullable=True), group="contacts") # number/street
+    postal_state = deferred(Column(Text, nullable=True), group="contacts")
+    postal_postcode = deferred(Column(Text, nullable=True), group="contacts")
     # contact details
-    home_email = Column(Text, nullable=True)
-    home_phone = Column(Text, nullable=True)
-    home_mobile = Column(Text, nullable=True)
+    home_email = deferred(Column(Text, nullable=True), group="contacts")
+    home_phone = deferred(Column(Text, nullable=True), group="contacts")
+    home_mobile = deferred(Column(Text, nullable=True), group="contacts")
     # emergency details primary
-    emergency1_name = Column(Text, nullable=True)
-    emergency1_relationship = Column(Text, nullable=True)
-    emergency1_mobile = Column(Text, nullable=True)
-    emergency1_phone = Column(Text, nullable=True)
+    emergency1_name = deferred(Column(Text, nullable=True), group="contacts")
+    emergency1_relationship = deferred(Column(Text, nullable=True), group="contacts")
+    emergency1_mobile = deferred(Column(Text, nullable=True), group="contacts")
+    emergency1_phone = deferred(Column(Text, nullable=True), group="contacts")
     # emergency details secondary
-    emergency2_name = Column(Text, nullable=True)
-    emergency2_relationship = Column(Text, nullable=True)
-    emergency2_mobile = Column(Text, nullable=True)
-    emergency2_phone = Column(Text, nullable=True)
+    emergency2_name = deferred(Column(Text, nullable=True), group="contacts")
+    emergency2_relationship = deferred(Column(Text, nullable=True), group="contacts")
+    emergency2_mobile = deferred(Column(Text, nullable=True), group="contacts")
+    emergency2_phone = deferred(Column(Text, nullable=True), group="contacts")
     # bank details
         # primary bank details
-    bank1_name = Column(Text, nullable=True)
-    bank1_acc_name = Column(Text, nullable=True)
-    bank1_acc_no = Column(Text, nullable=True)
-    bank1_branch = Column(Text, nullable=True)
-    bank1_bsb = Column(Text, nullable=True)
+    bank1_name = deferred(Column(Text, nullable=True), group="bank")
+    bank1_acc_name = deferred(Column(Text, nullable=True), group="bank")
+    bank1_acc_no = deferred(Column(Text, nullable=True), group="bank")
+    bank1_branch = deferred(Column(Text, nullable=True), group="bank")
+    bank1_bsb = deferred(Column(Text, nullable=True), group="bank")
         # secondary bank details
-    bank2_name = Column(Text, nullable=True)
-    bank2_acc_name = Column(Text, nullable=True)
-    bank2_acc_no = Column(Text, nullable=True)
-    bank2_branch = Column(Text, nullable=True)
-    bank2_bsb = Column(Text, nullable=True)
-
-    bank_unit = Column(Text, nullable=True)
-    bank_amount = Column(Float, nullable=True)
-    bank_percent_net_pay = Column(Float, nullable=True)
+    bank2_name = deferred(Column(Text, nullable=True), group="bank")
+    bank2_acc_name = deferred(Column(Text, nullable=True), group="bank")
+    bank2_acc_no = deferred(Column(Text, nullable=True), group="bank")
+    bank2_branch = deferred(Column(Text, nullable=True), group="bank")
+    bank2_bsb = deferred(Column(Text, nullable=True), group="bank")
+
+    bank_unit = deferred(Column(Text, nullable=True), group="bank")
+    bank_amount = deferred(Column(Float, nullable=True), group="bank")
+    bank_percent_net_pay = deferred(Column(Float, nullable=True), group="bank")
     # other info
-    employee_tax = Column(Text, nullable=True)
-    abn = Column(Text, nullable=True)
+    employee_tax = deferred(Column(Text, nullable=True), group="employment")
+    abn = deferred(Column(Text, nullable=True), group="employment")
     # secondary employment(not mandatory)
-    secondary_employment = Column(Boolean, nullable=True)
-    secondary_employment_details = Column(Text, nullable=True) # if secondary_employment is true
+    secondary_employment = deferred(Column(Boolean, nullable=True), group="employment")
+    secondary_employment_details = deferred(Column(Text, nullable=True), group="employment") # if secondary_employment is true
     # health details(optional)
-    epilepsy = Column(Boolean, nullable=True)
-    diabetes = Column(Boolean, nullable=True)
-    diabetes_type = Column(Text, nullable=True) # if diabetes is true
-    heart_condition = Column(Boolean, nullable=True)
-    heart_condition_details = Column(Text, nullable=True) # if heart_condition is true
-    allergies = Column(Boolean, nullable=True)
-    allergies_details = Column(Text, nullable=True) # if allergies is true
-    health_others = Column(Boolean, nullable=True)
-    health_others_details = Column(Text, nullable=True) # if others is true
+    epilepsy = deferred(Column(Boolean, nullable=True), group="medical")
+    diabetes = deferred(Column(Boolean, nullable=True), group="medical")
+    diabetes_type = deferred(Column(Text, nullable=True), group="medical") # if diabetes is true
+    heart_condition = deferred(Column(Boolean, nullable=True), group="medical")
+    heart_condition_details = deferred(Column(Text, nullable=True), group="medical") # if heart_condition is true
+    allergies = deferred(Column(Boolean, nullable=True), group="medical")
+    allergies_details = deferred(Column(Text, nullable=True), group="medical") # if allergies is true
+    health_others = deferred(Column(Boolean, nullable=True), group="medical")
+    health_others_details = deferred(Column(Text, nullable=True), group="medical") # if others is true
 
     # visa info
-    australian = Column(Boolean, nullable=True)
+    australian = deferred(Column(Boolean, nullable=True), group="visa")
         # not australian
-    aus_permanent = Column(Boolean, nullable=True)
-    have_working_visa = Column(Boolean, nullable=True)
-    visa_expiary_date = Column(Date, nullable=True)
-    visa_restrictions = Column(Text, nullable=True)
+    aus_permanent = deferred(Column(Boolean, nullable=True), group="visa")
+    have_working_visa = deferred(Column(Boolean, nullable=True), group="visa")
+    visa_expiary_date = deferred(Column(Date, nullable=True), group="visa")
+    visa_restrictions = deferred(Column(Text, nullable=True), group="visa")
+
+    __table_args__ = (
+        Index("ix_staffs_user_id", "user_id"),
+        Index("ix_staffs_company_id", "company_id"),
+        Index("ix_staffs_company_name", "company_id", "given_name", "surname", "id"),
+        Index("ix_staffs_image_path", "image_path", mysql_length=255),
+    )
 
     # Relationships
     user = relationship("User", back_populates="staff")
     company = relationship("Company", back_populates="staff")
     tasks = relationship("Task", back_populates="staff", cascade="all, delete-orphan")
 
+# >>>>> deferred column groups of the wide participant and staff rows
+# a plain query of Client/Staff loads the core columns only (ids, company, names,
+# picture), a group is loaded with one extra select the first time one of its columns
+# is read. routes returning the whole row ask for all groups in their query instead
+CLIENT_GROUPS = ("contacts", "ndis", "advocate", "background", "physical", "medical")
+STAFF_GROUPS = ("contacts", "bank", "employment", "medical", "visa")
+
+def undefer_groups(groups):
+    return [undefer_group(group) for group in groups]
+
+# every column attribute, deferred ones included, refresh() skips deferred columns otherwise
+def all_columns(model):
+    return [attr.key for attr in model.__mapper__.column_attrs]
+
 class Company(Base):
     __tablename__ = "companies"
     
@@ -259,6 +298,10 @@ class Company(Base):
     abn = Column(Text, unique=True, nullable=False)
     logo = Column(Text, nullable=True)
 
+    __table_args__ = (
+        Index("ix_companies_logo", "logo", mysql_length=255),
+    )
+
     # Relationships
     client = relationship("Client", back_populates="company", cascade="all, delete-orphan")
     staff = relationship("Staff", back_populates="company", cascade="all, delete-orphan")
@@ -280,6 +323,23 @@ class Task(Base):
     approved = Column(Boolean, default=False)
     tasks_list = Column(Text, nullable=True)
     done_time = Column(DateTime, nullable=True)
+    # start/end as real datetimes, kept in sync with the date/time columns above
+    # so shifts over midnight or several days compare correctly
+    start_at = Column(DateTime, nullable=False)
+    end_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # overlap checks probe a staff member's shifts by interval
+        Index("ix_tasks_staff_interval", "staff_id", "start_at", "end_at"),
+        # overlap checks and who of a company is busy in a window, only read the tasks
+        # ending after the window starts
+        Index("ix_tasks_staff_end_at", "staff_id", "end_at", "start_at"),
+        # staff/participant task lists and their weekly views
+        Index("ix_tasks_staff_start_date", "staff_id", "start_date"),
+        Index("ix_tasks_client_start_date", "client_id", "start_date"),
+        # keyset paging of /all-tasks
+        Index("ix_tasks_start_date_id", "start_date", "id"),
+    )
 
     # Relationships
     staff = relationship("Staff", back_populates="tasks")
@@ -298,17 +358,69 @@ class Task(Base):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        self.update_schedule()
+
+    # recalculates start_at, end_at and hours after the date/time columns change
+    def update_schedule(self):
+        self.start_at = datetime.combine(self.start_date, self.start_time)
+        self.end_at = datetime.combine(self.end_date, self.end_time)
         self.hours = self.calculate_hours(
             self.start_date, self.start_time,
             self.end_date, self.end_time
         )
 
+# hours of the tasks per staff, participant, service type and week (starting monday),
+# kept up to date with every task change by the session hooks in auth/summaries.py
+# and rebuilt from the tasks by scripts/rebuild_hours_summary.py
+class TaskHoursSummary(Base):
+    __tablename__ = "task_hours_summary"
+
+    staff_id = Column(Integer, primary_key=True)
+    week_start = Column(Date, primary_key=True)
+    client_id = Column(Integer, primary_key=True)
+    service_type = Column(String(255), primary_key=True)
+    task_count = Column(Integer, nullable=False, default=0)
+    hours = Column(Float, nullable=False, default=0)
+    done_hours = Column(Float, nullable=False, default=0)
+    approved_hours = Column(Float, nullable=False, default=0)
+
+    __table_args__ = (
+        # the primary key serves a staff member's weeks, these the other listings
+        Index("ix_task_hours_summary_client_week", "client_id", "week_start"),
+        Index("ix_task_hours_summary_week", "week_start"),
+    )
+
+# content addressed file store, one file per distinct content under uploads/blobs/
+# ref_count is the number of Media/Company/Client/Staff rows pointing at path, it is
+# kept up to date by the session hooks in auth/blobs.py
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    path = Column(String(255), unique=True, nullable=False)
+    size = Column(BigInteger, nullable=False) # bytes
+    ref_count = Column(Integer, nullable=False, default=0)
+    kind = Column(String(16), nullable=True) # "image" once the leading bytes were checked, NULL unchecked
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
 class Media(Base):
     __tablename__ = "media"
     
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False)
     file_path = Column(Text, nullable=False)
+    # computed while the upload is streamed to disk
+    sha256 = Column(String(64), nullable=True)
+    size = Column(BigInteger, nullable=True) # bytes
+    # resized variants of photos, filled in by the derivative worker
+    thumb_path = Column(Text, nullable=True)
+    medium_path = Column(Text, nullable=True)
+    webp_path = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("ix_media_task_id", "task_id"),
+        Index("ix_media_file_path", "file_path", mysql_length=255),
+    )
 
     # Relationship
     task = relationship("Task", back_populates="medias")
\ No newline at end of file
@@ -0,0 +1,95 @@
+# Path: fastapi/scripts/bench_serialization.py
+# compares fastapi's default response_model serialization with the fast json path
+# (auth/responses.py) on staff and task lists shaped like the real ones, no database
+# needed, run from the project root:
+#   python -m scripts.bench_serialization --sizes 100 1000 5000
+
+import argparse
+import asyncio
+import time
+from datetime import date, datetime, time as dtime
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import List, get_args
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from auth.schemas import StaffRead, TaskReadDetails, staff_list_adapter, task_details_list_adapter
+
+# a filled in value for every field of a schema, by its annotation
+def sample_value(name: str, annotation, i: int):
+    types = get_args(annotation) or (annotation,)
+    if bool in types:
+        return i % 2 == 0
+    if int in types:
+        return i
+    if float in types:
+        return 1234.5 + i
+    if Decimal in types:
+        return Decimal("2.5")
+    if date in types:
+        return date(2026, 10, 1 + i % 28)
+    if datetime in types:
+        return datetime(2026, 10, 1 + i % 28, 9, 30)
+    if dtime in types:
+        return dtime(9 + i % 8, 0)
+    if list in types:
+        return [f"uploads/blobs/ab/{i:064x}.jpg", f"uploads/blobs/cd/{i + 1:064x}.jpg"]
+    return f"{name} {i}"
+
+def sample_staff(n: int) -> list:
+    # orm objects as /staffs/ gets them from the session
+    return [
+        SimpleNamespace(**{name: sample_value(name, field.annotation, i) for name, field in StaffRead.model_fields.items()})
+        for i in range(n)
+    ]
+
+def sample_tasks(n: int) -> list:
+    # the task routes build TaskReadDetails from their rows
+    return [
+        TaskReadDetails(**{name: sample_value(name, field.annotation, i) for name, field in TaskReadDetails.model_fields.items()})
+        for i in range(n)
+    ]
+
+async def default_path(field, items) -> bytes:
+    content = await serialize_response(field=field, response_content=items)
+    return JSONResponse(content).body
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+def bench(sizes: list[int], repeat: int):
+    loop = asyncio.new_event_loop()
+    cases = [
+        ("staff (/staffs/)", StaffRead, staff_list_adapter, sample_staff,
+         lambda adapter, items: adapter.dump_json(adapter.validate_python(items, from_attributes=True))),
+        ("tasks (/all-tasks)", TaskReadDetails, task_details_list_adapter, sample_tasks,
+         lambda adapter, items: adapter.dump_json(items)),
+    ]
+    print(f"{'list':<20} {'items':>6} {'default ms':>11} {'fast ms':>9} {'speedup':>8}")
+    for label, model, adapter, make_items, fast_path in cases:
+        field = create_response_field(name="Response", type_=List[model])
+        for size in sizes:
+            items = make_items(size)
+            default_body = loop.run_until_complete(default_path(field, items))
+            fast_body = fast_path(adapter, items)
+            assert default_body == fast_body, f"{label}: the fast path changed the response body"
+
+            default_ms = best_of(lambda: loop.run_until_complete(default_path(field, items)), repeat)
+            fast_ms = best_of(lambda: fast_path(adapter, items), repeat)
+            print(f"{label:<20} {size:>6} {default_ms:>11.2f} {fast_ms:>9.2f} {default_ms / fast_ms:>7.1f}x")
+    loop.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the default and the fast json response paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    bench(args.sizes, args.repeat)
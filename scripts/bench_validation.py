@@ -0,0 +1,52 @@
+# Path: fastapi/scripts/bench_validation.py
+# validation cost per record of the schema layer: orm objects validated one by one,
+# through a TypeAdapter built on every call (what a route doing TypeAdapter(List[...])
+# inline pays) and through the precompiled list adapters of auth/schemas.py, plus the
+# orm -> schema mapper of the staff details route. no database needed, run from the
+# project root:
+#   python -m scripts.bench_validation --sizes 100 1000 5000
+import argparse
+from types import SimpleNamespace
+from typing import List
+
+from pydantic import TypeAdapter
+
+from auth.schemas import STAFF_RENAMES, ReadStaffDetail, StaffRead, schema_from_orm, staff_list_adapter
+from scripts.bench_serialization import best_of, sample_staff, sample_value
+
+def sample_staff_rows(n: int) -> list:
+    # staff rows as the session returns them, dob named like the column
+    fields = {STAFF_RENAMES.get(name, name): field for name, field in ReadStaffDetail.model_fields.items()}
+    return [
+        SimpleNamespace(**{name: sample_value(name, field.annotation, i) for name, field in fields.items()})
+        for i in range(n)
+    ]
+
+def bench(sizes: list[int], repeat: int):
+    cases = [
+        ("StaffRead.model_validate", sample_staff,
+         lambda items: [StaffRead.model_validate(item) for item in items]),
+        ("TypeAdapter per call", sample_staff,
+         lambda items: TypeAdapter(List[StaffRead]).validate_python(items, from_attributes=True)),
+        ("staff_list_adapter", sample_staff,
+         lambda items: staff_list_adapter.validate_python(items, from_attributes=True)),
+        ("schema_from_orm detail", sample_staff_rows,
+         lambda items: [
+             schema_from_orm(ReadStaffDetail, item, STAFF_RENAMES, staff_id=item.staff_id, name=item.given_name)
+             for item in items
+         ]),
+    ]
+    print(f"{'path':<26} {'items':>6} {'total ms':>9} {'us/record':>10}")
+    for label, make_items, validate in cases:
+        for size in sizes:
+            items = make_items(size)
+            assert len(validate(items)) == size
+            total_ms = best_of(lambda: validate(items), repeat)
+            print(f"{label:<26} {size:>6} {total_ms:>9.2f} {total_ms * 1000 / size:>10.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per record validation of the response schemas")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    bench(args.sizes, args.repeat)
@@ -0,0 +1,41 @@
+# Path: fastapi/scripts/build_derivatives.py
+# makes the thumbnail/medium/webp variants of every stored photo that has none yet,
+# for photos from before the derivative worker or skipped while its queue was full,
+# and of those whose variants were made with other sizes or quality (run it after
+# changing thumb_size, medium_size or image_quality). old variants go with the blob.
+# run from the project root after `alembic upgrade head` and scripts.dedupe_uploads:
+#   python -m scripts.build_derivatives
+
+import argparse
+from pathlib import Path
+
+from sqlalchemy import or_, select
+
+from database import SessionLocal
+from auth.derivatives import IMAGE_COLUMNS, is_image_path, make_derivatives, record_derivatives, variant_ending
+
+def missing_derivatives(db) -> set[str]:
+    paths = set()
+    for model, column in IMAGE_COLUMNS:
+        stale = or_(model.thumb_path.is_(None), model.thumb_path.not_like(f"%{variant_ending('thumb_path')}"))
+        paths.update(db.execute(select(column).distinct().where(stale)).scalars())
+    return {path for path in paths if is_image_path(path)}
+
+def build(limit: int | None):
+    with SessionLocal() as db:
+        paths = sorted(missing_derivatives(db))[:limit]
+    done = failed = 0
+    for path in paths:
+        try:
+            record_derivatives(path, make_derivatives(Path(path)))
+            done += 1
+        except Exception as e:
+            print(f"failed: {path}: {e!r}")
+            failed += 1
+    print(f"built={done}, failed={failed}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the resized variants of stored photos")
+    parser.add_argument("--limit", type=int, default=None, help="at most this many photos")
+    args = parser.parse_args()
+    build(args.limit)
@@ -0,0 +1,134 @@
+# Path: fastapi/scripts/dedupe_uploads.py
+# moves the files written before the blob store (uploads/<task_id>/..., uploads/logos/...,
+# uploads/profile_pics/...) into uploads/blobs/, keeping one copy per distinct content,
+# and points Media/Company/Client/Staff at the blobs. afterwards it recounts every
+# blob's references and drops the unreferenced ones. safe to run again at any time,
+# run from the project root after `alembic upgrade head`:
+#   python -m scripts.dedupe_uploads --dry-run
+#   python -m scripts.dedupe_uploads
+
+import argparse
+import hashlib
+import shutil
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import delete, insert, select, update
+
+from config import settings
+from database import SessionLocal
+from models import Blob, Media
+from auth.blobs import BLOB_COLUMNS, BLOB_ROOT, BLOB_TMP, IMAGE_KIND, UPLOAD_ROOT, blob_path, blob_suffix, unlink_blob
+from auth.uploads import sniff_image
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(settings.upload_chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# images can be picked as profile pictures, like the ones uploaded to /profile-images
+def file_kind(path: Path) -> str | None:
+    with open(path, "rb") as f:
+        return IMAGE_KIND if sniff_image(f.read(16)) else None
+
+def is_blob(path: str) -> bool:
+    return Path(path).is_relative_to(BLOB_ROOT)
+
+def referenced_paths(db) -> Counter:
+    references = Counter()
+    for model, column in BLOB_COLUMNS.items():
+        column = getattr(model, column)
+        references.update(db.execute(select(column).where(column.is_not(None))).scalars())
+    return references
+
+def move_legacy_files(db, dry_run: bool) -> dict:
+    stats = Counter()
+    seen = set()
+    for path in referenced_paths(db):
+        if is_blob(path) or not Path(path).is_relative_to(UPLOAD_ROOT):
+            continue
+        legacy = Path(path)
+        if not legacy.is_file():
+            print(f"missing: {path}")
+            stats["missing"] += 1
+            continue
+
+        sha256 = file_sha256(legacy)
+        size = legacy.stat().st_size
+        row = db.execute(select(Blob.path).where(Blob.sha256 == sha256)).first()
+        target = Path(row.path) if row else blob_path(sha256, blob_suffix(legacy.name))
+        stats["files"] += 1
+        if row or target.exists() or sha256 in seen:
+            stats["duplicates"] += 1
+            stats["bytes_saved"] += size
+        seen.add(sha256)
+        print(f"{path} -> {target}")
+        if dry_run:
+            continue
+
+        # copy first and only remove the old file once the rows point at the blob
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(legacy, target)
+        if row is None:
+            db.execute(insert(Blob).values(sha256=sha256, path=str(target), size=size, ref_count=0, kind=file_kind(legacy)))
+        moved = 0
+        for model, column in BLOB_COLUMNS.items():
+            values = {column: str(target)}
+            if model is Media:
+                values.update(sha256=sha256, size=size)
+            moved += db.execute(update(model).where(getattr(model, column) == path).values(**values)).rowcount
+        db.execute(update(Blob).where(Blob.sha256 == sha256).values(ref_count=Blob.ref_count + moved))
+        db.commit()
+        legacy.unlink(missing_ok=True)
+    return stats
+
+# ref_count from the rows that actually point at each blob, then drop what nobody uses.
+# blobs younger than the grace period may belong to an upload still in flight
+def recount_and_sweep(db, grace: timedelta, dry_run: bool) -> dict:
+    stats = Counter()
+    references = referenced_paths(db)
+    cutoff = datetime.utcnow() - grace
+    for path, ref_count, created_at in db.execute(select(Blob.path, Blob.ref_count, Blob.created_at)).all():
+        actual = references[path]
+        if actual != ref_count:
+            print(f"recount: {path} {ref_count} -> {actual}")
+            stats["recounted"] += 1
+            if not dry_run:
+                db.execute(update(Blob).where(Blob.path == path).values(ref_count=actual))
+        if actual == 0 and created_at < cutoff:
+            print(f"unreferenced: {path}")
+            stats["dropped"] += 1
+            if not dry_run:
+                db.execute(delete(Blob).where(Blob.path == path, Blob.ref_count == 0))
+                db.commit()
+                unlink_blob(Path(path))
+    if not dry_run:
+        db.commit()
+
+    # temp files of uploads that died before reaching the store
+    if BLOB_TMP.is_dir():
+        for part in BLOB_TMP.iterdir():
+            if part.stat().st_mtime < time.time() - grace.total_seconds():
+                stats["stale_parts"] += 1
+                if not dry_run:
+                    part.unlink(missing_ok=True)
+    return stats
+
+def dedupe(dry_run: bool, grace_minutes: int):
+    with SessionLocal() as db:
+        stats = move_legacy_files(db, dry_run)
+        stats.update(recount_and_sweep(db, timedelta(minutes=grace_minutes), dry_run))
+    print(", ".join(f"{key}={value}" for key, value in sorted(stats.items())) or "nothing to do")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move uploads into the deduplicated blob store")
+    parser.add_argument("--dry-run", action="store_true", help="only print what would change")
+    parser.add_argument("--grace-minutes", type=int, default=60,
+                        help="keep unreferenced blobs and temp files younger than this")
+    args = parser.parse_args()
+    dedupe(args.dry_run, args.grace_minutes)
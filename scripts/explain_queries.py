@@ -0,0 +1,69 @@
+# Path: fastapi/scripts/explain_queries.py
+# prints the mysql EXPLAIN plan of the query behind each hot route, run from the
+# project root after `alembic upgrade head`:
+#   python -m scripts.explain_queries --staff-id 1 --client-id 1 --company-id 1
+
+import argparse
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+
+from database import engine
+from models import User, Client, Staff, Task
+from auth.pagination import DEFAULT_PAGE_SIZE, paginate
+from auth.projections import (
+    user_details_stmt, client_directory_stmt, staff_directory_stmt, directory_keys,
+    task_details_stmt, task_criteria, media_paths_stmt,
+)
+from auth.scheduling import overlapping_tasks_stmt
+
+def route_queries(staff_id: int, client_id: int, company_id: int):
+    today = date.today()
+    week_start = today - timedelta(days=today.weekday())
+    now = datetime.now().replace(microsecond=0)
+    return [
+        ("GET /auth/admin/all-users",
+         paginate(user_details_stmt(), [User.id], None, DEFAULT_PAGE_SIZE)),
+        ("GET /auth/staff/all-participants",
+         paginate(client_directory_stmt(company_id), directory_keys(Client, "name"), None, DEFAULT_PAGE_SIZE)),
+        ("GET /auth/admin/company/{companyId}/all-staffs",
+         paginate(staff_directory_stmt(company_id), directory_keys(Staff, "name"), None, DEFAULT_PAGE_SIZE)),
+        ("GET /auth/all-tasks",
+         paginate(task_details_stmt(), [Task.start_date, Task.id], None, DEFAULT_PAGE_SIZE)),
+        ("GET /auth/all-tasks?date_from&date_to&company_id",
+         paginate(task_details_stmt(*task_criteria(date_from=week_start, date_to=today, company_id=company_id)),
+                  [Task.start_date, Task.id], None, DEFAULT_PAGE_SIZE)),
+        ("GET /auth/tasks/staff/{staff_id}",
+         task_details_stmt(Task.staff_id == staff_id).order_by(Task.start_date, Task.id)),
+        ("GET /auth/tasks/client/{clientId}",
+         task_details_stmt(Task.client_id == client_id).order_by(Task.start_date, Task.id)),
+        ("GET /auth/tasks/current-week (staff)",
+         task_details_stmt(Task.staff_id == staff_id, Task.start_date >= week_start,
+                           Task.start_date <= week_start + timedelta(days=6)).order_by(Task.start_date, Task.id)),
+        ("media of a page of tasks",
+         media_paths_stmt(list(range(1, DEFAULT_PAGE_SIZE + 1)))),
+        ("POST /auth/create-tasks/{participantId} overlap check",
+         overlapping_tasks_stmt(staff_id, now, now + timedelta(hours=2))),
+    ]
+
+def explain(staff_id: int, client_id: int, company_id: int):
+    with engine.connect() as connection:
+        for route, stmt in route_queries(staff_id, client_id, company_id):
+            sql = stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+            result = connection.execute(text(f"EXPLAIN {sql}"))
+            columns = list(result.keys())
+            print(f"\n=== {route}")
+            for row in result:
+                plan = dict(zip(columns, row))
+                print(
+                    f"  {plan['table']}: type={plan['type']} key={plan['key']} "
+                    f"rows={plan['rows']} extra={plan['Extra']}"
+                )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN the queries behind the hot routes")
+    parser.add_argument("--staff-id", type=int, default=1)
+    parser.add_argument("--client-id", type=int, default=1)
+    parser.add_argument("--company-id", type=int, default=1)
+    args = parser.parse_args()
+    explain(args.staff_id, args.client_id, args.company_id)
@@ -0,0 +1,38 @@
+# Path: fastapi/scripts/import_people.py
+# imports participants or staff with their logins from a csv (header row) or jsonl
+# file, same checks and report as POST /auth/admin/import/{kind}. pictures named by
+# image_id must have been uploaded already, their thumbnails are made by
+# scripts.build_derivatives afterwards. run from the project root:
+#   python -m scripts.import_people participants clients.csv
+#   python -m scripts.import_people staff staff.jsonl --batch-size 1000
+
+import argparse
+import sys
+import time
+
+from database import SessionLocal
+from auth.imports import BulkImport, ImportFormat, ImportKind, import_format, read_records
+
+def run(kind: ImportKind, path: str, format: ImportFormat | None, batch_size: int | None) -> int:
+    format = format or import_format(path)
+    if format is None:
+        print(f"unknown format of {path}, pass --format", file=sys.stderr)
+        return 2
+    started = time.perf_counter()
+    with SessionLocal() as db, open(path, "rb") as f:
+        report = BulkImport(db, kind, batch_size).run(read_records(f, format))
+    for error in report.errors:
+        print(f"line {error['line']}: {error['error']}", file=sys.stderr)
+    if report.failed > len(report.errors):
+        print(f"... {report.failed - len(report.errors)} more errors", file=sys.stderr)
+    print(f"imported={report.imported}, failed={report.failed}, seconds={time.perf_counter() - started:.1f}")
+    return 1 if report.failed else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import participants or staff with their logins")
+    parser.add_argument("kind", choices=[kind.value for kind in ImportKind])
+    parser.add_argument("path", help="csv or jsonl file")
+    parser.add_argument("--format", choices=[format.value for format in ImportFormat], default=None)
+    parser.add_argument("--batch-size", type=int, default=None, help="records per transaction")
+    args = parser.parse_args()
+    sys.exit(run(ImportKind(args.kind), args.path, args.format and ImportFormat(args.format), args.batch_size))
@@ -0,0 +1,21 @@
+# Path: fastapi/scripts/rebuild_hours_summary.py
+# recomputes task_hours_summary from the tasks in one transaction. migration 0006 fills
+# it once, this is for whenever tasks were changed outside the app (the routes keep
+# the table up to date themselves). task writes wait for it to finish.
+# run from the project root:
+#   python -m scripts.rebuild_hours_summary
+
+import time
+
+from database import SessionLocal
+from auth.summaries import rebuild_hours_summary
+
+def run():
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        rows = rebuild_hours_summary(db)
+        db.commit()
+    print(f"summary rows={rows}, seconds={time.perf_counter() - started:.1f}")
+
+if __name__ == "__main__":
+    run()